@@ -0,0 +1,35 @@
+"""add_patient_id_sequence
+
+Revision ID: 5d2a9c4e7b10
+Revises: 395c2e1f7a4a
+Create Date: 2025-11-03 09:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a9c4e7b10'
+down_revision = '395c2e1f7a4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fallback counter table for dialects without native sequences (SQLite dev DBs)
+    op.create_table('id_sequences',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name', name=op.f('pk_id_sequences'))
+    )
+    bind = op.get_bind()
+    if bind.dialect.supports_sequences:
+        op.execute(sa.schema.CreateSequence(sa.Sequence('patient_id_seq', start=1, increment=1)))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.supports_sequences:
+        op.execute(sa.schema.DropSequence(sa.Sequence('patient_id_seq')))
+    op.drop_table('id_sequences')
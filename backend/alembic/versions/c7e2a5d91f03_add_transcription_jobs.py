@@ -0,0 +1,61 @@
+"""add_transcription_jobs
+
+Revision ID: c7e2a5d91f03
+Revises: 8f3b61d0c2e4
+Create Date: 2026-10-19 09:12:40.518227
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a5d91f03'
+down_revision = '8f3b61d0c2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # notetype already exists (clinical_notes); only the job status enum is new
+    note_type = sa.Enum('DOCTOR_DICTATION', 'NURSE_UPDATE', 'HANDOFF_SUMMARY', 'OTHER', name='notetype').with_variant(
+        postgresql.ENUM('DOCTOR_DICTATION', 'NURSE_UPDATE', 'HANDOFF_SUMMARY', 'OTHER', name='notetype', create_type=False),
+        'postgresql',
+    )
+    op.create_table('transcription_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', name='jobstatus'), nullable=False),
+    sa.Column('audio_path', sa.String(), nullable=False),
+    sa.Column('engine', sa.String(length=32), nullable=True),
+    sa.Column('note_type', note_type, nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('encounter_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('note_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], name=op.f('fk_transcription_jobs_author_id_users')),
+    sa.ForeignKeyConstraint(['encounter_id'], ['encounters.id'], name=op.f('fk_transcription_jobs_encounter_id_encounters')),
+    sa.ForeignKeyConstraint(['note_id'], ['clinical_notes.id'], name=op.f('fk_transcription_jobs_note_id_clinical_notes')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_transcription_jobs'))
+    )
+    op.create_index(op.f('ix_transcription_jobs_author_id'), 'transcription_jobs', ['author_id'], unique=False)
+    op.create_index(op.f('ix_transcription_jobs_available_at'), 'transcription_jobs', ['available_at'], unique=False)
+    op.create_index(op.f('ix_transcription_jobs_encounter_id'), 'transcription_jobs', ['encounter_id'], unique=False)
+    op.create_index(op.f('ix_transcription_jobs_id'), 'transcription_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_transcription_jobs_status'), 'transcription_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transcription_jobs_status'), table_name='transcription_jobs')
+    op.drop_index(op.f('ix_transcription_jobs_id'), table_name='transcription_jobs')
+    op.drop_index(op.f('ix_transcription_jobs_encounter_id'), table_name='transcription_jobs')
+    op.drop_index(op.f('ix_transcription_jobs_available_at'), table_name='transcription_jobs')
+    op.drop_index(op.f('ix_transcription_jobs_author_id'), table_name='transcription_jobs')
+    op.drop_table('transcription_jobs')
+    sa.Enum(name='jobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,49 @@
+"""add_draft_notes
+
+Revision ID: e41b9d7c3a26
+Revises: c7e2a5d91f03
+Create Date: 2026-10-19 14:37:05.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b9d7c3a26'
+down_revision = 'c7e2a5d91f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # notetype already exists (clinical_notes)
+    note_type = sa.Enum('DOCTOR_DICTATION', 'NURSE_UPDATE', 'HANDOFF_SUMMARY', 'OTHER', name='notetype').with_variant(
+        postgresql.ENUM('DOCTOR_DICTATION', 'NURSE_UPDATE', 'HANDOFF_SUMMARY', 'OTHER', name='notetype', create_type=False),
+        'postgresql',
+    )
+    op.create_table('draft_notes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.String(length=128), nullable=False),
+    sa.Column('note_type', note_type, nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('segments', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('encounter_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], name=op.f('fk_draft_notes_author_id_users')),
+    sa.ForeignKeyConstraint(['encounter_id'], ['encounters.id'], name=op.f('fk_draft_notes_encounter_id_encounters')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_draft_notes'))
+    )
+    op.create_index(op.f('ix_draft_notes_encounter_id'), 'draft_notes', ['encounter_id'], unique=False)
+    op.create_index(op.f('ix_draft_notes_id'), 'draft_notes', ['id'], unique=False)
+    op.create_index(op.f('ix_draft_notes_updated_at'), 'draft_notes', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_draft_notes_updated_at'), table_name='draft_notes')
+    op.drop_index(op.f('ix_draft_notes_id'), table_name='draft_notes')
+    op.drop_index(op.f('ix_draft_notes_encounter_id'), table_name='draft_notes')
+    op.drop_table('draft_notes')
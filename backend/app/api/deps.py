@@ -6,20 +6,50 @@ from typing import Generator, Optional # Generator might not be needed unless us
 import logging
 
 # Import necessary components
-from app.db.session import get_db
-from app.core.security import verify_token
-from app.models.user import User
+from app.db.session import get_db, SessionLocal
+from app.models.user import UserRole
+from app.core import auth_cache
+from app.core.auth_cache import Principal
 from app.services import user_service # Import the service to fetch user
 
+log = logging.getLogger(__name__)
+
+# Drop cached principals whenever user_service changes a user row
+user_service.register_user_change_hook(auth_cache.invalidate_user)
+
 # --- OAuth2 Scheme ---
 # This tells FastAPI how to find the token (in the Authorization header)
 # and which URL the client should use to *get* the token (your login endpoint)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/token") # Adjust URL if your router has a prefix
 
+# --- Cached Principal Resolution ---
+def resolve_principal(db: Session, token: str) -> Optional[Principal]:
+    """
+    Resolves a bearer token to an immutable Principal snapshot.
+    Served from the principal cache when possible; on a miss only (id, username, role)
+    is read from the database. Returns None if the token or user is invalid.
+    """
+    username = auth_cache.get_token_subject(token)
+    if username is None:
+        log.warning("Token verification failed (invalid token or missing subject).")
+        return None
+
+    principal = auth_cache.get_cached_principal(username)
+    if principal is not None:
+        return principal
+
+    identity = user_service.get_user_identity_by_username(db, username=username)
+    if identity is None:
+        log.warning("Token valid, but user '%s' not found in DB.", username)
+        return None
+    principal = Principal(id=identity.id, username=identity.username, role=identity.role)
+    auth_cache.cache_principal(principal)
+    return principal
+
 # --- Dependency Function ---
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+) -> Principal:
     """
     FastAPI dependency to verify the JWT token and return the authenticated user.
 
@@ -27,7 +57,7 @@ def get_current_user(
         HTTPException(401): If the token is invalid, expired, or the user doesn't exist.
 
     Returns:
-        The authenticated User database object.
+        A Principal snapshot (id, username, role) of the authenticated user.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,30 +65,46 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    # 1. Verify the token structure and signature
-    username = verify_token(token)
-    if username is None:
-        logging.warning("Token verification failed (invalid token or missing subject).")
+    principal = resolve_principal(db, token)
+    if principal is None:
         raise credentials_exception
 
-    # 2. Fetch the user from the database using the username from the token
-    user = user_service.get_user_by_username(db, username=username)
-    if user is None:
-        logging.warning(f"Token valid, but user '{username}' not found in DB.")
-        raise credentials_exception
+    log.debug("Authenticated user retrieved: %s", principal.username)
+    return principal
 
-    # 3. Return the authenticated user object
-    logging.debug(f"Authenticated user retrieved: {user.username}")
-    return user
+# --- Admin Role Dependency ---
+def require_admin_role(
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
+    """Dependency requiring the user to have the 'admin' role."""
+    if current_user.role != UserRole.ADMIN:
+        log.warning("Access denied: User '%s' is not an admin.", current_user.username)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Operation not permitted for this user role",
+        )
+    return current_user
+
+def is_admin_token(token: str) -> bool:
+    """
+    Same check as require_admin_role, for code outside FastAPI's dependency system
+    (e.g. the profiling middleware). Opens its own session only on a principal cache miss.
+    """
+    db = SessionLocal()
+    try:
+        principal = resolve_principal(db, token)
+    finally:
+        db.close()
+    return principal is not None and principal.role == UserRole.ADMIN
 
 # --- Optional Role-Based Dependency ---
 # Example: Create a dependency that ensures the user is a Doctor
 # def get_current_doctor_user(
-#     current_user: User = Depends(get_current_user)
-# ) -> User:
+#     current_user: Principal = Depends(get_current_user)
+# ) -> Principal:
 #     """Dependency requiring the user to have the 'doctor' role."""
 #     if current_user.role != "doctor":
-#         logging.warning(f"Access denied: User '{current_user.username}' is not a doctor.")
+#         log.warning(f"Access denied: User '{current_user.username}' is not a doctor.")
 #         raise HTTPException(
 #             status_code=status.HTTP_403_FORBIDDEN,
 #             detail="Operation not permitted for this user role",
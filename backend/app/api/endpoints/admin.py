@@ -1,20 +1,28 @@
 # app/api/endpoints/admin.py
+import asyncio
 import logging
-from typing import Any, List
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query # Added Query
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 # Import project components
 from app.api import deps # Contains dependencies like get_db, require_admin_role
+from app.core import memory, profiler
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.user import User # Needed for type hint
 from app.schemas.user import UserCreate, UserRead # Import UserRead for response
 from app.services import user_service # Import the user service
+from app.api.endpoints.handoff import active_session_states
 
 log = logging.getLogger(__name__)
 
-# Assume 'router = APIRouter()' is defined earlier in this file
+router = APIRouter()
 
 # --- (Existing create_user_by_admin endpoint would be here) ---
 
@@ -36,9 +44,171 @@ def list_users(
     """
     Admin endpoint to retrieve a list of all Doctor and Nurse users with pagination.
     """
-    log.info(f"Admin request received to list users (skip={skip}, limit={limit}).")
+    log.debug("Admin request received to list users (skip=%s, limit=%s).", skip, limit)
     users = user_service.get_all_users(db=db, skip=skip, limit=limit)
-    log.info(f"Returning {len(users)} users to admin.")
+    log.debug("Returning %s users to admin.", len(users))
     # FastAPI automatically converts the List[User] from the service
     # into List[UserRead] based on the response_model
-    return users
\ No newline at end of file
+    return users
+
+
+@router.get(
+    "/profile", # Corresponds to GET /api/v1/admin/profile
+    dependencies=[Depends(deps.require_admin_role)],
+    summary="Sample Process Profile",
+    description="Samples the stacks of every thread for N seconds and returns them in collapsed-stack format "
+                "(flamegraph.pl, speedscope, inferno).",
+    response_class=Response,
+)
+async def profile_process(
+    *,
+    seconds: float = Query(10, gt=0, description="How long to sample for"),
+    interval_ms: float = Query(None, ge=0.5, le=1000, description="Sampling interval (defaults to PROFILE_SAMPLE_INTERVAL_MS)"),
+) -> Response:
+    """
+    Runs the sampling profiler across the whole process. The event loop keeps
+    serving requests meanwhile; sampling happens on its own thread.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled.")
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles are limited to {settings.PROFILE_MAX_SECONDS} seconds.",
+        )
+    interval = (interval_ms or settings.PROFILE_SAMPLE_INTERVAL_MS) / 1000
+    try:
+        sampler = await asyncio.to_thread(profiler.profile_process, seconds, interval)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running.")
+
+    filename = f"profile-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.collapsed"
+    return Response(
+        content=sampler.collapsed(),
+        media_type=profiler.CONTENT_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Samples": str(sampler.samples),
+        },
+    )
+
+
+# --- Memory Accounting ---
+SNAPSHOT_GROUPINGS = ("lineno", "filename", "traceback")
+
+def _session_memory() -> List[Dict[str, Any]]:
+    """Per-dictation-session buffers: queued audio and the accumulated transcript."""
+    now = time.monotonic()
+    return [
+        {
+            "session_id": session_id,
+            "encounter_id": state.encounter_id,
+            "author_id": state.author_id,
+            "age_seconds": round(now - state.started_at),
+            "queued_audio_bytes": state.queued_bytes,
+            "audio_buffer_bytes": state.audio.capacity, # Preallocated
+            "dropped_audio_bytes": state.audio.dropped_bytes,
+            "vad_suppressed_ratio": round(state.vad.suppressed_ratio, 3) if state.vad else None,
+            "transcript_bytes": sum(len(segment.encode("utf-8")) + 1 for segment in state.transcript_segments),
+            "unsaved_segments": len(state.transcript_segments) - state.saved_segments, # Not yet in the draft note
+        }
+        for session_id, state in list(active_session_states.items())
+    ]
+
+def _check_grouping(group_by: str) -> None:
+    if group_by not in SNAPSHOT_GROUPINGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"group_by must be one of {', '.join(SNAPSHOT_GROUPINGS)}",
+        )
+
+@router.get(
+    "/memory",
+    dependencies=[Depends(deps.require_admin_role)],
+    summary="Worker Memory Report",
+    description="RSS trend, tracemalloc status and per-dictation-session buffer sizes for this worker.",
+)
+def memory_report() -> Any:
+    tracing, traced_current, traced_peak = memory.tracemalloc_status()
+    sessions = _session_memory()
+    return {
+        "pid": os.getpid(),
+        "rss": memory.rss_monitor.trend(),
+        "budget_mb": settings.MEMORY_BUDGET_MB or None,
+        "tracemalloc": {
+            "tracing": tracing,
+            "traced_mb": round(traced_current / memory.MB, 1),
+            "traced_peak_mb": round(traced_peak / memory.MB, 1),
+            "snapshots": [
+                {"id": s.id, "taken_at": datetime.fromtimestamp(s.taken_at, timezone.utc).isoformat()}
+                for s in memory.snapshot_store.list()
+            ],
+        },
+        "dictation_sessions": {
+            "count": len(sessions),
+            "queued_audio_bytes": sum(s["queued_audio_bytes"] for s in sessions),
+            "transcript_bytes": sum(s["transcript_bytes"] for s in sessions),
+            "sessions": sessions,
+        },
+    }
+
+@router.post("/memory/tracemalloc/start", dependencies=[Depends(deps.require_admin_role)], summary="Start tracemalloc")
+def start_tracemalloc(frames: int = Query(None, ge=1, le=100, description="Frames kept per allocation traceback")) -> Any:
+    memory.start_tracemalloc(frames or settings.TRACEMALLOC_FRAMES)
+    return {"tracing": True}
+
+@router.post("/memory/tracemalloc/stop", dependencies=[Depends(deps.require_admin_role)], summary="Stop tracemalloc")
+def stop_tracemalloc() -> Any:
+    memory.stop_tracemalloc()
+    return {"tracing": False}
+
+@router.post(
+    "/memory/snapshots",
+    dependencies=[Depends(deps.require_admin_role)],
+    summary="Take tracemalloc Snapshot",
+    description="Takes a snapshot and returns the top allocation sites plus the growth since the previous snapshot.",
+)
+async def take_memory_snapshot(
+    *,
+    group_by: str = Query("lineno", description="lineno, filename or traceback"),
+    limit: int = Query(25, ge=1, le=500),
+) -> Any:
+    _check_grouping(group_by)
+    try:
+        # Snapshotting walks every traced block; keep it off the event loop
+        stored = await asyncio.to_thread(memory.snapshot_store.take)
+    except RuntimeError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not running; start it first.")
+    previous = memory.snapshot_store.previous(stored.id)
+    return {
+        "id": stored.id,
+        "traced_mb": round(stored.traced_current / memory.MB, 1),
+        "rss_mb": round((memory.read_rss_bytes() or 0) / memory.MB, 1),
+        "top": await asyncio.to_thread(memory.top_stats, stored.snapshot, group_by, limit),
+        "diff_base_id": previous.id if previous else None,
+        "diff": await asyncio.to_thread(memory.diff_stats, previous.snapshot, stored.snapshot, group_by, limit)
+                if previous else [],
+    }
+
+@router.get(
+    "/memory/snapshots/{snapshot_id}/diff",
+    dependencies=[Depends(deps.require_admin_role)],
+    summary="Diff tracemalloc Snapshots",
+)
+async def diff_memory_snapshots(
+    *,
+    snapshot_id: int,
+    base: Optional[int] = Query(None, description="Snapshot to compare against (default: the one before)"),
+    group_by: str = Query("lineno", description="lineno, filename or traceback"),
+    limit: int = Query(25, ge=1, le=500),
+) -> Any:
+    _check_grouping(group_by)
+    target = memory.snapshot_store.get(snapshot_id)
+    base_snapshot = memory.snapshot_store.get(base) if base is not None else memory.snapshot_store.previous(snapshot_id)
+    if target is None or base_snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found (only the most recent are kept).")
+    return {
+        "id": target.id,
+        "base_id": base_snapshot.id,
+        "diff": await asyncio.to_thread(memory.diff_stats, base_snapshot.snapshot, target.snapshot, group_by, limit),
+    }
\ No newline at end of file
@@ -1,4 +1,5 @@
 # app/api/endpoints/auth.py
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -6,16 +7,28 @@ from typing import Any
 
 from app.db.session import get_db
 from app.schemas.user import UserCreate, UserRead
-from app.schemas.token import Token
+from app.schemas.token import Token, RefreshRequest
 from app.services import user_service # We'll create user_service next
-from app.core.security import create_access_token, verify_password
+from app.services import token_service
+from app.core.config import settings
+from app.core.security import create_access_token, get_password_hash_async, PasswordHasherBusy
 import logging
 
+log = logging.getLogger(__name__)
+
 # Create an API router
 router = APIRouter()
 
+# Returned when the password hashing pool is saturated (e.g. a login burst at shift change)
+def _hasher_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     *,
     db: Session = Depends(get_db),
     user_in: UserCreate
@@ -23,41 +36,98 @@ def register_user(
     """
     Register a new user (Doctor or Nurse).
     """
-    logging.info(f"Attempting registration for username: {user_in.username}")
+    log.debug("Attempting registration for username: %s", user_in.username)
     # Check if user already exists
-    user = user_service.get_user_by_username(db, username=user_in.username)
+    user = await asyncio.to_thread(user_service.get_user_identity_by_username, db, username=user_in.username)
     if user:
-        logging.warning(f"Registration failed: Username '{user_in.username}' already exists.")
+        log.warning("Registration failed: Username '%s' already exists.", user_in.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered.",
         )
-    # Create the user
-    new_user = user_service.create_user(db=db, user_in=user_in)
-    logging.info(f"Successfully registered user: {new_user.username}")
+    # Hash in the password pool, then create the user in a worker thread
+    try:
+        hashed_password = await get_password_hash_async(user_in.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy_exception()
+    new_user = await asyncio.to_thread(
+        user_service.create_user, db, user_in=user_in, hashed_password=hashed_password
+    )
+    if new_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not register user due to an internal error.",
+        )
+    log.info("Successfully registered user: %s", new_user.username)
     return new_user
 
 @router.post("/login/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     db: Session = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends() # Uses form data (username, password)
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
     """
-    logging.info(f"Login attempt for username: {form_data.username}")
-    # Authenticate the user
-    user = user_service.authenticate_user(
-        db, username=form_data.username, password=form_data.password
-    )
+    log.debug("Login attempt for username: %s", form_data.username)
+    # Authenticate the user (bcrypt runs in the password hashing pool)
+    try:
+        user = await user_service.authenticate_user_async(
+            db, username=form_data.username, password=form_data.password
+        )
+    except PasswordHasherBusy:
+        raise _hasher_busy_exception()
     if not user:
-        logging.warning(f"Login failed: Invalid credentials for username '{form_data.username}'.")
+        log.warning("Login failed: Invalid credentials for username '%s'.", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    # Create and return the access token
+    # Create and return the access token plus a refresh token for the rest of the shift
     access_token = create_access_token(subject=user.username) # Use username as JWT subject
-    logging.info(f"Login successful for user: {user.username}")
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    refresh_token = await asyncio.to_thread(token_service.issue_refresh_token, db, user_id=user.id)
+    log.info("Login successful for user: %s", user.username)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+    }
+
+@router.post("/login/refresh", response_model=Token)
+def refresh_access_token(
+    *,
+    db: Session = Depends(get_db),
+    refresh_in: RefreshRequest
+) -> Any:
+    """
+    Exchange a refresh token for a new access token (and a new refresh token).
+    No password check: this avoids paying bcrypt on every access-token expiry.
+    """
+    rotated = token_service.rotate_refresh_token(db, raw_token=refresh_in.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    username, new_refresh_token = rotated
+    return {
+        "access_token": create_access_token(subject=username),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": new_refresh_token,
+    }
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    *,
+    db: Session = Depends(get_db),
+    refresh_in: RefreshRequest
+) -> None:
+    """
+    Revoke a refresh token and every token rotated from the same login.
+    """
+    if not token_service.revoke_refresh_token(db, raw_token=refresh_in.refresh_token):
+        log.info("Logout called with an unknown refresh token.")
\ No newline at end of file
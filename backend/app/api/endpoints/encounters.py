@@ -11,7 +11,7 @@ from app.models.encounter import LabReportStatus, EncounterStatus # Import Enums
 # Import project components
 from app.api import deps
 from app.db.session import get_db
-from app.models.user import User
+from app.core.auth_cache import Principal
 from app.schemas.encounter import EncounterCreate, EncounterRead, EncounterUpdate
 from app.schemas.note import NoteRead
 from app.services import encounter_service, note_service # Import both services
@@ -51,15 +51,15 @@ def create_new_encounter(
     encounter_in: EncounterCreate,
 ) -> Any:
     """Create an initial encounter record (e.g., during triage)."""
-    log.info(f"Received request to create encounter for patient: {encounter_in.patient_id}")
+    log.debug("Received request to create encounter for patient: %s", encounter_in.patient_id)
     encounter = encounter_service.create_initial_encounter(db=db, encounter_in=encounter_in)
     if encounter is None:
-        log.error(f"Failed to create encounter for patient: {encounter_in.patient_id}")
+        log.error("Failed to create encounter for patient: %s", encounter_in.patient_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found or encounter could not be created.",
         )
-    log.info(f"Successfully created encounter ID: {encounter.id}")
+    log.debug("Successfully created encounter ID: %s", encounter.id)
     return encounter
 
 # --- ENDPOINT 2: RETRIEVE ENCOUNTER DETAILS (GET /{id}) ---
@@ -74,10 +74,10 @@ def get_encounter_details(
     encounter_id: int,
 ) -> Any:
     """Retrieve details for a specific encounter by its ID."""
-    log.info(f"Request received to fetch details for encounter ID: {encounter_id}")
+    log.debug("Request received to fetch details for encounter ID: %s", encounter_id)
     encounter = encounter_service.get_encounter_by_id(db=db, encounter_id=encounter_id)
     if encounter is None:
-        log.warning(f"Encounter with ID '{encounter_id}' not found.")
+        log.warning("Encounter with ID '%s' not found.", encounter_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Encounter not found",
@@ -97,7 +97,7 @@ def update_existing_encounter(
     encounter_in: EncounterUpdate,
 ) -> Any:
     """Update an existing encounter (e.g., admit, discharge)."""
-    log.info(f"Received request to update encounter ID: {encounter_id}")
+    log.debug("Received request to update encounter ID: %s", encounter_id)
     if not encounter_service.get_encounter_by_id(db=db, encounter_id=encounter_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Encounter not found")
 
@@ -105,7 +105,7 @@ def update_existing_encounter(
         db=db, encounter_id=encounter_id, encounter_update=encounter_in
     )
     if updated_encounter is None:
-        log.error(f"Failed to update encounter ID: {encounter_id}")
+        log.error("Failed to update encounter ID: %s", encounter_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not update encounter due to an internal error.",
@@ -124,13 +124,13 @@ def get_encounter_notes(
     encounter_id: int,
 ) -> Any:
     """Retrieve all clinical notes for a specific encounter ID."""
-    log.info(f"Request received to fetch notes for encounter ID: {encounter_id}")
+    log.debug("Request received to fetch notes for encounter ID: %s", encounter_id)
     encounter = encounter_service.get_encounter_by_id(db=db, encounter_id=encounter_id)
     if not encounter:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Encounter not found")
 
     notes = note_service.get_notes_for_encounter(db=db, encounter_id=encounter_id)
-    log.info(f"Returning {len(notes)} notes for encounter ID: {encounter_id}")
+    log.debug("Returning %s notes for encounter ID: %s", len(notes), encounter_id)
     return notes
 
 # --- ENDPOINT 5: UPDATE LAB STATUS (PATCH /{id}/lab-status) ---
@@ -145,10 +145,10 @@ def update_encounter_lab_status(
     db: Session = Depends(get_db),
     encounter_id: int,
     lab_status_in: LabStatusUpdate, # Uses the locally defined schema
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ) -> Any:
     """Updates the lab status (e.g., ORDERED, RECEIVED, DELAYED) for an encounter."""
-    log.info(f"Request to update lab status for encounter {encounter_id} to {lab_status_in.new_status}")
+    log.debug("Request to update lab status for encounter %s to %s", encounter_id, lab_status_in.new_status)
     if not encounter_service.get_encounter_by_id(db=db, encounter_id=encounter_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Encounter not found")
 
@@ -173,12 +173,12 @@ def update_encounter_lab_status(
 )
 def get_critical_alerts(
     db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ) -> CriticalAlerts:
     """
     Retrieves critical, time-sensitive alerts for the current shift dashboard.
     """
-    log.info(f"User {current_user.id} fetching critical alerts.")
+    log.debug("User %s fetching critical alerts.", current_user.id)
 
     # Call service functions (Ensure these services are implemented in encounter_service.py)
     med_alerts = encounter_service.get_medication_alerts(db)
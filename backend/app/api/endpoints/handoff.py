@@ -1,6 +1,10 @@
 # app/api/endpoints/handoff.py
 import asyncio
+import base64
 import logging
+import os
+import tempfile
+import time
 from typing import Dict, Optional, Any
 
 from fastapi import (
@@ -10,121 +14,213 @@ from fastapi import (
     UploadFile,
     File,
     Depends,
+    HTTPException,
     Query,
     status
 )
+import aiofiles
+import aiofiles.os
 from sqlalchemy.orm import Session
 
 # Project specific imports
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.api import deps # Contains verify_token, user_service access
-from app.models.user import User
+from app.core.auth_cache import Principal
 from app.services import asr_service # Handles the ASR processing
-from app.utils.connection_manager import ConnectionManager
+from app.services import asr_engines
+from app.services import transcoder
+from app.services import transcription_jobs
+from app.core.config import settings
+from app.models.note import NoteType
+from app.models.user import UserRole
+from app.schemas.transcription_job import TranscriptionJobRead
+from app.core import metrics, tracing
+from app.utils.connection_manager import manager # Shared with asr_service, which checks it for live sessions
 from app.schemas.session import SessionState # <-- Import SessionState from new location
+from app.utils import dictation_protocol
+from app.utils.dictation_protocol import AudioFrame, ProtocolError
+from app.utils.audio_buffer import AudioBufferOverflow
 
 # --- Logging Setup ---
 log = logging.getLogger(__name__)
-# Ensure logging is configured globally (e.g., in main.py) or configure here
-# logging.basicConfig(level=logging.INFO)
+
+# Bytes read from an upload and written to disk per step
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 # --- Connection Management ---
-manager = ConnectionManager()
 # Store active session states globally (consider a more robust state management for production)
 active_session_states: Dict[str, SessionState] = {}
 
+# --- Session Metrics (read at scrape time) ---
+metrics.callback_gauge(
+    "dictation_ws_active_sessions", "Open dictation WebSocket connections.", (),
+    lambda: [((), len(manager.active_connections))],
+)
+metrics.callback_gauge(
+    "dictation_queued_audio_bytes", "Audio bytes waiting for the ASR stream across all dictation sessions.", (),
+    lambda: [((), sum(state.queued_bytes for state in list(active_session_states.values())))],
+)
+metrics.callback_gauge(
+    "dictation_audio_buffer_fill_ratio", "Share of the audio buffer in use, per dictation session.", ("session",),
+    lambda: [((session_id,), state.audio.size / state.audio.capacity)
+             for session_id, state in list(active_session_states.items())],
+)
+metrics.callback_gauge(
+    "dictation_audio_dropped_bytes", "Audio discarded by the drop_oldest policy, per dictation session.", ("session",),
+    lambda: [((session_id,), state.audio.dropped_bytes) for session_id, state in list(active_session_states.items())],
+)
+metrics.callback_gauge(
+    "dictation_audio_blocked_seconds", "Time the socket reader waited for buffer space, per dictation session.", ("session",),
+    lambda: [((session_id,), state.audio.blocked_seconds) for session_id, state in list(active_session_states.items())],
+)
+metrics.callback_gauge(
+    "dictation_vad_suppressed_ratio", "Share of the audio so far withheld from the ASR stream as silence, per dictation session.",
+    ("session",),
+    lambda: [((session_id,), state.vad.suppressed_ratio)
+             for session_id, state in list(active_session_states.items()) if state.vad is not None],
+)
+dictation_audio_overflows = metrics.counter(
+    "dictation_audio_overflows_total", "Dictation sessions ended because their audio buffer overflowed (policy fail).",
+)
+
+dictation_frames_rejected = metrics.counter(
+    "dictation_frames_rejected_total", "Protocol v2 audio frames dropped, by reason.", ("reason",),
+)
+
+
+# --- Protocol v2 Frames ---
+def frame_audio(state: SessionState, data: bytes) -> Optional[AudioFrame]:
+    """The v2 binary frame in `data`; None for duplicates. Raises ProtocolError for malformed frames."""
+    try:
+        frame = dictation_protocol.parse_frame(data)
+    except ProtocolError:
+        dictation_frames_rejected.inc("malformed")
+        raise
+    if state.last_sequence is not None and frame.sequence <= state.last_sequence:
+        log.warning("[%s] Dropping repeated frame %s (last %s).", state.id, frame.sequence, state.last_sequence)
+        dictation_frames_rejected.inc("out_of_order")
+        return None
+    # Validate before taking the sequence number, so a rejected frame can be resent under it without a false gap
+    if frame.codec not in dictation_protocol.PCM_CODECS and transcoder.ffmpeg_path() is None:
+        dictation_frames_rejected.inc("codec")
+        raise ProtocolError(f"codec {frame.codec.name.lower()} needs ffmpeg on the server; send pcm_s16le or wav")
+    if not 8000 <= frame.sample_rate <= 192000:
+        dictation_frames_rejected.inc("sample_rate")
+        raise ProtocolError(f"sample rate {frame.sample_rate} Hz is out of range")
+    if frame.sequence != (state.last_sequence if state.last_sequence is not None else -1) + 1:
+        log.warning("[%s] Audio frames missing before sequence %s (last %s).", state.id, frame.sequence, state.last_sequence)
+    state.last_sequence = frame.sequence
+    return frame
+
+
+async def wait_for_drain(state: SessionState, timeout: float = 5.0) -> None:
+    """Waits until the ASR engine has taken all queued audio (for v2 flush)."""
+    deadline = time.monotonic() + timeout
+    while state.queued_bytes > 0 and state.is_active and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+
+
 # --- WebSocket Authentication Dependency ---
 async def get_current_user_ws(
     websocket: WebSocket,
     token: str = Query(..., description="JWT Access Token passed as query parameter"),
     db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     """
     Dependency to authenticate WebSocket connections via a query parameter token.
     Closes the connection if authentication fails.
     """
-    # Verify the token structure and signature
-    username = deps.verify_token(token)
-    if not username:
-        log.warning("WebSocket authentication failed: Invalid or missing token.")
+    # Verify the token and resolve the user (served from the auth caches when warm)
+    principal = deps.resolve_principal(db, token)
+    if not principal:
+        log.warning("WebSocket authentication failed: Invalid token or unknown user.")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication Required")
         raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication Required")
 
-    # Fetch the user from the database
-    # Ensure user_service is accessible via deps or imported directly if needed
-    user = deps.user_service.get_user_by_username(db, username=username)
-    if not user:
-        log.warning(f"WebSocket authentication failed: User '{username}' not found.")
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
-        raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
-
-    log.info(f"WebSocket authenticated for user: {user.username}")
-    return user
+    log.debug("WebSocket authenticated for user: %s", principal.username)
+    return principal
 
 # --- API Router Definition ---
 router = APIRouter()
 
 
-@router.post('/api/v1/dictation/upload')
+@router.get('/api/v1/dictation/engines')
+async def list_dictation_engines(current_user: Principal = Depends(deps.get_current_user)):
+    """ASR engines clients may select with the `engine` parameter, with their capabilities."""
+    return await asyncio.to_thread(asr_engines.describe_engines) # May load a local model on first call
+
+
+@router.post('/api/v1/dictation/upload', status_code=status.HTTP_202_ACCEPTED)
 async def upload_dictation_file(
     encounter_id: int = Query(..., description='Encounter ID for this dictation'),
+    engine: Optional[str] = Query(None, description='ASR engine (see /api/v1/dictation/engines); default ASR_ENGINE'),
     file: UploadFile = File(...),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
-    Accept a full audio file via multipart/form-data, transcode if needed, run ASR and save the note.
+    Accept a full audio file via multipart/form-data and queue its transcription.
 
     Form fields:
     - encounter_id (query param)
     - file (multipart file)
 
     Authentication: Bearer token via standard OAuth2 header (uses deps.get_current_user)
+
+    The file is streamed to DICTATION_UPLOAD_DIR in chunks and a transcription job
+    is queued; the response carries its ID. Poll GET /api/v1/dictation/jobs/{job_id}
+    for progress and the note ID (see app/services/transcription_jobs.py).
     """
-    import tempfile
-    import os
-    import subprocess
-    from app.services import asr_service
-
-    # Save uploaded file to a temporary location
-    suffix = os.path.splitext(file.filename)[1] or '.bin'
-    tmp_in = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
     try:
-        contents = await file.read()
-        tmp_in.write(contents)
-        tmp_in.flush()
-        tmp_in.close()
+        await asyncio.to_thread(asr_engines.get_engine, engine)
+    except asr_engines.EngineUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    suffix = os.path.splitext(file.filename or '')[1] or '.bin'
+    fd, audio_path = tempfile.mkstemp(suffix=suffix, prefix='upload-', dir=settings.DICTATION_UPLOAD_DIR)
+    os.close(fd)
+    job = None
+    try:
+        with tracing.start_span("upload.save") as span:
+            size = 0
+            async with aiofiles.open(audio_path, 'wb') as out:
+                while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                    await out.write(chunk)
+                    size += len(chunk)
+            span.set_attribute("upload.bytes", size)
+
+        db = SessionLocal()
+        try:
+            job = await asyncio.to_thread(
+                transcription_jobs.create_job, db, audio_path=audio_path, encounter_id=encounter_id,
+                author_id=current_user.id, note_type=NoteType.DOCTOR_DICTATION, engine=engine,
+            )
+        finally:
+            db.close()
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Encounter {encounter_id} not found")
+    finally:
+        if job is None:
+            try:
+                await aiofiles.os.remove(audio_path)
+            except OSError:
+                pass
 
-        # Prepare output WAV path
-        tmp_out = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        tmp_out.close()
+    transcription_jobs.notify_workers()
+    return { 'status': 'queued', 'job_id': job.id, 'status_url': f'/api/v1/dictation/jobs/{job.id}' }
 
-        # Try to transcode using ffmpeg if available
-        ffmpeg_cmd = ['ffmpeg', '-y', '-i', tmp_in.name, '-ar', '16000', '-ac', '1', tmp_out.name]
-        try:
-            subprocess.run(['ffmpeg', '-version'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            # Run actual transcode
-            subprocess.run(ffmpeg_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            transcode_path = tmp_out.name
-        except Exception as e:
-            # ffmpeg not available or transcode failed - fall back to using original file
-            transcode_path = tmp_in.name
-
-        # Now transcribe and save using asr_service helper
-        try:
-            result = await asr_service.transcribe_file_and_save_note(transcode_path, encounter_id, current_user.id, note_type='doctor_dictation')
-        except Exception as e:
-            return { 'status': 'error', 'message': f'ASR/transcode failed: {str(e)}' }
 
-        return { 'status': 'ok', 'transcript': result.get('transcript'), 'note_id': result.get('note_id') }
-    finally:
-        try:
-            os.unlink(tmp_in.name)
-        except Exception:
-            pass
-        try:
-            os.unlink(tmp_out.name)
-        except Exception:
-            pass
+@router.get('/api/v1/dictation/jobs/{job_id}', response_model=TranscriptionJobRead)
+def get_transcription_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user),
+):
+    """Status, progress and (once completed) the note ID of an upload's transcription job."""
+    job = transcription_jobs.get_job(db, job_id=job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if job is None or (job.author_id != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transcription job not found")
+    return job
 
 # --- WebSocket Endpoint for Dictation ---
 @router.websocket("/ws/dictation/{session_id}")
@@ -132,13 +228,18 @@ async def websocket_dictation_endpoint(
     websocket: WebSocket,
     session_id: str,
     encounter_id: int = Query(..., description="The ID of the encounter for this dictation"),
-    current_user: User = Depends(get_current_user_ws) # Use the WS-specific auth dependency
+    engine: Optional[str] = Query(None, description="ASR engine (see /api/v1/dictation/engines); default ASR_ENGINE"),
+    current_user: Principal = Depends(get_current_user_ws) # Use the WS-specific auth dependency
 ):
     """
     WebSocket endpoint for real-time clinical dictation.
 
     Requires authentication via 'token' query parameter.
-    Requires 'encounter_id' query parameter.
+    Requires 'encounter_id' query parameter; optional 'engine' selects the ASR engine.
+    Clients offering the 'hvs.dictation.v2' subprotocol get framed binary audio and
+    start/flush/stop control messages (app/utils/dictation_protocol.py); 'hvs.dictation.v3'
+    adds diff-style transcript updates, and 'hvs.dictation.v3+msgpack' msgpack-encoded
+    server messages. Others get the legacy raw-binary / base64-text protocol.
 
     Streams audio to ASR, sends back live transcript, and saves the final note
     via the ASR service.
@@ -147,80 +248,144 @@ async def websocket_dictation_endpoint(
     """
     state: Optional[SessionState] = None # Initialize for reliable cleanup
     try:
+        # Resolve the ASR engine before accepting, so a bad choice is refused like bad auth
+        try:
+            asr_engine = await asyncio.to_thread(asr_engines.get_engine, engine)
+        except asr_engines.EngineUnavailable as e:
+            log.warning("Dictation WS %s refused: %s", session_id, e)
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Unknown or unavailable ASR engine")
+            raise WebSocketDisconnect(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+
         # 1. Accept Connection & Initialize Session State
-        await manager.connect(session_id, websocket)
+        subprotocol = dictation_protocol.choose_subprotocol(websocket.scope.get("subprotocols", []))
+        msgpack_encoded = subprotocol == dictation_protocol.SUBPROTOCOL_V3_MSGPACK
+        await manager.connect(session_id, websocket, subprotocol=subprotocol,
+                              binary_encoder=dictation_protocol.encode_msgpack if msgpack_encoded else None)
         state = SessionState(session_id)
+        state.protocol = dictation_protocol.protocol_name(subprotocol)
         state.encounter_id = encounter_id
         state.author_id = current_user.id
         state.note_type = "doctor_dictation" # Set note type for this specific endpoint
         active_session_states[session_id] = state
 
-        await manager.send_json(session_id, {"status": "connected", "message": f"Starting dictation for encounter {encounter_id}..."})
-        log.info(f"Dictation WS connected: session {session_id}, encounter {encounter_id}, user {current_user.id}")
+        await manager.send_json(session_id, {"status": "connected", "protocol": state.protocol,
+                                             "encoding": "msgpack" if msgpack_encoded else "json",
+                                             "message": f"Starting dictation for encounter {encounter_id}..."})
+        log.info("Dictation WS connected: session %s, encounter %s, user %s, protocol %s",
+                 session_id, encounter_id, current_user.id, state.protocol)
 
         # 2. Define Concurrent Tasks
 
-        # Task A: Receives audio chunks from the App and puts them in the queue
-        async def receive_audio_task():
-            log.info(f"[{session_id}] Starting audio receive task.")
+        # Task A: Receives audio chunks from the App and puts them in the session's audio buffer.
+        # Returns the close code when the server should end the session (v2 "stop", buffer overflow).
+        async def receive_audio_task() -> Optional[int]:
+            log.debug("[%s] Starting audio receive task.", session_id)
+            span = tracing.start_detached_span("ws.receive_audio")
+            chunks = received_bytes = 0
+            close_code = None
+            # Whatever the client sends becomes 16 kHz mono LINEAR16 in the session's audio buffer
+            decoder = transcoder.AudioDecoder(state.audio.put, session_id)
             while state and state.is_active:
                 try:
                     # Use websocket.receive() to handle both binary and text frames.
                     msg = await websocket.receive()
-                    audio_chunk = None
-                    # msg is a dict like {'type': 'websocket.receive', 'bytes': b'..'} or {'type': 'websocket.receive', 'text': '...'}
-                    if isinstance(msg, dict):
-                        if 'bytes' in msg and msg.get('bytes') is not None:
-                            audio_chunk = msg.get('bytes')
-                        elif 'text' in msg and msg.get('text'):
-                            # We expect base64-encoded audio sent as text frames from the RN client
-                            import base64
-                            try:
-                                audio_chunk = base64.b64decode(msg.get('text'))
-                            except Exception as _e:
-                                log.warning(f"[{session_id}] Received non-audio text frame or failed to decode base64.")
-                                audio_chunk = None
-                    else:
-                        # Fallback: try receive_bytes (older behaviour)
+                    if msg.get("type") == "websocket.disconnect":
+                        log.debug("[%s] Receive task: client closed the connection.", session_id)
+                        break
+                    data, text = msg.get("bytes"), msg.get("text")
+                    audio_chunk = codec = None # Legacy clients: no codec, the decoder recognises the format
+                    sample_rate = transcoder.TARGET_RATE_HZ # Legacy clients: headerless audio is 16 kHz
+                    if state.protocol != "legacy": # v2 and v3 share framing and control messages
+                        try:
+                            if data is not None:
+                                frame = frame_audio(state, data)
+                                if frame is not None:
+                                    audio_chunk, sample_rate, codec = frame.payload, frame.sample_rate, frame.codec
+                            elif text:
+                                control = dictation_protocol.parse_control(text)
+                                if control["type"] == "stop":
+                                    log.debug("[%s] Receive task: client sent stop.", session_id)
+                                    close_code = status.WS_1000_NORMAL_CLOSURE
+                                    break
+                                if control["type"] == "flush":
+                                    await wait_for_drain(state)
+                                    await manager.send_json(session_id, {"type": "flushed", "sequence": state.last_sequence})
+                                else: # start
+                                    await manager.send_json(session_id, {
+                                        "type": "started", "codecs": dictation_protocol.supported_codecs(transcoder.ffmpeg_path() is not None),
+                                        "preferred_sample_rate": transcoder.TARGET_RATE_HZ, # Other rates are resampled
+                                    })
+                        except ProtocolError as e:
+                            log.warning("[%s] Protocol error: %s", session_id, e)
+                            await manager.send_json(session_id, {"status": "protocol_error", "message": str(e)})
+                    elif data is not None:
+                        audio_chunk = data
+                    elif text:
+                        # Legacy clients send base64-encoded audio as text frames
                         try:
-                            audio_chunk = await websocket.receive_bytes()
-                        except Exception:
-                            audio_chunk = None
-
-                    if audio_chunk and state and state.audio_queue:
-                        await state.audio_queue.put(audio_chunk)
-                        log.debug(f"[{session_id}] Received {len(audio_chunk)} audio bytes.")
-                    else:
-                        # If no audio was parsed, continue the loop (or break on disconnect)
-                        continue
+                            audio_chunk = base64.b64decode(text)
+                        except ValueError:
+                            log.warning("[%s] Received non-audio text frame or failed to decode base64.", session_id)
+
+                    if audio_chunk and state:
+                        if state.first_audio_at is None:
+                            state.first_audio_at = time.monotonic()
+                        chunks += 1
+                        received_bytes += len(audio_chunk)
+                        log.debug("[%s] Received %s audio bytes.", session_id, len(audio_chunk))
+                        try:
+                            # May wait for buffer space (policy block): the socket is not read meanwhile
+                            await decoder.feed(audio_chunk, sample_rate=sample_rate, codec=codec)
+                        except transcoder.DecodeError as e:
+                            log.warning("[%s] Could not decode audio: %s", session_id, e)
+                            await manager.send_json(session_id, {"status": "decode_error", "message": str(e)})
                 except WebSocketDisconnect:
-                    log.warning(f"[{session_id}] Receive task: WebSocket disconnected by client.")
+                    log.warning("[%s] Receive task: WebSocket disconnected by client.", session_id)
                     break # Exit loop cleanly on disconnect
+                except AudioBufferOverflow as e:
+                    # Policy fail: stop taking audio; what was recognised so far is still saved
+                    log.warning("[%s] Audio buffer overflow, ending session: %s", session_id, e)
+                    dictation_audio_overflows.inc()
+                    close_code = status.WS_1013_TRY_AGAIN_LATER
+                    await manager.send_json(session_id, {"status": "overloaded", "message": "Audio is arriving faster than it can be transcribed."})
+                    break
                 except Exception as e:
-                    log.error(f"[{session_id}] Receive task error: {e}", exc_info=True)
+                    log.error("[%s] Receive task error: %s", session_id, e, exc_info=True)
                     break # Exit loop on other errors
-            # Signal end of stream to processing task by putting None in queue
-            if state and state.audio_queue:
-                await state.audio_queue.put(None)
-            log.info(f"[{session_id}] Audio receive task finished.")
+            # Flush the decoder, then signal end of stream to the processing task
+            try:
+                await decoder.close()
+            except Exception as e:
+                log.warning("[%s] Audio decoder did not flush cleanly: %s", session_id, e)
+            if state:
+                state.audio_ended_at = time.monotonic()
+                state.audio.close()
+            span.set_attribute("ws.chunks", chunks)
+            span.set_attribute("ws.bytes", received_bytes)
+            span.end()
+            log.debug("[%s] Audio receive task finished.", session_id)
+            return close_code
 
         # Task B: Processes audio queue via ASR service and handles saving
         # This function must exist in app/services/asr_service.py
-        processing_task = asr_service.process_dictation_and_save_note(websocket, state)
+        processing_task = asr_service.process_dictation_and_save_note(websocket, state, engine=asr_engine)
 
         # 3. Run Receive and Process Tasks Concurrently
-        log.info(f"[{session_id}] Starting concurrent receive and process tasks.")
+        log.debug("[%s] Starting concurrent receive and process tasks.", session_id)
         # `gather` waits for both tasks to complete or for one to raise an exception
-        await asyncio.gather(receive_audio_task(), processing_task)
-        log.info(f"[{session_id}] Concurrent tasks finished.")
+        close_code, _ = await asyncio.gather(receive_audio_task(), processing_task)
+        log.debug("[%s] Concurrent tasks finished.", session_id)
+        if close_code is not None:
+            # The note has been saved (or the failure reported); end the session
+            await websocket.close(code=close_code)
 
     except WebSocketDisconnect as e:
         # Handle disconnections raised by auth or during operation
-        log.warning(f"WebSocket client {session_id} disconnected: Code {e.code}, Reason: {e.reason}")
+        log.warning("WebSocket client %s disconnected: Code %s, Reason: %s", session_id, e.code, e.reason)
 
     except Exception as e:
         # Catch unexpected errors during setup or task running
-        log.error(f"Unhandled error in dictation session {session_id}: {e}", exc_info=True)
+        log.error("Unhandled error in dictation session %s: %s", session_id, e, exc_info=True)
         # Attempt to inform client before closing (may fail if connection is already lost)
         try:
             # Check connection state before sending
@@ -231,16 +396,12 @@ async def websocket_dictation_endpoint(
 
     finally:
         # --- Final Cleanup Logic ---
-        log.info(f"Cleaning up dictation WS session {session_id}.")
+        log.debug("Cleaning up dictation WS session %s.", session_id)
         # Ensure state flags are set correctly to signal other tasks
         if state:
             state.is_active = False
-            # Try to put None in queue if it wasn't already to help generator exit gracefully
-            if state.audio_queue:
-                try:
-                    state.audio_queue.put_nowait(None)
-                except asyncio.QueueFull:
-                    pass # Queue might be full if already signaled
+            # Close the buffer if it wasn't already, so the generator exits gracefully
+            state.audio.close()
 
         # Disconnect manager and remove state reference
         manager.disconnect(session_id)
@@ -254,4 +415,4 @@ async def websocket_dictation_endpoint(
         # except Exception:
         #     pass # Ignore errors during final close
 
-        log.info(f"Dictation WS session {session_id} cleanup complete.")
\ No newline at end of file
+        log.info("Dictation WS session %s cleanup complete.", session_id)
\ No newline at end of file
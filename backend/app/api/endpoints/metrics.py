@@ -0,0 +1,27 @@
+# app/api/endpoints/metrics.py
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import Response
+
+from app.core import metrics
+from app.core.config import settings
+
+router = APIRouter()
+
+def require_scrape_token(authorization: Optional[str] = Header(None)) -> None:
+    """Admits scrapes that send METRICS_TOKEN as a bearer token (Prometheus `authorization` / `bearer_token`)."""
+    scheme, _, token = (authorization or "").partition(" ")
+    expected = settings.METRICS_TOKEN
+    if not expected or scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Metrics scraping needs the METRICS_TOKEN bearer token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_scrape_token)])
+def read_metrics() -> Response:
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -36,15 +36,15 @@ def register_new_patient(
     """
     Register a new patient. Requires authentication.
     """
-    log.info(f"Received request to register patient: {patient_in.full_name}")
+    log.debug("Received request to register patient: %s", patient_in.full_name)
     patient = patient_service.create_patient(db=db, patient_in=patient_in)
     if patient is None:
-        log.error(f"Failed to register patient: {patient_in.full_name}. Service returned None.")
+        log.error("Failed to register patient: %s. Service returned None.", patient_in.full_name)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, # Or 400 if ID collision is likely
             detail="Could not register patient due to an internal error.",
         )
-    log.info(f"Successfully registered patient ID: {patient.id}")
+    log.debug("Successfully registered patient ID: %s", patient.id)
     return patient
 
 # --- ENDPOINT 2: GET PATIENT DETAILS BY ID ---
@@ -64,15 +64,15 @@ def get_patient_details(
     """
     Retrieve details for a specific patient by their ID.
     """
-    log.info(f"Request received to fetch patient details for ID: {patient_id}")
+    log.debug("Request received to fetch patient details for ID: %s", patient_id)
     patient = patient_service.get_patient_by_id(db=db, patient_id=patient_id)
     if patient is None:
-        log.warning(f"Patient with ID '{patient_id}' not found.")
+        log.warning("Patient with ID '%s' not found.", patient_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found",
         )
-    log.info(f"Returning details for patient ID: {patient.id}")
+    log.debug("Returning details for patient ID: %s", patient.id)
     return patient
 
 # --- ENDPOINT 3: SEARCH FOR PATIENTS BY NAME ---
@@ -94,11 +94,11 @@ def search_for_patients(
     """
     Search for patients by name with pagination.
     """
-    log.info(f"Received patient search request with query: '{query}'")
+    log.debug("Received patient search request with query: '%s'", query)
     patients = patient_service.search_patients_by_name(
         db=db, name_query=query, skip=skip, limit=limit
     )
-    log.info(f"Returning {len(patients)} patients for search query: '{query}'")
+    log.debug("Returning %s patients for search query: '%s'", len(patients), query)
     return patients
 
 # --- ENDPOINT 4: GET PATIENT HISTORY TIMELINE ---
@@ -118,7 +118,7 @@ def get_patient_history_endpoint(
     """
     Retrieves the comprehensive history for a given patient ID. Requires authentication.
     """
-    log.info(f"Request received for history of patient ID: {patient_id}")
+    log.debug("Request received for history of patient ID: %s", patient_id)
     # First, check if the patient exists (optional but good practice)
     patient = patient_service.get_patient_by_id(db=db, patient_id=patient_id)
     if patient is None:
@@ -128,5 +128,5 @@ def get_patient_history_endpoint(
         )
     # Call the service function to generate the unified history timeline
     history = patient_service.get_patient_history(db=db, patient_id=patient_id)
-    log.info(f"Returning {len(history)} history items for patient ID: {patient_id}")
+    log.debug("Returning %s history items for patient ID: %s", len(history), patient_id)
     return history
\ No newline at end of file
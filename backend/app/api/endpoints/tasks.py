@@ -8,7 +8,8 @@ from sqlalchemy.orm import Session
 # Import project components
 from app.api import deps
 from app.db.session import get_db
-from app.models.user import User, UserRole # Import UserRole if needed for deps
+from app.core.auth_cache import Principal
+from app.models.user import UserRole # Import UserRole if needed for deps
 from app.models.task import TaskStatus # Import TaskStatus enum
 from app.schemas.task import TaskCreate, TaskRead, TaskUpdate # Import all task schemas
 from app.services import task_service # Import the task service
@@ -32,25 +33,25 @@ def create_new_task(
     *,
     db: Session = Depends(get_db),
     task_in: TaskCreate, # Validate request body against TaskCreate schema
-    current_user: User = Depends(deps.get_current_user) # Get user for logging/auditing
+    current_user: Principal = Depends(deps.get_current_user) # Get user for logging/auditing
 ) -> Any:
     """
     Create a new nurse task. Requires authentication.
     """
-    log.info(f"User {current_user.id} attempting to create task for encounter: {task_in.encounter_id}")
+    log.debug("User %s attempting to create task for encounter: %s", current_user.id, task_in.encounter_id)
 
     # Call the service function to create the task
     task = task_service.create_task(db=db, task_in=task_in)
 
     # Handle potential creation failures
     if task is None:
-        log.error(f"Failed to create task for encounter: {task_in.encounter_id}. Service returned None.")
+        log.error("Failed to create task for encounter: %s. Service returned None.", task_in.encounter_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, # Or 404 if encounter/nurse not found
             detail="Could not create task. Check if encounter and assigned nurse exist.",
         )
 
-    log.info(f"Successfully created task ID: {task.id} for encounter {task.encounter_id}")
+    log.debug("Successfully created task ID: %s for encounter %s", task.id, task.encounter_id)
     return task
 
 # --- ENDPOINT 2: GET TASKS FOR ENCOUNTER ---
@@ -84,11 +85,11 @@ def get_tasks_for_encounter_endpoint(
 def get_my_pending_tasks_endpoint(
     *,
     db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """Retrieves the current authenticated user's pending tasks."""
     if current_user.role not in [UserRole.NURSE, UserRole.ADMIN]: # Use Enum
-        log.warning(f"User {current_user.username} tried to access dashboard tasks but role is {current_user.role}.")
+        log.warning("User %s tried to access dashboard tasks but role is %s.", current_user.username, current_user.role)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Only Nurses/Admins can retrieve their tasks via this endpoint.",
@@ -111,7 +112,7 @@ def complete_task_endpoint(
     *,
     db: Session = Depends(get_db),
     task_id: int,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """Marks a nurse task as completed."""
     if current_user.role not in [UserRole.NURSE, UserRole.DOCTOR, UserRole.ADMIN]: # Use Enum
@@ -0,0 +1,132 @@
+# app/core/auth_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.security import decode_token
+from app.models.user import UserRole
+
+log = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+# --- Authenticated Principal ---
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Slim, immutable snapshot of an authenticated user.
+    Returned by the auth dependencies instead of a full ORM `User`, so checking
+    a request's identity never touches the database or lazy-loads relationships.
+    """
+    id: int
+    username: str
+    role: UserRole
+
+
+# --- Bounded LRU with optional expiry ---
+class LRUCache(Generic[V]):
+    """Thread-safe, size-bounded LRU cache whose entries carry an absolute expiry time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._data: "OrderedDict[Hashable, tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[V]:
+        """Returns the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= (now if now is not None else time.time()):
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V, expires_at: float) -> None:
+        """Stores a value until `expires_at` (epoch seconds), evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# --- Cache Instances ---
+# Verified JWTs: token string -> subject, valid until the token's own 'exp'.
+token_cache: LRUCache[str] = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+# Rejected JWTs (bad signature, expired, malformed): token string -> True, for AUTH_REJECTED_TOKEN_CACHE_TTL_SECONDS.
+rejected_token_cache: LRUCache[bool] = LRUCache(settings.AUTH_REJECTED_TOKEN_CACHE_SIZE)
+# Principals: username -> Principal, valid for AUTH_PRINCIPAL_CACHE_TTL_SECONDS.
+principal_cache: LRUCache[Principal] = LRUCache(settings.AUTH_PRINCIPAL_CACHE_SIZE)
+
+
+def get_cached_subject(token: str) -> Optional[str]:
+    """Returns the subject of a previously verified, still unexpired token."""
+    return token_cache.get(token)
+
+
+def cache_verified_token(token: str, payload: dict[str, Any]) -> None:
+    """Remembers a verified token until its 'exp' claim (tokens without one are not cached)."""
+    subject, expires_at = payload.get("sub"), payload.get("exp")
+    if subject is None or expires_at is None:
+        return
+    token_cache.set(token, str(subject), float(expires_at))
+
+
+def get_token_subject(token: str) -> Optional[str]:
+    """
+    Returns the subject of a valid JWT, consulting the verified-token LRU first
+    so repeat requests with the same token skip signature verification. Tokens
+    that failed verification are remembered too, so a client retrying with a
+    bad one is not decoded (and logged) on every request.
+    """
+    subject = get_cached_subject(token)
+    if subject is not None:
+        return subject
+    if rejected_token_cache.get(token):
+        return None
+    payload = decode_token(token)
+    if payload is None:
+        rejected_token_cache.set(token, True, time.time() + settings.AUTH_REJECTED_TOKEN_CACHE_TTL_SECONDS)
+        return None
+    cache_verified_token(token, payload)
+    return str(payload["sub"])
+
+
+def get_cached_principal(username: str) -> Optional[Principal]:
+    return principal_cache.get(username)
+
+
+def cache_principal(principal: Principal) -> None:
+    principal_cache.set(
+        principal.username, principal, time.time() + settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+    )
+
+
+def invalidate_user(username: str) -> None:
+    """
+    Drops the cached principal for a user. Registered as a user_service change hook.
+    Cached tokens stay valid (they only carry the subject); the next request
+    re-reads the user row and picks up the new role or removal.
+    """
+    principal_cache.pop(username)
+    log.debug("Invalidated cached principal for user: %s", username)
@@ -4,8 +4,7 @@ import os
 from dotenv import load_dotenv
 import logging # Added for better debugging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
 
 # --- Load Environment Variables ---
 # Construct the path to the .env file relative to this config.py file
@@ -15,9 +14,9 @@ env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__
 # Explicitly load the .env file before initializing Settings
 if os.path.exists(env_path):
     load_dotenv(dotenv_path=env_path)
-    logging.info(f"Successfully loaded .env file from: {env_path}")
+    log.info("Successfully loaded .env file from: %s", env_path)
 else:
-    logging.warning(f".env file not found at expected path: {env_path}. Relying on environment variables.")
+    log.warning(".env file not found at expected path: %s. Relying on environment variables.", env_path)
 
 # --- Settings Model ---
 class Settings(BaseSettings):
@@ -30,6 +29,138 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "!!!REPLACE_WITH_A_REAL_SECRET_KEY_IN_DOTENV!!!")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60)) # Using 60 mins as discussed
+    # Refresh tokens outlive access tokens; default covers a 12-hour shift plus handover
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", 14 * 60))
+
+    # Patient ID allocation: how many sequence numbers each worker reserves per DB round trip
+    PATIENT_ID_BLOCK_SIZE: int = int(os.getenv("PATIENT_ID_BLOCK_SIZE", 50))
+
+    # Auth caches: verified JWTs (LRU, bounded by token expiry), rejected ones (LRU + TTL) and user snapshots (LRU + TTL)
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    AUTH_REJECTED_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_REJECTED_TOKEN_CACHE_SIZE", 1000))
+    AUTH_REJECTED_TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_REJECTED_TOKEN_CACHE_TTL_SECONDS", 300))
+    AUTH_PRINCIPAL_CACHE_SIZE: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", 5000))
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_TTL_SECONDS", 60))
+
+    # Password hashing: bcrypt cost and the dedicated process pool (0 workers = hash in threads)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+
+    # Rate limiting: token buckets per user (JWT subject) and per client IP.
+    # IP buckets are roomier since a whole ward may sit behind one NAT address.
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory") # "memory" or "redis"
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_USER_CAPACITY: float = float(os.getenv("RATE_LIMIT_USER_CAPACITY", 120))
+    RATE_LIMIT_USER_REFILL_PER_SEC: float = float(os.getenv("RATE_LIMIT_USER_REFILL_PER_SEC", 10))
+    RATE_LIMIT_IP_CAPACITY: float = float(os.getenv("RATE_LIMIT_IP_CAPACITY", 600))
+    RATE_LIMIT_IP_REFILL_PER_SEC: float = float(os.getenv("RATE_LIMIT_IP_REFILL_PER_SEC", 50))
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+    RATE_LIMIT_ROUTE_COSTS: str = os.getenv("RATE_LIMIT_ROUTE_COSTS", "") # JSON overrides, see app/core/rate_limit.py
+
+    # Logging: records are queued and written by a background thread (see app/core/logging_config.py)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower() # "json" or "text"
+
+    # Metrics: Prometheus endpoint at /metrics plus the HTTP timing middleware. Labels include live dictation
+    # session IDs, so scrapers must send "Authorization: Bearer <METRICS_TOKEN>" (unset = every scrape is refused)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Tracing: spans for requests, services, SQL and ASR phases, exported in batches
+    # to a local JSONL file (works offline) or an OTLP/HTTP collector
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", 0.1)) # Fraction of root spans kept
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "file") # "file" or "otlp"
+    TRACING_FILE_PATH: str = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "hvs-backend")
+    TRACING_MAX_QUEUE: int = int(os.getenv("TRACING_MAX_QUEUE", 10000))
+    TRACING_EXPORT_INTERVAL_SECONDS: float = float(os.getenv("TRACING_EXPORT_INTERVAL_SECONDS", 2))
+    TRACING_MAX_STATEMENT_LENGTH: int = int(os.getenv("TRACING_MAX_STATEMENT_LENGTH", 2000))
+
+    # Profiling: admin-only sampling profiler (/api/v1/admin/profile and the X-Profile request header)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 10))
+    PROFILE_REQUEST_INTERVAL_MS: float = float(os.getenv("PROFILE_REQUEST_INTERVAL_MS", 1))
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+
+    # Event loop monitor: heartbeat interval and the lag at which the blocking stack is logged
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL_MS: float = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+    LOOP_LAG_THRESHOLD_MS: float = float(os.getenv("LOOP_LAG_THRESHOLD_MS", 250))
+
+    # Memory accounting: RSS sampling for trends, per-worker budget alerts (0 = off), tracemalloc snapshots
+    MEMORY_SAMPLE_INTERVAL_SECONDS: float = float(os.getenv("MEMORY_SAMPLE_INTERVAL_SECONDS", 30))
+    MEMORY_HISTORY_SIZE: int = int(os.getenv("MEMORY_HISTORY_SIZE", 960)) # 8 hours at 30s
+    MEMORY_BUDGET_MB: int = int(os.getenv("MEMORY_BUDGET_MB", 0))
+    MEMORY_SNAPSHOT_KEEP: int = int(os.getenv("MEMORY_SNAPSHOT_KEEP", 5))
+    TRACEMALLOC_FRAMES: int = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+    TRACEMALLOC_AT_STARTUP: bool = os.getenv("TRACEMALLOC_AT_STARTUP", "false").lower() == "true"
+
+    # Per-session audio buffer: byte budget (default 10s of 16 kHz LINEAR16, preallocated) and what happens when it is
+    # full - "block" (stop reading the socket), "drop_oldest" (lose the oldest audio) or "fail" (end the session)
+    DICTATION_BUFFER_BYTES: int = int(os.getenv("DICTATION_BUFFER_BYTES", 320000))
+    DICTATION_OVERLOAD_POLICY: str = os.getenv("DICTATION_OVERLOAD_POLICY", "block").lower()
+    DICTATION_ASR_CHUNK_BYTES: int = int(os.getenv("DICTATION_ASR_CHUNK_BYTES", 8000)) # Max audio per ASR request (250ms)
+    # Voice activity detection before the ASR stream (app/utils/vad.py): only speech, extended by the hangover and
+    # padding, is sent; during longer silences a short frame of digital silence goes out every KEEPALIVE seconds,
+    # since streaming recognizers end streams that receive no audio
+    DICTATION_VAD_ENABLED: bool = os.getenv("DICTATION_VAD_ENABLED", "true").lower() == "true"
+    DICTATION_VAD_SNR_DB: float = float(os.getenv("DICTATION_VAD_SNR_DB", 9))
+    DICTATION_VAD_HANGOVER_MS: float = float(os.getenv("DICTATION_VAD_HANGOVER_MS", 300))
+    DICTATION_VAD_PADDING_MS: float = float(os.getenv("DICTATION_VAD_PADDING_MS", 200))
+    DICTATION_VAD_KEEPALIVE_SECONDS: float = float(os.getenv("DICTATION_VAD_KEEPALIVE_SECONDS", 5))
+    # Interim transcript results sent per second per dictation session at most (newer ones replace held ones;
+    # finals are never held back); 0 sends every result (app/utils/transcript_updates.py)
+    DICTATION_INTERIM_MAX_RATE: float = float(os.getenv("DICTATION_INTERIM_MAX_RATE", 4))
+    # WebSocket permessage-deflate is negotiated by the server, not the app: the uvicorn CLI reads this same variable
+    # (UVICORN_WS_PER_MESSAGE_DEFLATE=false, or --no-ws-per-message-deflate); `python -m app.main` passes it on
+    UVICORN_WS_PER_MESSAGE_DEFLATE: bool = os.getenv("UVICORN_WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+    # Draft notes for live dictation (app/services/draft_notes.py): final segments are appended to the session's draft
+    # row every FLUSH seconds or FLUSH_SEGMENTS segments, whichever comes first; a draft not written for STALE seconds
+    # belongs to a session that died with its process and is promoted to a note by the recovery sweep
+    DICTATION_DRAFT_FLUSH_SECONDS: float = float(os.getenv("DICTATION_DRAFT_FLUSH_SECONDS", 5))
+    DICTATION_DRAFT_FLUSH_SEGMENTS: int = int(os.getenv("DICTATION_DRAFT_FLUSH_SEGMENTS", 10))
+    DICTATION_DRAFT_STALE_SECONDS: float = float(os.getenv("DICTATION_DRAFT_STALE_SECONDS", 120))
+
+    # Transcription jobs for uploaded recordings (app/services/transcription_jobs.py): where uploads are spooled,
+    # workers per process (0 = this process only enqueues), attempts and retry backoff (doubling per attempt),
+    # how long a running job may go without a heartbeat before another worker takes it over, how often progress
+    # is written, and the idle poll interval
+    DICTATION_UPLOAD_DIR: str = os.getenv("DICTATION_UPLOAD_DIR", "dictation_uploads")
+    DICTATION_JOB_WORKERS: int = int(os.getenv("DICTATION_JOB_WORKERS", 2))
+    DICTATION_JOB_MAX_ATTEMPTS: int = int(os.getenv("DICTATION_JOB_MAX_ATTEMPTS", 3))
+    DICTATION_JOB_RETRY_BACKOFF_SECONDS: float = float(os.getenv("DICTATION_JOB_RETRY_BACKOFF_SECONDS", 30))
+    DICTATION_JOB_LEASE_SECONDS: float = float(os.getenv("DICTATION_JOB_LEASE_SECONDS", 600))
+    DICTATION_JOB_PROGRESS_INTERVAL_SECONDS: float = float(os.getenv("DICTATION_JOB_PROGRESS_INTERVAL_SECONDS", 2))
+    DICTATION_JOB_POLL_SECONDS: float = float(os.getenv("DICTATION_JOB_POLL_SECONDS", 5))
+    # Long recordings are split at pauses into chunks of about DICTATION_CHUNK_SECONDS (cut points searched in the
+    # last DICTATION_CHUNK_SEARCH_SECONDS; chunk plus both overlaps stays under the engines' 60s one-shot limit),
+    # overlapping their neighbours by DICTATION_CHUNK_OVERLAP_SECONDS where a cut goes through speech, and recognised this many at a time per file
+    DICTATION_CHUNK_SECONDS: float = float(os.getenv("DICTATION_CHUNK_SECONDS", 50))
+    DICTATION_CHUNK_SEARCH_SECONDS: float = float(os.getenv("DICTATION_CHUNK_SEARCH_SECONDS", 10))
+    DICTATION_CHUNK_OVERLAP_SECONDS: float = float(os.getenv("DICTATION_CHUNK_OVERLAP_SECONDS", 1))
+    DICTATION_CHUNK_CONCURRENCY: int = int(os.getenv("DICTATION_CHUNK_CONCURRENCY", 4))
+
+    # ffmpeg binary for decoding compressed dictation audio and uploads (app/services/transcoder.py)
+    FFMPEG_PATH: str = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+    # Speech recognition engines (app/services/asr_engines.py): the deployment default, others that
+    # clients may pick per request (comma-separated), and the Vosk model directory for on-box recognition.
+    # "fake" is a deterministic offline stand-in for load tests and local development
+    ASR_ENGINE: str = os.getenv("ASR_ENGINE", "google").lower() # google | vosk | fake
+    ASR_ENGINES_ENABLED: str = os.getenv("ASR_ENGINES_ENABLED", "")
+    VOSK_MODEL_PATH: str = os.getenv("VOSK_MODEL_PATH", "")
+    # Cloud Speech channel pool: channels opened in the lifespan and shared by all sessions
+    ASR_POOL_SIZE: int = int(os.getenv("ASR_POOL_SIZE", 4))
+    ASR_POOL_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("ASR_POOL_HEALTH_INTERVAL_SECONDS", 30))
+    ASR_POOL_WARM_TIMEOUT_SECONDS: float = float(os.getenv("ASR_POOL_WARM_TIMEOUT_SECONDS", 10))
+    FAKE_ASR_LATENCY_MS: float = float(os.getenv("FAKE_ASR_LATENCY_MS", 300)) # Audio-to-result delay
+    FAKE_ASR_INTERIM_MS: float = float(os.getenv("FAKE_ASR_INTERIM_MS", 500)) # Audio per interim result
+    FAKE_ASR_UTTERANCE_MS: float = float(os.getenv("FAKE_ASR_UTTERANCE_MS", 3000)) # Audio per final result
+    FAKE_ASR_BATCH_RTF: float = float(os.getenv("FAKE_ASR_BATCH_RTF", 0)) # One-shot recognition time per second of audio
 
     class Config:
         # Pydantic-settings uses python-dotenv automatically if installed,
@@ -44,10 +175,10 @@ try:
     # --- TEMPORARY DEBUG PRINT ---
     print(f"DEBUG: Loaded DATABASE_URL = '{settings.DATABASE_URL}'")
     # --- END DEBUG PRINT ---
-    logging.info(f"Database URL loaded (partial): {settings.DATABASE_URL[:15]}...")
+    log.info("Database URL loaded (partial): %s...", settings.DATABASE_URL[:15])
     # ... (rest of the logging and error handling) ...
 except Exception as e:
-    logging.critical(f"FATAL ERROR: Could not load settings. Check .env file and environment variables. Error: {e}", exc_info=True)
+    log.critical("FATAL ERROR: Could not load settings. Check .env file and environment variables. Error: %s", e, exc_info=True)
     # Depending on deployment strategy, you might want the application to exit if settings fail
     raise SystemExit(f"FATAL ERROR loading settings: {e}")
 
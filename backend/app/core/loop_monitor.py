@@ -0,0 +1,136 @@
+# app/core/loop_monitor.py
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+# Frames outside the stdlib and installed packages are "ours"; the blocking call site is the innermost one
+_LIBRARY_DIRS = tuple({
+    os.path.abspath(sysconfig.get_paths()[key]) for key in ("stdlib", "platstdlib", "purelib", "platlib")
+})
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+event_loop_lag = metrics.gauge(
+    "event_loop_lag_seconds", "Most recent event loop scheduling delay.",
+)
+event_loop_lag_distribution = metrics.histogram(
+    "event_loop_lag_distribution_seconds", "Distribution of event loop scheduling delay.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_blocked = metrics.counter(
+    "event_loop_blocked_total", "Event loop stalls over the lag threshold, by blocking call site.", ("site",),
+)
+
+
+def _call_site(frames: List[traceback.FrameSummary]) -> str:
+    """The innermost project frame, i.e. the code that made the blocking call (falls back to the innermost frame)."""
+    for frame in reversed(frames):
+        path = os.path.abspath(frame.filename)
+        if not path.startswith(_LIBRARY_DIRS) and not frame.filename.startswith("<"):
+            if path.startswith(_PROJECT_DIR):
+                path = os.path.relpath(path, _PROJECT_DIR)
+            return f"{path}:{frame.lineno} in {frame.name}"
+    if frames:
+        return f"{frames[-1].filename}:{frames[-1].lineno} in {frames[-1].name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag with a heartbeat coroutine (sleep `interval`, measure
+    how late it wakes up) and watches it from a separate thread. When the loop has
+    not completed a heartbeat for longer than `threshold`, the watchdog captures
+    the loop thread's stack while it is still blocked and logs the offending call
+    site and task - synchronous I/O in an `async def` shows up immediately.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._reported_beat: Optional[float] = None # Heartbeat for which the current stall was reported
+        self._stall_site: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    # --- Heartbeat (runs on the loop) ---
+    async def _heartbeat(self) -> None:
+        while True:
+            scheduled = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - scheduled - self.interval)
+            self._last_beat = now
+            event_loop_lag.set(lag)
+            event_loop_lag_distribution.observe(lag)
+            if self._stall_site is not None:
+                log.warning("Event loop was blocked for %.3fs at %s", lag, self._stall_site)
+                self._stall_site = None
+
+    # --- Watchdog (runs on its own thread) ---
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            stalled_for = time.monotonic() - beat - self.interval
+            if stalled_for < self.threshold or self._reported_beat == beat:
+                continue
+            self._reported_beat = beat
+            self._report_stall(stalled_for)
+
+    def _report_stall(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        frames = traceback.extract_stack(frame)
+        site = _call_site(frames)
+        task = asyncio.current_task(self._loop)
+        coro = task.get_coro() if task is not None else None
+        self._stall_site = site
+        event_loop_blocked.inc(site)
+        log.warning(
+            "Event loop blocked for over %.3fs by %s (task: %s)\n%s",
+            stalled_for, site,
+            getattr(coro, "__qualname__", None) or (task.get_name() if task is not None else "none"),
+            "".join(traceback.format_list(frames[-15:])).rstrip(),
+        )
+
+    # --- Lifecycle ---
+    def start(self) -> None:
+        """Starts monitoring the running loop; call from within it (e.g. the app lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-monitor-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        log.info("Event loop monitor started (interval %sms, threshold %sms)",
+                 self.interval * 1000, self.threshold * 1000)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+
+def create_loop_monitor() -> LoopMonitor:
+    return LoopMonitor(
+        settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+        settings.LOOP_LAG_THRESHOLD_MS / 1000,
+    )
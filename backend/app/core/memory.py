@@ -0,0 +1,235 @@
+# app/core/memory.py
+import itertools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+# --- Resident Set Size ---
+def read_rss_bytes() -> Optional[int]:
+    """Current RSS of this process from /proc (Linux); None where unavailable."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass(frozen=True)
+class RssSample:
+    timestamp: float # Epoch seconds
+    rss_bytes: int
+
+
+# --- Budget Alert Hooks ---
+# Called as hook(rss_bytes, budget_bytes) from the sampler thread when RSS first crosses the budget
+_budget_hooks: List[Callable[[int, int], None]] = []
+
+def register_memory_alert_hook(hook: Callable[[int, int], None]) -> None:
+    """Registers a callable fired when this worker's RSS passes MEMORY_BUDGET_MB."""
+    _budget_hooks.append(hook)
+
+def _fire_budget_hooks(rss_bytes: int, budget_bytes: int) -> None:
+    for hook in _budget_hooks:
+        try:
+            hook(rss_bytes, budget_bytes)
+        except Exception as e:
+            log.error("Memory alert hook %r failed: %s", hook, e, exc_info=True)
+
+
+memory_budget_exceeded = metrics.counter(
+    "memory_budget_exceeded_total", "Times this worker's RSS crossed MEMORY_BUDGET_MB.",
+)
+
+
+# --- RSS Sampler ---
+class RssMonitor:
+    """
+    Samples RSS on a background thread into a bounded history (for trends) and
+    fires the budget hooks when RSS crosses the budget. The alert re-arms once RSS
+    drops below 90% of the budget, so a worker hovering at the limit alerts once.
+    """
+
+    def __init__(self, interval: float, history_size: int, budget_bytes: int):
+        self.interval = interval
+        self.budget_bytes = budget_bytes
+        self.history: Deque[RssSample] = deque(maxlen=history_size)
+        self._over_budget = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> Optional[RssSample]:
+        rss = read_rss_bytes()
+        if rss is None:
+            return None
+        sample = RssSample(time.time(), rss)
+        self.history.append(sample)
+        if self.budget_bytes:
+            if rss >= self.budget_bytes and not self._over_budget:
+                self._over_budget = True
+                memory_budget_exceeded.inc()
+                log.warning("Worker RSS %.1f MB exceeds memory budget of %.1f MB",
+                            rss / MB, self.budget_bytes / MB)
+                _fire_budget_hooks(rss, self.budget_bytes)
+            elif rss < self.budget_bytes * 0.9:
+                self._over_budget = False
+        return sample
+
+    def trend(self) -> Dict[str, Optional[float]]:
+        """Current/min/max RSS and the least-squares growth rate over the kept history."""
+        samples = list(self.history)
+        if not samples:
+            return {"current_mb": None, "min_mb": None, "max_mb": None, "growth_mb_per_hour": None, "window_seconds": 0}
+        rss = [s.rss_bytes for s in samples]
+        growth = None
+        if len(samples) >= 2:
+            t0 = samples[0].timestamp
+            xs = [s.timestamp - t0 for s in samples]
+            mean_x, mean_y = sum(xs) / len(xs), sum(rss) / len(rss)
+            var_x = sum((x - mean_x) ** 2 for x in xs)
+            if var_x > 0:
+                slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, rss)) / var_x
+                growth = round(slope * 3600 / MB, 2)
+        return {
+            "current_mb": round(rss[-1] / MB, 1),
+            "min_mb": round(min(rss) / MB, 1),
+            "max_mb": round(max(rss) / MB, 1),
+            "growth_mb_per_hour": growth,
+            "window_seconds": round(samples[-1].timestamp - samples[0].timestamp),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if read_rss_bytes() is None:
+            log.info("RSS sampling unavailable on this platform (no /proc/self/statm).")
+            return
+        self._thread = threading.Thread(target=self._run, name="rss-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+rss_monitor = RssMonitor(
+    settings.MEMORY_SAMPLE_INTERVAL_SECONDS,
+    settings.MEMORY_HISTORY_SIZE,
+    settings.MEMORY_BUDGET_MB * MB,
+)
+
+metrics.callback_gauge(
+    "process_resident_memory_bytes", "Resident memory size of this worker.", (),
+    lambda: [((), rss)] if (rss := read_rss_bytes()) is not None else [],
+)
+
+
+# --- tracemalloc Snapshots ---
+@dataclass
+class StoredSnapshot:
+    id: int
+    taken_at: float
+    snapshot: tracemalloc.Snapshot
+    traced_current: int
+    traced_peak: int
+
+
+class SnapshotStore:
+    """Keeps the last few tracemalloc snapshots so any two can be diffed."""
+
+    def __init__(self, keep: int):
+        self._snapshots: Deque[StoredSnapshot] = deque(maxlen=max(2, keep))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def take(self) -> StoredSnapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        # Allocations made by tracemalloc itself would otherwise dominate the diffs
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            stored = StoredSnapshot(next(self._ids), time.time(), snapshot, current, peak)
+            self._snapshots.append(stored)
+        return stored
+
+    def get(self, snapshot_id: int) -> Optional[StoredSnapshot]:
+        with self._lock:
+            return next((s for s in self._snapshots if s.id == snapshot_id), None)
+
+    def previous(self, snapshot_id: int) -> Optional[StoredSnapshot]:
+        with self._lock:
+            older = [s for s in self._snapshots if s.id < snapshot_id]
+        return older[-1] if older else None
+
+    def list(self) -> List[StoredSnapshot]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+snapshot_store = SnapshotStore(settings.MEMORY_SNAPSHOT_KEEP)
+
+
+def start_tracemalloc(frames: int) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        log.info("tracemalloc started (%s frames per traceback)", frames)
+
+def stop_tracemalloc() -> None:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        snapshot_store.clear() # Snapshots cannot be compared across tracing sessions
+        log.info("tracemalloc stopped")
+
+
+def top_stats(snapshot: tracemalloc.Snapshot, group_by: str, limit: int) -> List[Dict[str, object]]:
+    return [
+        {"location": _location(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+def diff_stats(old: tracemalloc.Snapshot, new: tracemalloc.Snapshot, group_by: str, limit: int) -> List[Dict[str, object]]:
+    """Largest growth first."""
+    return [
+        {
+            "location": _location(stat.traceback),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+        }
+        for stat in new.compare_to(old, group_by)[:limit]
+    ]
+
+def _location(tb: tracemalloc.Traceback) -> str:
+    # Most recent frame first; read " <- " as "called from"
+    return " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in reversed(tb))
+
+
+def tracemalloc_status() -> Tuple[bool, int, int]:
+    """(tracing, traced bytes now, traced peak bytes)."""
+    if not tracemalloc.is_tracing():
+        return False, 0, 0
+    current, peak = tracemalloc.get_traced_memory()
+    return True, current, peak
@@ -0,0 +1,334 @@
+# app/core/metrics.py
+import bisect
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.routing import resolve_route_template
+
+log = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[LabelValues, float]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Per-thread shards ---
+class _Shards:
+    """
+    One dict per writing thread. A thread only ever mutates its own shard, so
+    updates take no lock; the registry lock is held only the first time a thread
+    writes. Scrapes copy each shard (dict.copy is atomic under the GIL) and merge.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all: List[dict] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._all.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._all)
+        return [shard.copy() for shard in shards]
+
+
+# --- Metric Types ---
+class Metric(ABC):
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(value) for value in labels)
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Sample lines in the text exposition format (the registry adds HELP and TYPE)."""
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._shards = _Shards()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self._shards.mine()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def collect(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._shards.snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards()
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shards.mine()
+        key = self._key(labels)
+        # [count per bucket..., count above the last bucket, sum]
+        cell = shard.get(key)
+        if cell is None:
+            cell = [0.0] * (len(self.buckets) + 2)
+            shard[key] = cell
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the elapsed wall time of its block."""
+        return _Timer(self, labels)
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._shards.snapshots():
+            for key, cell in shard.items():
+                cell = list(cell)
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = cell
+                else:
+                    for i, value in enumerate(cell):
+                        total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, cell in sorted(self.collect().items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), cell[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(cell[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(cumulative)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Sequence[str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Gauge(Metric):
+    """A value that is set directly (last write wins, no lock needed)."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._key(labels)] = float(value)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+            for key, value in sorted(self._values.copy().items())
+        ]
+
+
+class CallbackGauge(Metric):
+    """A gauge read from live state at scrape time (pool sizes, open sessions), so the hot path does nothing."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Sample]]):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            samples = list(self.callback())
+        except Exception as e:
+            log.warning("Metrics callback for %s failed: %s", self.name, e)
+            return []
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in samples]
+
+
+# --- Exposition Helpers ---
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# --- Registry ---
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Text exposition format (Prometheus 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+def callback_gauge(name: str, help_text: str, labelnames: Sequence[str],
+                   callback: Callable[[], Iterable[Sample]]) -> CallbackGauge:
+    return REGISTRY.register(CallbackGauge(name, help_text, labelnames, callback))
+
+
+# --- Application Metrics ---
+# Long-running operations get wider buckets than plain HTTP requests
+ASR_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+http_request_duration = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"),
+)
+http_requests = counter(
+    "http_requests_total", "HTTP responses by route template and status code.", ("method", "route", "status"),
+)
+http_request_errors = counter(
+    "http_request_errors_total", "HTTP requests that failed with a 5xx or an unhandled exception.", ("method", "route"),
+)
+asr_time_to_first_transcript = histogram(
+    "asr_time_to_first_transcript_seconds",
+    "Time from the first audio chunk of a dictation to the first transcript, by ASR engine.",
+    ("engine",), buckets=ASR_BUCKETS,
+)
+asr_final_result_latency = histogram(
+    "asr_final_result_latency_seconds",
+    "Time from the end of a dictation's audio to the ASR stream delivering its final result, by engine.",
+    ("engine",), buckets=ASR_BUCKETS,
+)
+asr_vad_suppressed_ratio = histogram(
+    "asr_vad_suppressed_ratio", "Share of a dictation session's audio withheld from the ASR stream as silence.", (),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+asr_audio_seconds = counter(
+    "asr_audio_seconds_total", "Dictation audio after voice activity detection, by disposition (forwarded, suppressed).",
+    ("disposition",),
+)
+asr_transcript_results = counter(
+    "asr_transcript_results_total",
+    "Dictation ASR results, by delivery (sent, or coalesced into a later interim result or a final).", ("delivery",),
+)
+note_save_duration = histogram(
+    "note_save_duration_seconds", "Duration of clinical note saves (validation, insert and commit).", ("outcome",),
+)
+
+
+# --- ASGI Middleware ---
+class MetricsMiddleware:
+    """
+    Records latency, status and errors of HTTP requests, labelled by route template
+    (not the concrete URL) so label cardinality stays bounded. WebSockets are
+    tracked by the dictation session gauges instead.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute]):
+        self.app = app
+        self.routes = routes # Shared list with the app router, so later include_router calls are seen
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = resolve_route_template(self.routes, scope) or "unmatched"
+        status_code: Optional[int] = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            http_request_errors.inc(method, route)
+            raise
+        else:
+            if status_code is not None and status_code >= 500:
+                http_request_errors.inc(method, route)
+        finally:
+            http_request_duration.observe(time.perf_counter() - start, method, route)
+            http_requests.inc(method, route, str(status_code or 500))
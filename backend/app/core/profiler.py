@@ -0,0 +1,209 @@
+# app/core/profiler.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+MAX_STACK_DEPTH = 128
+CONTENT_TYPE = "text/plain; charset=utf-8"
+
+# Only one whole-process profile at a time; they are expensive to run concurrently
+process_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a whole-process profile is already running."""
+
+
+# --- Stack Sampling ---
+def _frame_label(code: CodeType) -> str:
+    # Function-level granularity keeps flamegraphs readable; the line is the def line
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _stack(frame: Optional[FrameType]) -> List[FrameType]:
+    """Frames from outermost to innermost."""
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread snapshots the stacks of other threads
+    via sys._current_frames() every `interval` seconds and counts identical stacks.
+    Nothing is instrumented, so the profiled code runs at (nearly) full speed.
+
+    `accept(thread_id, frames)` may narrow sampling to particular threads or stacks.
+    """
+
+    def __init__(self, interval: float, accept: Optional[Callable[[int, List[FrameType]], bool]] = None):
+        self.interval = max(0.0005, interval)
+        self.accept = accept
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample_once(self) -> None:
+        own_id = threading.get_ident()
+        names: Dict[int, str] = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = _stack(frame)
+            if self.accept is not None and not self.accept(thread_id, frames):
+                continue
+            labels = [names.get(thread_id, str(thread_id))]
+            labels.extend(_frame_label(f.f_code) for f in frames)
+            self.counts[";".join(labels)] += 1
+        self.samples += 1
+
+    def _run(self, duration: Optional[float]) -> None:
+        deadline = None if duration is None else self.started_at + duration
+        while not self._stop.is_set():
+            self.sample_once()
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self._stop.wait(self.interval)
+        self.elapsed = time.monotonic() - self.started_at
+
+    def run(self, duration: float) -> "StackSampler":
+        """Samples on the calling thread for `duration` seconds."""
+        self.started_at = time.monotonic()
+        self._run(duration)
+        return self
+
+    def start(self) -> None:
+        """Samples on a background thread until stop()."""
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(None,), name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format ("frame;frame;frame count" per line), for flamegraph.pl/speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def profile_process(seconds: float, interval: float) -> StackSampler:
+    """
+    Samples every thread of the process for `seconds`. Blocking; call it from a worker thread.
+    Raises ProfilerBusy if another process profile is running.
+    """
+    if not process_profile_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        log.info("Process profile started: %ss at %sms intervals", seconds, interval * 1000)
+        sampler = StackSampler(interval).run(seconds)
+        log.info("Process profile finished: %s samples, %s distinct stacks", sampler.samples, len(sampler.counts))
+        return sampler
+    finally:
+        process_profile_lock.release()
+
+
+# --- Per-request Profiling ---
+def _request_filter(loop: asyncio.AbstractEventLoop, loop_thread_id: int, task: asyncio.Task,
+                    scope: Scope) -> Callable[[int, List[FrameType]], bool]:
+    """
+    Accepts samples belonging to one request: the event loop thread while the
+    request's task is the one running, and worker threads currently inside the
+    request's (sync) endpoint function. Other requests for the same sync endpoint
+    running at the same moment cannot be told apart and are included too.
+    """
+
+    def accept(thread_id: int, frames: List[FrameType]) -> bool:
+        if thread_id == loop_thread_id:
+            return asyncio.current_task(loop) is task
+        endpoint = scope.get("endpoint")
+        code = getattr(getattr(endpoint, "__wrapped__", endpoint), "__code__", None)
+        return code is not None and any(f.f_code is code for f in frames)
+
+    return accept
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: 1` and an admin bearer
+    token. The response body is replaced by the request's collapsed-stack profile;
+    the original status code is returned in X-Profile-Status.
+
+    `authorize(token) -> bool` is called in a worker thread (it may hit the database).
+    """
+
+    def __init__(self, app: ASGIApp, authorize: Callable[[str], bool]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) not in ("1", "true") or not await self._is_admin(headers):
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        sampler = StackSampler(
+            settings.PROFILE_REQUEST_INTERVAL_MS / 1000,
+            _request_filter(loop, threading.get_ident(), asyncio.current_task(), scope),
+        )
+        original_status = 500
+
+        async def capture_send(message: Message) -> None:
+            nonlocal original_status
+            if message["type"] == "http.response.start":
+                original_status = message["status"]
+            # Response body is discarded; the profile is sent instead
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture_send)
+        finally:
+            sampler.stop()
+
+        body = sampler.collapsed().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", CONTENT_TYPE.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profile-status", str(original_status).encode()),
+                (b"x-profile-samples", str(sampler.samples).encode()),
+                (b"x-profile-duration-ms", str(round(sampler.elapsed * 1000)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _is_admin(self, headers: Headers) -> bool:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        allowed = await asyncio.to_thread(self.authorize, token)
+        if not allowed:
+            log.warning("Ignoring %s header from a non-admin request.", PROFILE_HEADER)
+        return allowed
@@ -0,0 +1,255 @@
+# app/core/rate_limit.py
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import auth_cache, metrics
+from app.core.config import settings
+from app.utils.routing import resolve_route_template
+
+log = logging.getLogger(__name__)
+
+# --- Route Cost Weights ---
+# How many tokens a request to each route template drains. Expensive routes
+# (bcrypt, big UNION queries, ASR uploads) cost more than cheap lookups.
+DEFAULT_ROUTE_COSTS: Dict[Tuple[str, str], float] = {
+    ("POST", "/api/v1/login/token"): 20,
+    ("POST", "/api/v1/register"): 20,
+    ("POST", "/api/v1/login/refresh"): 2,
+    ("GET", "/api/v1/patients/{patient_id}/history"): 5,
+    ("GET", "/api/v1/patients/search/"): 2,
+    ("POST", "/api/v1/dictation/upload"): 10,
+}
+DEFAULT_COST = 1.0
+
+# Never limited (health checks, docs, scrapes)
+EXEMPT_PATHS = {"/", "/docs", "/redoc", "/openapi.json", "/metrics"}
+
+
+def load_route_costs() -> Dict[Tuple[str, str], float]:
+    """
+    Default costs, optionally overridden by RATE_LIMIT_ROUTE_COSTS, a JSON object like
+    {"POST /api/v1/login/token": 30, "GET /api/v1/patients/{patient_id}/history": 8}.
+    """
+    costs = dict(DEFAULT_ROUTE_COSTS)
+    if settings.RATE_LIMIT_ROUTE_COSTS:
+        try:
+            for key, cost in json.loads(settings.RATE_LIMIT_ROUTE_COSTS).items():
+                method, path = key.split(" ", 1)
+                costs[(method.upper(), path)] = float(cost)
+        except (ValueError, AttributeError) as e:
+            log.error("Ignoring invalid RATE_LIMIT_ROUTE_COSTS: %s", e)
+    return costs
+
+
+# --- Bucket Results ---
+@dataclass(frozen=True)
+class BucketResult:
+    allowed: bool
+    limit: float        # Bucket capacity
+    remaining: float    # Tokens left after this request
+    retry_after: float  # Seconds until `cost` tokens are available (0 if allowed)
+
+
+@dataclass(frozen=True)
+class BucketPolicy:
+    capacity: float         # Burst size in tokens
+    refill_per_second: float
+
+    def retry_after(self, tokens: float, cost: float) -> float:
+        return max(0.0, (cost - tokens) / self.refill_per_second)
+
+
+# --- Bucket Stores ---
+class InMemoryBucketStore:
+    """
+    Per-process token buckets. Keys are spread over a few striped locks so
+    concurrent requests for different users rarely contend; the number of
+    tracked keys is bounded (least recently used keys are dropped, which is
+    equivalent to refilling them).
+    """
+
+    def __init__(self, max_keys: int = 100_000, stripes: int = 16):
+        self.max_keys_per_stripe = max(1, max_keys // stripes)
+        self._stripes: List[Tuple[threading.Lock, "OrderedDict[str, List[float]]"]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(stripes)
+        ]
+
+    async def take(self, key: str, cost: float, policy: BucketPolicy) -> BucketResult:
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = [policy.capacity, now]
+                buckets[key] = bucket
+                if len(buckets) > self.max_keys_per_stripe:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.refill_per_second)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return BucketResult(True, policy.capacity, bucket[0], 0.0)
+            return BucketResult(False, policy.capacity, bucket[0], policy.retry_after(bucket[0], cost))
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared by all workers through Redis (optional `redis` package).
+    The refill-and-take step runs as one Lua script, so it is atomic across processes.
+    """
+
+    _SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = "hvs:ratelimit:"):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, cost: float, policy: BucketPolicy) -> BucketResult:
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key],
+            args=[policy.capacity, policy.refill_per_second, time.time(), cost],
+        )
+        tokens = float(tokens)
+        if allowed:
+            return BucketResult(True, policy.capacity, tokens, 0.0)
+        return BucketResult(False, policy.capacity, tokens, policy.retry_after(tokens, cost))
+
+
+def create_bucket_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        log.info("Rate limiter using shared Redis backend.")
+        return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryBucketStore()
+
+
+# --- Throttle Statistics ---
+rate_limit_throttled = metrics.counter(
+    "rate_limit_throttled_total", "Requests rejected by the rate limiter.", ("kind", "route"),
+)
+
+
+# --- ASGI Middleware ---
+class RateLimitMiddleware:
+    """
+    Token-bucket rate limiting keyed by client IP and, when a valid bearer token is
+    present, by user (JWT subject). Each route template drains its cost weight
+    from both buckets; the request is rejected with 429 if either is empty.
+
+    Every limited response carries X-RateLimit-Limit / X-RateLimit-Remaining for the
+    tighter bucket; 429 responses also carry Retry-After.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute], store=None):
+        self.app = app
+        self.routes = routes # Shared list with the app router, so later include_router calls are seen
+        self.store = store or create_bucket_store()
+        self.route_costs = load_route_costs()
+        self.user_policy = BucketPolicy(settings.RATE_LIMIT_USER_CAPACITY, settings.RATE_LIMIT_USER_REFILL_PER_SEC)
+        self.ip_policy = BucketPolicy(settings.RATE_LIMIT_IP_CAPACITY, settings.RATE_LIMIT_IP_REFILL_PER_SEC)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        route = resolve_route_template(self.routes, scope) or "unmatched"
+        cost = self.route_costs.get((scope["method"], route), DEFAULT_COST)
+
+        checks: List[Tuple[str, BucketResult]] = [
+            ("ip", await self._take(f"ip:{self._client_ip(scope, headers)}", cost, self.ip_policy))
+        ]
+        subject = self._subject(headers)
+        if subject is not None:
+            checks.append(("user", await self._take(f"user:{subject}", cost, self.user_policy)))
+
+        denied = [(kind, result) for kind, result in checks if not result.allowed]
+        tightest = min((result for _, result in checks), key=lambda r: r.remaining / r.limit)
+        if denied:
+            kind, result = max(denied, key=lambda item: item[1].retry_after)
+            rate_limit_throttled.inc(kind, route)
+            # Counted in rate_limit_throttled_total; a warning per rejection would flood the log under abuse
+            log.debug("Rate limit exceeded (%s) for %s %s", kind, scope['method'], route)
+            response = JSONResponse(
+                {"detail": "Too many requests, please slow down."},
+                status_code=429,
+                headers={
+                    "Retry-After": str(max(1, math.ceil(result.retry_after))),
+                    **self._limit_headers(result),
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        limit_headers = [(k.lower().encode(), v.encode()) for k, v in self._limit_headers(tightest).items()]
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + limit_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _take(self, key: str, cost: float, policy: BucketPolicy) -> BucketResult:
+        # A cost above the burst size could never succeed; cap it at the capacity
+        return await self.store.take(key, min(cost, policy.capacity), policy)
+
+    @staticmethod
+    def _limit_headers(result: BucketResult) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(int(result.limit)),
+            "X-RateLimit-Remaining": str(max(0, int(result.remaining))),
+        }
+
+    @staticmethod
+    def _client_ip(scope: Scope, headers: Headers) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            forwarded = headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",", 1)[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _subject(headers: Headers) -> Optional[str]:
+        authorization = headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        # Uses the verified-token LRU, so this is normally a dict lookup
+        return auth_cache.get_token_subject(token)
@@ -1,6 +1,10 @@
 # app/core/security.py
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Any
+from typing import Optional, Any, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -9,12 +13,13 @@ from passlib.context import CryptContext
 from app.core.config import settings
 import logging
 
-# Configure logging (can be enhanced later)
-logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
 
 # --- Password Hashing Setup ---
-# Using bcrypt as the hashing scheme
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Using bcrypt as the hashing scheme. Hashes whose cost differs from BCRYPT_ROUNDS
+# are reported by `verify_and_update`, so they get re-hashed on the next login.
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # --- JWT Configuration ---
 # These values are loaded from your .env file via the settings object
@@ -38,7 +43,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
         # Log potential errors during verification (e.g., invalid hash format)
-        logging.error(f"Error verifying password: {e}")
+        log.error("Error verifying password: %s", e)
         return False
 
 def get_password_hash(password: str) -> str:
@@ -53,6 +58,109 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+# --- Password Hashing Process Pool ---
+# bcrypt is deliberately slow and CPU-bound. Running it in the request threadpool lets a
+# login burst starve every other endpoint, so async callers hand it to a small dedicated
+# process pool instead. Admission is bounded: running + queued jobs never exceed
+# PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING, beyond that callers get PasswordHasherBusy.
+PASSWORD_HASH_WORKERS = settings.PASSWORD_HASH_WORKERS
+PASSWORD_HASH_MAX_PENDING = settings.PASSWORD_HASH_MAX_PENDING
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full; callers should answer 503 + Retry-After."""
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+_pool_disabled = PASSWORD_HASH_WORKERS <= 0 # Also set if the workers fail to start; hashing then runs in threads
+_hash_slots = threading.BoundedSemaphore(max(1, PASSWORD_HASH_WORKERS) + PASSWORD_HASH_MAX_PENDING)
+
+def _verify_and_update_in_worker(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Runs in a pool process; pwd_context there is built from the same settings.
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except Exception:
+        return False, None
+
+def _hash_in_worker(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _warm_up_worker() -> int:
+    return BCRYPT_ROUNDS
+
+def _get_hash_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the shared hashing pool, creating it on first use (None if disabled)."""
+    global _hash_pool
+    if _pool_disabled:
+        return None
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                # 'spawn' avoids forking a process that already runs threads (uvicorn, SQLAlchemy pool)
+                _hash_pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _hash_pool
+
+def start_password_hasher() -> None:
+    """Starts and warms the hashing workers so the first logins don't pay process start-up."""
+    pool = _get_hash_pool()
+    if pool is None:
+        log.info("Password hashing pool disabled (PASSWORD_HASH_WORKERS=0); hashing in threads.")
+        return
+    global _pool_disabled
+    try:
+        for future in [pool.submit(_warm_up_worker) for _ in range(PASSWORD_HASH_WORKERS)]:
+            future.result()
+    except Exception as e:
+        # Keep authentication working even if worker processes can't start
+        log.error("Password hashing pool failed to start (%s); falling back to threads.", e)
+        _pool_disabled = True # Before the shutdown, so no caller recreates the pool
+        shutdown_password_hasher()
+        return
+    log.info("Password hashing pool started: %s workers, bcrypt rounds=%s", PASSWORD_HASH_WORKERS, BCRYPT_ROUNDS)
+
+def shutdown_password_hasher() -> None:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
+
+async def _run_hash_job(func, *args):
+    if not _hash_slots.acquire(blocking=False):
+        log.warning("Password hashing queue full; rejecting request.")
+        raise PasswordHasherBusy("Password hashing queue is full")
+    try:
+        pool = _get_hash_pool()
+        if pool is None:
+            return await asyncio.to_thread(func, *args)
+        return await asyncio.wrap_future(pool.submit(func, *args))
+    finally:
+        _hash_slots.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password in the hashing pool without blocking the event loop or request threads.
+
+    Returns:
+        (matches, new_hash): new_hash is set when the password matched but the stored hash
+        uses outdated parameters (e.g. a different bcrypt cost) and should be replaced.
+
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full.
+    """
+    return await _run_hash_job(_verify_and_update_in_worker, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hashes a password in the hashing pool.
+
+    Raises:
+        PasswordHasherBusy: If the hashing queue is full.
+    """
+    return await _run_hash_job(_hash_in_worker, password)
+
 # --- JWT Token Utilities ---
 def create_access_token(subject: Any, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -75,38 +183,51 @@ def create_access_token(subject: Any, expires_delta: Optional[timedelta] = None)
     # Standard JWT claims: 'exp' (expiration time), 'sub' (subject)
     to_encode = {"exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    logging.info(f"Generated JWT for subject: {subject}")
+    log.debug("Generated JWT for subject: %s", subject)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
+def decode_token(token: str) -> Optional[dict]:
     """
-    Decodes and verifies a JWT token.
+    Decodes and verifies a JWT token, returning its full claim set.
 
     Args:
         token: The JWT token string to verify.
 
     Returns:
-        The subject (e.g., username/ID) stored in the token if valid and not expired,
+        The decoded payload if the token is valid, not expired and has a subject,
         otherwise None.
     """
     try:
         # jwt.decode handles expiration ('exp') validation automatically
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        subject: Optional[str] = payload.get("sub")
-        if subject is None:
-            logging.warning("JWT token verification failed: Missing 'sub' (subject) claim.")
+        if payload.get("sub") is None:
+            log.warning("JWT token verification failed: Missing 'sub' (subject) claim.")
             return None
         # Optionally add other claim validations here if needed
-        logging.debug(f"JWT verified successfully for subject: {subject}")
-        return subject
+        log.debug("JWT verified successfully for subject: %s", payload['sub'])
+        return payload
     except jwt.ExpiredSignatureError:
-        logging.warning("JWT token verification failed: Token has expired.")
+        log.warning("JWT token verification failed: Token has expired.")
         return None
     except JWTError as e:
         # Catches various JWT format/signature errors
-        logging.error(f"JWT token verification failed: Invalid token - {e}")
+        log.error("JWT token verification failed: Invalid token - %s", e)
         return None
     except Exception as e:
         # Catch unexpected errors during decoding
-        logging.error(f"An unexpected error occurred during token verification: {e}")
-        return None
\ No newline at end of file
+        log.error("An unexpected error occurred during token verification: %s", e)
+        return None
+
+def verify_token(token: str) -> Optional[str]:
+    """
+    Decodes and verifies a JWT token.
+
+    Args:
+        token: The JWT token string to verify.
+
+    Returns:
+        The subject (e.g., username/ID) stored in the token if valid and not expired,
+        otherwise None.
+    """
+    payload = decode_token(token)
+    return str(payload["sub"]) if payload else None
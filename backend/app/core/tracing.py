@@ -0,0 +1,398 @@
+# app/core/tracing.py
+import atexit
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.routing import resolve_route_template
+
+log = logging.getLogger(__name__)
+
+
+# --- Spans ---
+class Span:
+    """
+    One timed operation in a trace (OpenTelemetry data model, minus the SDK).
+    Unsampled spans are still created so their children inherit the decision,
+    but they record nothing and are never exported.
+    """
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, kind: str = "internal"):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        if self.sampled:
+            self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            tracer.export(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": "ERROR" if self.error else "OK",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# The active span. asyncio.to_thread and Starlette's threadpool copy the context,
+# so DB work pushed to threads is parented to the calling request's span.
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """W3C traceparent header -> (trace_id, parent span_id, sampled), or None if absent/invalid."""
+    match = _TRACEPARENT.match(value.strip().lower()) if value else None
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+# --- Exporters ---
+class JsonlFileExporter:
+    """Appends one span per line to a local file; works fully offline."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class OtlpHttpExporter:
+    """Posts spans to an OpenTelemetry collector using OTLP/HTTP with JSON encoding."""
+
+    _KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        body = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": self._KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            body["parentSpanId"] = span.parent_id
+        return body
+
+    def export(self, spans: List[Span]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [self._span(s) for s in spans]}],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+# --- Tracer ---
+class Tracer:
+    """
+    Creates spans and hands finished, sampled spans to a background thread that
+    exports them in batches. Export failures and a full queue drop spans rather
+    than slowing requests down.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.exporter = None
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=settings.TRACING_MAX_QUEUE)
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, exporter, sample_rate: float) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    # --- Span creation ---
+    def new_span(self, name: str, *, parent: Optional[Span] = None, kind: str = "internal",
+                 remote: Optional[Tuple[str, str, bool]] = None) -> Span:
+        """Creates a started span. Parent defaults to the current span; `remote` is a parsed traceparent."""
+        if parent is None:
+            parent = current_span.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled, kind)
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+            return Span(name, trace_id, parent_id, sampled, kind)
+        return Span(name, f"{random.getrandbits(128):032x}", None, random.random() < self.sample_rate, kind)
+
+    # --- Export pipeline ---
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + settings.TRACING_EXPORT_INTERVAL_SECONDS
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if span is None:
+                    self._flush(batch)
+                    return
+                batch.append(span)
+            except queue.Empty:
+                pass
+            if len(batch) >= 512 or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + settings.TRACING_EXPORT_INTERVAL_SECONDS
+
+    def _flush(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            log.warning("Span export failed (%s spans dropped): %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        """Exports queued spans and stops the exporter thread."""
+        if self._thread is None:
+            return
+        self.enabled = False
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+tracer = Tracer()
+
+
+# --- Public API ---
+class _NoopSpan:
+    """Stand-in yielded while tracing is disabled, so call sites need no checks."""
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def start_span(name: str, *, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+               remote: Optional[Tuple[str, str, bool]] = None) -> Iterator[Span]:
+    """Runs the block as a child of the current span (or as a new root span) and makes it current."""
+    if not tracer.enabled:
+        yield _NOOP_SPAN
+        return
+    span = tracer.new_span(name, kind=kind, remote=remote)
+    if attributes and span.sampled:
+        span.attributes.update(attributes)
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+
+def start_detached_span(name: str, *, parent: Optional[Span] = None) -> Span:
+    """
+    A span that is not made current and must be ended explicitly. For work that
+    cannot reset a context variable where it set it: async generators consumed
+    by another task, or SQLAlchemy before/after cursor hooks.
+    """
+    if not tracer.enabled:
+        return _NOOP_SPAN
+    return tracer.new_span(name, parent=parent)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping each call of a sync or async function in a span named module.function."""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                with start_span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with start_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# --- SQLAlchemy Instrumentation ---
+def instrument_engine(engine) -> None:
+    """Emits one span per SQL statement, parented to whatever span issued it."""
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not tracer.enabled or current_span.get() is None:
+            return
+        span = start_detached_span("db.query")
+        span.set_attribute("db.system", conn.dialect.name)
+        span.set_attribute("db.statement", statement[:settings.TRACING_MAX_STATEMENT_LENGTH])
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            span = spans.pop()
+            span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_error(exception_context.original_exception)
+            span.end()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+# --- Setup ---
+def setup_tracing(engine=None) -> None:
+    """Starts the span exporter per TRACING_* settings and instruments the engine (no-op if disabled)."""
+    if not settings.TRACING_ENABLED or tracer.enabled:
+        return
+    if settings.TRACING_EXPORTER == "otlp":
+        exporter = OtlpHttpExporter(settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME)
+    else:
+        exporter = JsonlFileExporter(settings.TRACING_FILE_PATH)
+    tracer.configure(exporter, settings.TRACING_SAMPLE_RATE)
+    if engine is not None:
+        instrument_engine(engine)
+    atexit.register(tracer.shutdown)
+    log.info("Tracing enabled: exporter=%s, sample rate=%s", settings.TRACING_EXPORTER, settings.TRACING_SAMPLE_RATE)
+
+
+# --- ASGI Middleware ---
+class TracingMiddleware:
+    """
+    Root span per HTTP request or WebSocket session, named after the route template.
+    Continues an incoming W3C traceparent and returns the server span's traceparent.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute]):
+        self.app = app
+        self.routes = routes # Shared list with the app router, so later include_router calls are seen
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket") or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        route = resolve_route_template(self.routes, scope) or "unmatched"
+        method = scope.get("method", "WS")
+        remote = parse_traceparent(Headers(scope=scope).get("traceparent"))
+
+        with start_span(f"{method} {route}", kind="server", remote=remote) as span:
+            span.set_attribute("http.method", method)
+            span.set_attribute("http.route", route)
+
+            async def send_with_traceparent(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", span.traceparent.encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_traceparent)
@@ -7,6 +7,10 @@ from app.models.patient import Patient
 from app.models.encounter import Encounter # <-- Add this line
 from app.models.note import ClinicalNote # <-- Add this line
 from app.models.task import NurseTask
+from app.models.id_sequence import IdSequence
+from app.models.refresh_token import RefreshToken
+from app.models.transcription_job import TranscriptionJob
+from app.models.draft_note import DraftNote
 # from app.models.task import NurseTask # Add later
 # from app.models.note import ClinicalNote # Add later
 # from app.models.task import NurseTask # Add later
\ No newline at end of file
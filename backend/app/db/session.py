@@ -2,11 +2,11 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.core import metrics
 import logging
 import sys # Import sys to allow exiting
 
-# Configure logging (if not already done elsewhere)
-logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 engine = None # Initialize engine to None
@@ -20,11 +20,11 @@ try:
     # --- Test Connection ---
     # Try connecting to ensure credentials and host are valid
     with engine.connect() as connection:
-        logging.info("--- Database engine created and connection successful. ---")
+        log.info("--- Database engine created and connection successful. ---")
 
 except Exception as e:
-    logging.error(f"--- FATAL ERROR: Database engine creation failed: {e} ---")
-    logging.error("--- Please check your DATABASE_URL in the .env file and ensure the PostgreSQL server is running. ---")
+    log.error("--- FATAL ERROR: Database engine creation failed: %s ---", e)
+    log.error("--- Please check your DATABASE_URL in the .env file and ensure the PostgreSQL server is running. ---")
     # Exit the application if the database connection fails on startup
     sys.exit(f"Database connection failed: {e}")
 
@@ -32,13 +32,28 @@ except Exception as e:
 # This check prevents the NameError
 if engine:
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    logging.info("--- SQLAlchemy SessionLocal created successfully. ---")
+    log.info("--- SQLAlchemy SessionLocal created successfully. ---")
 else:
     # This should technically not be reached if sys.exit works, but added for safety
-    logging.critical("--- FATAL ERROR: Engine is None, cannot create SessionLocal. Exiting. ---")
+    log.critical("--- FATAL ERROR: Engine is None, cannot create SessionLocal. Exiting. ---")
     sys.exit("Failed to initialize database engine.")
 
 
+# --- Pool Metrics ---
+def _pool_samples():
+    pool = engine.pool
+    # Only QueuePool-style pools report these (e.g. not StaticPool)
+    for state in ("size", "checkedin", "checkedout", "overflow"):
+        reader = getattr(pool, state, None)
+        if callable(reader):
+            yield (state,), reader()
+
+metrics.callback_gauge(
+    "db_pool_connections", "SQLAlchemy connection pool state (size, checkedin, checkedout, overflow).",
+    ("state",), _pool_samples,
+)
+
+
 # --- Dependency Function ---
 def get_db() -> Session:
     """
@@ -2,9 +2,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 from app.db.session import engine # Import the engine
+from app.core import security
+from app.core.config import settings
+from app.core.logging_config import setup_logging, RequestIdMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.tracing import setup_tracing, TracingMiddleware, tracer
+from app.core.profiler import ProfilingMiddleware
+from app.core.loop_monitor import create_loop_monitor
+from app.core import memory
+from app.api import deps
+from app.services import asr_engines, draft_notes, transcoder, transcription_jobs
 
 # --- Import Routers ---
 from app.api.endpoints import auth      # Existing auth router
@@ -12,24 +24,72 @@ from app.api.endpoints import patients  # Existing patients router
 from app.api.endpoints import encounters # Existing encounters router
 from app.api.endpoints import tasks      # *** NEW: Import the tasks router ***
 from app.api.endpoints import handoff    # *** Don't forget the WebSocket router ***
+from app.api.endpoints import metrics    # Prometheus scrape endpoint
+from app.api.endpoints import admin      # Admin-only user management and diagnostics
+
+# --- Logging ---
+# Queue-based pipeline; configured once here instead of per module
+setup_logging()
+log = logging.getLogger(__name__)
+
+# --- Tracing ---
+# Exporter thread and SQL statement spans; no-op unless TRACING_ENABLED
+setup_tracing(engine)
 
 # --- Lifespan Event Handler (Database Check) ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logging.info("Application startup...")
+    log.info("Application startup...")
     try:
         with engine.connect() as connection:
-            logging.info("--- Database connection successful during startup! ---")
+            log.info("--- Database connection successful during startup! ---")
     except Exception as e:
-        logging.error(f"--- Database connection failed during startup: {e} ---")
+        log.error("--- Database connection failed during startup: %s ---", e)
         # raise SystemExit(f"Database connection failed: {e}") # Optional: Exit if DB fails
+    # Spawn the bcrypt worker processes now rather than on the first login
+    await asyncio.to_thread(security.start_password_hasher)
+    # Look ffmpeg up once; the dictation decoder and uploads reuse the result
+    if transcoder.ffmpeg_path() is None:
+        log.warning("ffmpeg not found (%s): compressed dictation audio cannot be decoded.", settings.FFMPEG_PATH)
+    # Load ASR engines and connect the Cloud Speech channel pool before the first dictation
+    await asr_engines.start_engines()
+    # Workers for queued upload transcriptions (claimed with SKIP LOCKED, so every process can run some)
+    await transcription_jobs.start_workers()
+    # Promote drafts left by dictations that were live when a process died (this one's last run, or another's)
+    await draft_notes.start_recovery()
+    # Watch for synchronous work blocking the event loop (exported as event_loop_lag_seconds)
+    loop_monitor = create_loop_monitor() if settings.LOOP_MONITOR_ENABLED else None
+    if loop_monitor:
+        loop_monitor.start()
+    # RSS history and budget alerts; tracemalloc only when asked for (it slows allocation)
+    memory.rss_monitor.start()
+    if settings.TRACEMALLOC_AT_STARTUP:
+        memory.start_tracemalloc(settings.TRACEMALLOC_FRAMES)
     yield
-    logging.info("Application shutdown...")
+    log.info("Application shutdown...")
+    if loop_monitor:
+        loop_monitor.stop()
+    memory.rss_monitor.stop()
+    security.shutdown_password_hasher()
+    await transcription_jobs.stop_workers()
+    await draft_notes.stop_recovery()
+    await asr_engines.stop_engines()
+    tracer.shutdown()
     engine.dispose()
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title="HVS Backend", lifespan=lifespan)
 
+# --- Per-request Profiling (X-Profile header, admins only) ---
+# Innermost layer, so the profile covers just the routed request
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, authorize=deps.is_admin_token)
+
+# --- Rate Limiting ---
+# Added before CORS so CORS stays the outer layer and 429 responses keep CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, routes=app.router.routes)
+
 # --- CORS Configuration ---
 # Allow origins from an environment variable CORS_ORIGINS (comma-separated)
 # or default to a set of common local/dev origins used by Expo and web.
@@ -52,6 +112,20 @@ else:
         allow_headers=["*"],
     )
 
+# --- Tracing ---
+# Root span per request/WebSocket session, outside rate limiting so throttled requests show up
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, routes=app.router.routes)
+
+# --- Metrics ---
+# Outside rate limiting and CORS, so rejected and preflight requests are measured too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+# --- Request IDs ---
+# Outermost layer, so every log line of a request (including rate limiting) is correlated
+app.add_middleware(RequestIdMiddleware)
+
 # --- Include Routers ---
 # Authentication routes
 app.include_router(auth.router, prefix="/api/v1", tags=["Authentication"])
@@ -69,6 +143,13 @@ app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["Tasks"])
 # from app.api.endpoints import handoff
 app.include_router(handoff.router) # Often WebSocket routes don't have a prefix
 
+# Admin routes (user listing, profiler)
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+
+# Metrics scrape endpoint (/metrics)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["Monitoring"])
+
 # --- Root Endpoint (Optional: for basic check) ---
 @app.get("/")
 def read_root():
@@ -78,4 +159,5 @@ def read_root():
 if __name__ == "__main__":
     import uvicorn
     # Use the command line 'uvicorn app.main:app --reload' for full features
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                ws_per_message_deflate=settings.UVICORN_WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
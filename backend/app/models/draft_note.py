@@ -0,0 +1,45 @@
+# app/models/draft_note.py
+import datetime
+
+from sqlalchemy import (
+    Column, Integer, String, DateTime, func, Enum as SQLEnum, ForeignKey, Text
+)
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base
+from app.models.note import NoteType
+
+
+class DraftNote(Base):
+    """
+    SQLAlchemy model for the transcript of a live dictation that is still in progress.
+
+    The session appends final segments to `content` in batches (UPDATE ... SET
+    content = content || ...), so a restart loses at most the last batch. When
+    the session ends the draft becomes a ClinicalNote and the row is deleted;
+    drafts whose session stopped writing (the process died) are promoted by
+    the recovery sweep in app/services/draft_notes.py.
+    """
+    __tablename__ = "draft_notes"
+
+    # --- Columns ---
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    session_id: Mapped[str] = Column(String(128), nullable=False) # WebSocket session, for logs
+    note_type: Mapped[NoteType] = Column(SQLEnum(NoteType), nullable=False, default=NoteType.DOCTOR_DICTATION)
+    content: Mapped[str] = Column(Text, nullable=False, default="")
+    segments: Mapped[int] = Column(Integer, nullable=False, default=0) # Final ASR segments in `content`
+
+    # Timestamps
+    created_at: Mapped[datetime.datetime] = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime.datetime] = Column( # Last append or heartbeat from the session
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+    # --- Foreign Keys ---
+    encounter_id: Mapped[int] = Column(Integer, ForeignKey("encounters.id"), nullable=False, index=True)
+    author_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DraftNote(id={self.id}, encounter_id={self.encounter_id}, segments={self.segments})>"
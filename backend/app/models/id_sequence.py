@@ -0,0 +1,27 @@
+# app/models/id_sequence.py
+from sqlalchemy import Column, String, BigInteger, Sequence
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base
+
+# --- Database Sequence for Patient IDs ---
+# On PostgreSQL the numeric part of every patient ID comes from this sequence.
+# Registered on the shared metadata so `create_all` / Alembic know about it;
+# dialects without sequence support (SQLite in dev) silently skip it.
+patient_id_seq = Sequence("patient_id_seq", start=1, increment=1, metadata=Base.metadata)
+
+
+class IdSequence(Base):
+    """
+    Fallback counter table that emulates a database sequence on dialects
+    without native sequence support (e.g. SQLite used for local development).
+    One row per named sequence; `next_value` is the next number to hand out.
+    """
+    __tablename__ = "id_sequences"
+
+    # --- Columns ---
+    name: Mapped[str] = Column(String, primary_key=True)
+    next_value: Mapped[int] = Column(BigInteger, nullable=False, default=1)
+
+    def __repr__(self) -> str:
+        return f"<IdSequence(name='{self.name}', next_value={self.next_value})>"
@@ -0,0 +1,37 @@
+# app/models/refresh_token.py
+import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base
+
+
+class RefreshToken(Base):
+    """
+    SQLAlchemy model for a server-side refresh token.
+
+    Only a SHA-256 digest of the token is stored. Tokens rotate on every use:
+    the presented token is revoked and a new one in the same `family_id` is issued.
+    Presenting an already-revoked token revokes the whole family (reuse detection).
+    """
+    __tablename__ = "refresh_tokens"
+
+    # --- Columns ---
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    token_hash: Mapped[str] = Column(String(64), unique=True, index=True, nullable=False)
+    family_id: Mapped[str] = Column(String(32), index=True, nullable=False) # Shared by all rotations of one login
+
+    # Timestamps
+    created_at: Mapped[datetime.datetime] = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime.datetime] = Column(DateTime(timezone=True), nullable=False)
+    revoked_at: Mapped[datetime.datetime | None] = Column(DateTime(timezone=True), nullable=True)
+
+    # --- Foreign Keys ---
+    # No relationship on purpose: refreshing must not load the User entity
+    user_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<RefreshToken(id={self.id}, user_id={self.user_id}, family_id='{self.family_id}')>"
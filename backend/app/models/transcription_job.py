@@ -0,0 +1,58 @@
+# app/models/transcription_job.py
+import datetime
+import enum
+
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Float, func, Enum as SQLEnum, ForeignKey, Text
+)
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base
+from app.models.note import NoteType
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"       # Waiting for a worker (new, or scheduled for a retry)
+    RUNNING = "running"     # Claimed by a worker, which refreshes heartbeat_at while it works
+    COMPLETED = "completed" # Transcribed and saved as a note
+    FAILED = "failed"       # Out of attempts; `error` has the last failure
+
+
+class TranscriptionJob(Base):
+    """
+    SQLAlchemy model for the transcription of an uploaded dictation recording.
+
+    Rows are the queue: workers claim the oldest due QUEUED row (or a RUNNING
+    one whose worker stopped sending heartbeats) with SELECT ... FOR UPDATE
+    SKIP LOCKED, so any number of workers and processes can share the table.
+    """
+    __tablename__ = "transcription_jobs"
+
+    # --- Columns ---
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    status: Mapped[JobStatus] = Column(SQLEnum(JobStatus), index=True, nullable=False, default=JobStatus.QUEUED)
+    audio_path: Mapped[str] = Column(String, nullable=False) # Spooled upload, deleted when the job ends
+    engine: Mapped[str | None] = Column(String(32), nullable=True) # ASR engine; None = ASR_ENGINE
+    note_type: Mapped[NoteType] = Column(SQLEnum(NoteType), nullable=False, default=NoteType.DOCTOR_DICTATION)
+    progress: Mapped[float] = Column(Float, nullable=False, default=0.0) # Share of the audio recognised, 0..1
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = Column(Text, nullable=True)
+
+    # Timestamps
+    created_at: Mapped[datetime.datetime] = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    available_at: Mapped[datetime.datetime] = Column( # Not claimed before this (retry backoff)
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+    heartbeat_at: Mapped[datetime.datetime | None] = Column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime.datetime | None] = Column(DateTime(timezone=True), nullable=True)
+
+    # --- Foreign Keys ---
+    # No relationships on purpose: workers and status polls only need the IDs
+    encounter_id: Mapped[int] = Column(Integer, ForeignKey("encounters.id"), nullable=False, index=True)
+    author_id: Mapped[int] = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    note_id: Mapped[int | None] = Column(Integer, ForeignKey("clinical_notes.id"), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<TranscriptionJob(id={self.id}, encounter_id={self.encounter_id}, status='{self.status}')>"
@@ -1,16 +1,48 @@
 # app/schemas/session.py
-import asyncio
-from typing import Optional
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+from app.utils.audio_buffer import AudioRingBuffer
+from app.utils.vad import VoiceActivityDetector
 
 class SessionState:
     """Keeps track of transcription state for one session (handoff or dictation)."""
+
+    # One instance per open WebSocket; slots keep it small and catch misspelled attributes
+    __slots__ = ("id", "audio", "vad", "is_active", "transcript_segments", "saved_segments", "protocol", "last_sequence",
+                 "encounter_id", "author_id", "note_type", "started_at", "first_audio_at", "audio_ended_at")
+
     def __init__(self, session_id: str):
         self.id = session_id
-        self.audio_queue = asyncio.Queue()
+        # Byte-budgeted audio waiting for the ASR stream (DICTATION_BUFFER_BYTES, DICTATION_OVERLOAD_POLICY)
+        self.audio = AudioRingBuffer(settings.DICTATION_BUFFER_BYTES, settings.DICTATION_OVERLOAD_POLICY)
+        # Silence suppression between the buffer and the ASR stream (DICTATION_VAD_*)
+        self.vad: Optional[VoiceActivityDetector] = VoiceActivityDetector(
+            snr_db=settings.DICTATION_VAD_SNR_DB,
+            hangover_ms=settings.DICTATION_VAD_HANGOVER_MS,
+            padding_ms=settings.DICTATION_VAD_PADDING_MS,
+        ) if settings.DICTATION_VAD_ENABLED else None
         self.is_active = True
-        self.final_transcript = "" # Store the complete transcript for saving
+        self.transcript_segments: List[str] = [] # Final ASR segments, joined into the note when the session ends
+        self.saved_segments = 0 # How many of them are in the session's draft note (app/services/draft_notes.py)
+
+        # Wire protocol: "legacy" (raw/base64 audio), "v2" (framed audio, JSON control messages) or "v3" (v2 with
+        # diff-style transcript updates)
+        self.protocol = "legacy"
+        self.last_sequence: Optional[int] = None # Last v2 frame sequence accepted
 
         # Context for saving note
         self.encounter_id: Optional[int] = None
         self.author_id: Optional[int] = None
-        self.note_type: Optional[str] = None
\ No newline at end of file
+        self.note_type: Optional[str] = None
+
+        # Timing marks (time.monotonic) for the ASR latency metrics
+        self.started_at: float = time.monotonic()
+        self.first_audio_at: Optional[float] = None
+        self.audio_ended_at: Optional[float] = None
+
+    @property
+    def queued_bytes(self) -> int:
+        """Audio bytes waiting for the ASR stream (for memory accounting)."""
+        return self.audio.size
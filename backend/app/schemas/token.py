@@ -8,6 +8,14 @@ class Token(BaseModel):
     """
     access_token: str
     token_type: str = "bearer" # Standard token type
+    expires_in: Optional[int] = None # Access token lifetime in seconds
+    refresh_token: Optional[str] = None # Rotating refresh token (single use)
+
+class RefreshRequest(BaseModel):
+    """
+    Schema for exchanging (or revoking) a refresh token.
+    """
+    refresh_token: str
 
 class TokenData(BaseModel):
     """
@@ -0,0 +1,21 @@
+# app/schemas/transcription_job.py
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+from app.models.transcription_job import JobStatus # Import enum
+
+# --- Schema for polling a transcription job ---
+class TranscriptionJobRead(BaseModel):
+    id: int
+    status: JobStatus
+    progress: float # Share of the audio recognised, 0..1
+    attempts: int
+    error: Optional[str] = None # Last failure (kept while a retry is pending)
+    encounter_id: int
+    note_id: Optional[int] = None # Set once the note is saved
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True # Enable ORM mode
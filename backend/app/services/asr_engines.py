@@ -0,0 +1,573 @@
+# app/services/asr_engines.py
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+import google.auth
+import grpc
+from google.api_core.exceptions import Cancelled, DeadlineExceeded
+from google.cloud import speech
+
+from app.core import metrics
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE_HZ = 16000
+BYTES_PER_SECOND = SAMPLE_RATE_HZ * 2 # LINEAR16 mono
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+
+class AsrError(Exception):
+    """Recognition failed inside an ASR engine."""
+
+
+class AsrTimeout(AsrError):
+    """The engine gave up waiting for audio or results."""
+
+
+class EngineUnavailable(RuntimeError):
+    """The requested engine is unknown, not enabled, or cannot be constructed here."""
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    streaming: bool
+    batch: bool
+    punctuation: bool
+    diarization: bool
+    offline: bool # Runs without network access
+
+
+@dataclass(frozen=True)
+class RecognitionOptions:
+    sample_rate_hz: int = SAMPLE_RATE_HZ
+    language_code: str = "en-US"
+    punctuation: bool = True # Ignored by engines without the capability
+    diarization: bool = True
+    min_speakers: int = 1
+    max_speakers: int = 2
+
+
+@dataclass(frozen=True)
+class TranscriptResult:
+    text: str
+    is_final: bool
+
+
+def pcm_from_audio(audio: bytes) -> bytes:
+    """Raw LINEAR16 samples: strips the header of a WAV file, passes anything else through."""
+    if audio[:4] == b"RIFF" and audio[8:12] == b"WAVE":
+        try:
+            with wave.open(io.BytesIO(audio), "rb") as w:
+                return w.readframes(w.getnframes())
+        except (wave.Error, EOFError):
+            pass
+    return audio
+
+
+# --- Engine Interface ---
+class AsrEngine(ABC):
+    """
+    A speech recognition backend. `start_stream` connects and returns the
+    results for an async iterator of LINEAR16 chunks (interim and final);
+    `transcribe` recognises a complete recording. Engines are shared by all
+    sessions, so per-stream state lives in the returned iterator: an async
+    generator, which callers close (aclose) when they stop reading early so
+    the stream's connection or lease is released at once.
+    """
+
+    name = "base"
+    capabilities = Capabilities(streaming=False, batch=False, punctuation=False, diarization=False, offline=False)
+
+    @abstractmethod
+    async def start_stream(self, audio: AsyncIterable[bytes], options: RecognitionOptions) -> AsyncIterator[TranscriptResult]:
+        ...
+
+    @abstractmethod
+    async def transcribe(self, audio: bytes, options: RecognitionOptions) -> str:
+        ...
+
+    async def start(self) -> None:
+        """Opens connections or loads models ahead of the first session (app lifespan)."""
+
+    async def stop(self) -> None:
+        """Releases what `start` opened."""
+
+    def describe(self) -> dict:
+        return {"name": self.name, "capabilities": asdict(self.capabilities)}
+
+
+# --- Channel Pool ---
+asr_channel_reconnects = metrics.counter(
+    "asr_channel_reconnects_total", "ASR gRPC channels replaced after failing health checks.",
+)
+
+
+class PooledClient:
+    __slots__ = ("client", "leases", "failures")
+
+    def __init__(self, client):
+        self.client = client
+        self.leases = 0 # Streams currently using this channel
+        self.failures = 0 # Consecutive failed health checks or stream starts
+
+    @property
+    def channel(self) -> grpc.aio.Channel:
+        return self.client.transport.grpc_channel
+
+
+class ChannelPool:
+    """
+    Long-lived async Speech clients, one gRPC channel each, created and
+    connected at startup so a session does not pay credential loading, channel
+    setup and the TLS handshake before its first audio byte. gRPC multiplexes
+    streams over a channel, so borrowing is not exclusive: `acquire` picks the
+    ready channel with the fewest open streams. A health loop keeps idle
+    channels connected and replaces those that stay down or were shut down.
+    """
+
+    def __init__(self, factory: Callable[[], speech.SpeechAsyncClient], size: int, health_interval: float,
+                 warm_timeout: float, failure_threshold: int = 2):
+        self.factory = factory
+        self.size = max(1, size)
+        self.health_interval = health_interval
+        self.warm_timeout = warm_timeout
+        self.failure_threshold = failure_threshold
+        self._clients: List[PooledClient] = []
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._retiring: set = set() # Replaced channels closing once their streams end
+
+    def states(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for pooled in list(self._clients):
+            state = pooled.channel.get_state().name.lower()
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    async def _warm(self, pooled: PooledClient) -> bool:
+        try:
+            await asyncio.wait_for(pooled.channel.channel_ready(), self.warm_timeout)
+            return True
+        except asyncio.TimeoutError:
+            log.warning("ASR channel not ready after %.1fs (state %s).",
+                        self.warm_timeout, pooled.channel.get_state().name)
+            return False
+
+    # --- Lifecycle ---
+    async def start(self) -> None:
+        """Opens and connects all channels; call from the serving loop (gRPC aio channels are bound to it)."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._clients:
+                return
+            started = time.monotonic()
+            self._clients = [PooledClient(self.factory()) for _ in range(self.size)]
+            ready = await asyncio.gather(*(self._warm(pooled) for pooled in self._clients))
+            self._health_task = asyncio.create_task(self._health_loop(), name="asr-channel-health")
+            log.info("ASR channel pool: %d/%d channels ready in %.2fs.",
+                     sum(ready), self.size, time.monotonic() - started)
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        clients, self._clients = self._clients, []
+        await asyncio.gather(*(pooled.client.transport.close() for pooled in clients + list(self._retiring)),
+                             return_exceptions=True)
+        self._retiring.clear()
+
+    # --- Borrowing ---
+    async def acquire(self) -> PooledClient:
+        if not self._clients:
+            await self.start() # Not started by the lifespan (scripts, tools): open on first use
+        clients = list(self._clients)
+        ready = [c for c in clients if c.channel.get_state() == grpc.ChannelConnectivity.READY]
+        pooled = min(ready or clients, key=lambda c: c.leases)
+        pooled.leases += 1
+        return pooled
+
+    def release(self, pooled: PooledClient, failed: bool = False) -> None:
+        pooled.leases -= 1
+        if failed:
+            pooled.failures += 1
+
+    # --- Health Checks ---
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                log.error("ASR channel health check failed: %s", e, exc_info=True)
+
+    async def check(self) -> None:
+        """Reconnects idle channels and replaces ones that keep failing."""
+        for pooled in list(self._clients):
+            state = pooled.channel.get_state(try_to_connect=True)
+            if state == grpc.ChannelConnectivity.READY:
+                pooled.failures = 0
+                continue
+            if state in (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN):
+                pooled.failures += 1
+            if state == grpc.ChannelConnectivity.SHUTDOWN or pooled.failures >= self.failure_threshold:
+                await self._replace(pooled, state)
+
+    async def _replace(self, old: PooledClient, state: grpc.ChannelConnectivity) -> None:
+        try:
+            new = PooledClient(self.factory())
+        except Exception as e:
+            log.error("Could not reopen ASR channel: %s", e)
+            return
+        await self._warm(new)
+        if old not in self._clients: # Stopped meanwhile
+            await new.client.transport.close()
+            return
+        self._clients[self._clients.index(old)] = new
+        asr_channel_reconnects.inc()
+        log.warning("ASR channel replaced (was %s, %d failures).", state.name, old.failures)
+        self._retiring.add(old)
+        asyncio.create_task(self._close_when_idle(old))
+
+    async def _close_when_idle(self, pooled: PooledClient) -> None:
+        while pooled.leases > 0:
+            await asyncio.sleep(1.0)
+        self._retiring.discard(pooled)
+        await pooled.client.transport.close()
+
+
+# --- Google Cloud Speech ---
+class GoogleSpeechEngine(AsrEngine):
+    """Cloud Speech-to-Text: punctuation and speaker diarization, needs network and credentials."""
+
+    name = "google"
+    capabilities = Capabilities(streaming=True, batch=True, punctuation=True, diarization=True, offline=False)
+
+    def __init__(self, stream_timeout: float = 300.0):
+        self.stream_timeout = stream_timeout # Inactivity timeout of a streaming call
+        self._credentials = None # Resolved once in start(), shared by every channel
+        self.pool = ChannelPool(
+            lambda: speech.SpeechAsyncClient(credentials=self._credentials),
+            settings.ASR_POOL_SIZE,
+            settings.ASR_POOL_HEALTH_INTERVAL_SECONDS,
+            settings.ASR_POOL_WARM_TIMEOUT_SECONDS,
+        )
+
+    async def start(self) -> None:
+        if self._credentials is None:
+            # Off the loop: reads the key file or asks the metadata server
+            self._credentials, _ = await asyncio.to_thread(google.auth.default, scopes=[CLOUD_PLATFORM_SCOPE])
+        await self.pool.start()
+
+    async def stop(self) -> None:
+        await self.pool.stop()
+
+    def recognition_config(self, options: RecognitionOptions) -> speech.RecognitionConfig:
+        return speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=options.sample_rate_hz,
+            language_code=options.language_code,
+            enable_automatic_punctuation=options.punctuation,
+            diarization_config=speech.SpeakerDiarizationConfig(
+                enable_speaker_diarization=options.diarization,
+                min_speaker_count=options.min_speakers,
+                max_speaker_count=options.max_speakers,
+            ),
+        )
+
+    async def start_stream(self, audio: AsyncIterable[bytes], options: RecognitionOptions) -> AsyncIterator[TranscriptResult]:
+        pooled = await self.pool.acquire()
+
+        async def requests():
+            yield speech.StreamingRecognizeRequest(streaming_config=speech.StreamingRecognitionConfig(
+                config=self.recognition_config(options), interim_results=True, single_utterance=False,
+            ))
+            async for chunk in audio:
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        try:
+            responses = await pooled.client.streaming_recognize(requests=requests(), timeout=self.stream_timeout)
+        except DeadlineExceeded as e:
+            self.pool.release(pooled)
+            raise AsrTimeout(str(e)) from e
+        except Exception:
+            self.pool.release(pooled, failed=True)
+            raise
+        return self._results(responses, pooled)
+
+    async def _results(self, responses, pooled: PooledClient) -> AsyncIterator[TranscriptResult]:
+        try:
+            async for response in responses:
+                if not response.results: continue
+                result = response.results[0]
+                if not result.alternatives: continue
+                yield TranscriptResult(result.alternatives[0].transcript, result.is_final)
+        except DeadlineExceeded as e:
+            raise AsrTimeout(str(e)) from e
+        except Cancelled:
+            log.debug("Google ASR stream cancelled (expected on disconnect/end).")
+        finally:
+            self.pool.release(pooled)
+
+    async def transcribe(self, audio: bytes, options: RecognitionOptions) -> str:
+        pooled = await self.pool.acquire()
+        try:
+            response = await pooled.client.recognize(
+                config=self.recognition_config(options), audio=speech.RecognitionAudio(content=audio),
+            )
+        except DeadlineExceeded as e:
+            self.pool.release(pooled)
+            raise AsrTimeout(str(e)) from e
+        except Exception:
+            self.pool.release(pooled, failed=True)
+            raise
+        self.pool.release(pooled)
+        return " ".join(r.alternatives[0].transcript.strip() for r in response.results if r.alternatives)
+
+
+# --- Fake (deterministic, offline) ---
+# Deterministic vocabulary; the transcript depends only on how much audio was sent
+WORDS = (
+    "patient is stable and comfortable vitals are within normal limits continue the current "
+    "medication plan review blood results in the morning and reassess pain score before discharge"
+).split()
+
+
+def transcript_for(utterance: int, words: int) -> str:
+    """The first `words` words of utterance number `utterance` (0-based)."""
+    return " ".join(WORDS[(utterance * 7 + i) % len(WORDS)] for i in range(words))
+
+
+class FakeEngine(AsrEngine):
+    """
+    For every `interim` seconds of audio received, emits one result `latency`
+    seconds later: interim results that grow by `words_per_result` words, and a
+    final result every `utterance` seconds of audio and when the audio ends.
+    `transcribe` answers after `latency` plus `batch_rtf` seconds per second of audio.
+    No network, credentials or real recognition - the output is a pure function
+    of the audio length, so load tests can predict every response.
+    """
+
+    name = "fake"
+    capabilities = Capabilities(streaming=True, batch=True, punctuation=False, diarization=False, offline=True)
+
+    def __init__(self, latency: float, interim: float, utterance: float, batch_rtf: float = 0.0,
+                 words_per_result: int = 2, words_per_utterance: int = 12):
+        self.latency = latency
+        self.batch_rtf = batch_rtf
+        self.interim_bytes = max(2, int(interim * BYTES_PER_SECOND))
+        self.utterance_bytes = max(2, int(utterance * BYTES_PER_SECOND))
+        self.results_per_utterance = max(1, round(utterance / interim))
+        self.words_per_result = words_per_result
+        self.words_per_utterance = words_per_utterance
+
+    @classmethod
+    def from_settings(cls) -> "FakeEngine":
+        return cls(
+            settings.FAKE_ASR_LATENCY_MS / 1000,
+            settings.FAKE_ASR_INTERIM_MS / 1000,
+            settings.FAKE_ASR_UTTERANCE_MS / 1000,
+            settings.FAKE_ASR_BATCH_RTF,
+        )
+
+    def result(self, index: int) -> TranscriptResult:
+        """Result for the `index`-th (1-based) interval of audio."""
+        utterance, position = divmod(index - 1, self.results_per_utterance)
+        position += 1
+        return TranscriptResult(transcript_for(utterance, position * self.words_per_result),
+                                position == self.results_per_utterance)
+
+    async def start_stream(self, audio: AsyncIterable[bytes], options: RecognitionOptions) -> AsyncIterator[TranscriptResult]:
+        return self._results(audio)
+
+    async def _results(self, audio: AsyncIterable[bytes]) -> AsyncIterator[TranscriptResult]:
+        loop = asyncio.get_running_loop()
+        pending: "asyncio.Queue[Optional[tuple[float, TranscriptResult]]]" = asyncio.Queue()
+
+        async def consume() -> None:
+            received = emitted = 0
+            try:
+                async for chunk in audio:
+                    received += len(chunk)
+                    while (emitted + 1) * self.interim_bytes <= received:
+                        emitted += 1
+                        pending.put_nowait((loop.time() + self.latency, self.result(emitted)))
+                # End of audio: close the open utterance with a final result
+                utterance, position = divmod(emitted, self.results_per_utterance)
+                if position or received > emitted * self.interim_bytes:
+                    words = max(1, position) * self.words_per_result
+                    pending.put_nowait((loop.time() + self.latency, TranscriptResult(transcript_for(utterance, words), True)))
+            finally:
+                pending.put_nowait(None)
+
+        consumer = asyncio.create_task(consume())
+        try:
+            while (item := await pending.get()) is not None:
+                due, result = item
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield result
+        finally:
+            consumer.cancel()
+
+    async def transcribe(self, audio: bytes, options: RecognitionOptions) -> str:
+        """One sentence per utterance of audio, after `latency` plus the simulated processing time."""
+        pcm = pcm_from_audio(audio)
+        await asyncio.sleep(self.latency + len(pcm) / BYTES_PER_SECOND * self.batch_rtf)
+        utterances = max(1, -(-len(pcm) // self.utterance_bytes))
+        return " ".join(transcript_for(i, self.words_per_utterance) for i in range(utterances))
+
+
+# --- Vosk (on-box CPU, offline) ---
+class VoskEngine(AsrEngine):
+    """
+    Kaldi-based recognition on the local CPU with a downloaded Vosk model
+    (VOSK_MODEL_PATH), for air-gapped wards. No punctuation or diarization.
+    The model is loaded once and shared; each stream gets its own recognizer,
+    fed from a worker thread because decoding is CPU-bound.
+    """
+
+    name = "vosk"
+    capabilities = Capabilities(streaming=True, batch=True, punctuation=False, diarization=False, offline=True)
+
+    def __init__(self, model_path: str):
+        try:
+            import vosk
+        except ImportError as e:
+            raise EngineUnavailable("ASR engine 'vosk' requires the 'vosk' package (pip install vosk)") from e
+        if not model_path or not os.path.isdir(model_path):
+            raise EngineUnavailable(f"ASR engine 'vosk' needs VOSK_MODEL_PATH to point at a model directory (got '{model_path}')")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        started = time.monotonic()
+        self.model = vosk.Model(model_path)
+        log.info("Vosk model loaded from %s in %.1fs.", model_path, time.monotonic() - started)
+
+    def _recognizer(self, options: RecognitionOptions):
+        return self._vosk.KaldiRecognizer(self.model, options.sample_rate_hz)
+
+    async def start_stream(self, audio: AsyncIterable[bytes], options: RecognitionOptions) -> AsyncIterator[TranscriptResult]:
+        return self._results(audio, self._recognizer(options))
+
+    async def _results(self, audio: AsyncIterable[bytes], recognizer) -> AsyncIterator[TranscriptResult]:
+        partial = ""
+        async for chunk in audio:
+            if await asyncio.to_thread(recognizer.AcceptWaveform, chunk):
+                partial = ""
+                text = json.loads(recognizer.Result()).get("text", "")
+                if text:
+                    yield TranscriptResult(text, True)
+            else:
+                text = json.loads(recognizer.PartialResult()).get("partial", "")
+                if text and text != partial: # Only report partials that changed
+                    partial = text
+                    yield TranscriptResult(text, False)
+        text = json.loads(await asyncio.to_thread(recognizer.FinalResult)).get("text", "")
+        if text:
+            yield TranscriptResult(text, True)
+
+    def _transcribe_sync(self, audio: bytes, options: RecognitionOptions) -> str:
+        recognizer = self._recognizer(options)
+        pcm = pcm_from_audio(audio)
+        texts: List[str] = []
+        step = BYTES_PER_SECOND * 4
+        for offset in range(0, len(pcm), step):
+            if recognizer.AcceptWaveform(pcm[offset:offset + step]):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        return " ".join(t for t in texts if t)
+
+    async def transcribe(self, audio: bytes, options: RecognitionOptions) -> str:
+        return await asyncio.to_thread(self._transcribe_sync, audio, options)
+
+
+# --- Registry ---
+ENGINE_FACTORIES: Dict[str, Callable[[], AsrEngine]] = {
+    "google": GoogleSpeechEngine,
+    "fake": FakeEngine.from_settings,
+    "vosk": lambda: VoskEngine(settings.VOSK_MODEL_PATH),
+}
+
+_engines: Dict[str, AsrEngine] = {}
+_engines_lock = threading.Lock() # Construction may run on a worker thread (model loading)
+
+
+def enabled_engines() -> List[str]:
+    """Engines clients may select: ASR_ENGINES_ENABLED, always including the deployment default."""
+    names = [settings.ASR_ENGINE] + [n.strip().lower() for n in settings.ASR_ENGINES_ENABLED.split(",") if n.strip()]
+    return [n for i, n in enumerate(names) if n in ENGINE_FACTORIES and n not in names[:i]]
+
+
+def get_engine(name: Optional[str] = None) -> AsrEngine:
+    """
+    The shared engine called `name` (default: ASR_ENGINE), constructed on first
+    use. Raises EngineUnavailable if it is unknown, not enabled, or fails to load.
+    """
+    name = (name or settings.ASR_ENGINE).lower()
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    if name not in enabled_engines():
+        raise EngineUnavailable(f"ASR engine '{name}' is not enabled (available: {', '.join(enabled_engines())})")
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            try:
+                engine = ENGINE_FACTORIES[name]()
+            except EngineUnavailable:
+                raise
+            except Exception as e:
+                raise EngineUnavailable(f"ASR engine '{name}' failed to load: {e}") from e
+            _engines[name] = engine
+            log.info("ASR engine '%s' ready.", name)
+    return engine
+
+
+async def start_engines() -> None:
+    """Loads every enabled engine and opens its connections; failures are logged, not fatal."""
+    for name in enabled_engines():
+        try:
+            engine = await asyncio.to_thread(get_engine, name)
+            await engine.start()
+        except Exception as e:
+            log.error("ASR engine '%s' could not be started: %s", name, e)
+
+
+async def stop_engines() -> None:
+    for engine in list(_engines.values()):
+        try:
+            await engine.stop()
+        except Exception as e:
+            log.warning("ASR engine '%s' did not stop cleanly: %s", engine.name, e)
+
+
+metrics.callback_gauge(
+    "asr_channel_pool_channels", "Pooled Cloud Speech gRPC channels by connectivity state.", ("state",),
+    lambda: [((state,), count) for state, count in
+             (_engines["google"].pool.states() if "google" in _engines else {}).items()],
+)
+
+
+def describe_engines() -> List[dict]:
+    """Enabled engines with their capabilities, for clients choosing one."""
+    described = []
+    for name in enabled_engines():
+        try:
+            entry = get_engine(name).describe()
+            entry["available"] = True
+        except EngineUnavailable as e:
+            entry = {"name": name, "available": False, "error": str(e)}
+        entry["default"] = name == settings.ASR_ENGINE
+        described.append(entry)
+    return described
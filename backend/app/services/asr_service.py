@@ -1,193 +1,250 @@
 # app/services/asr_service.py
 import asyncio
+import contextlib
 import logging
-from typing import AsyncGenerator
+import os
+import time
+import wave
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional, Tuple
 
+import aiofiles
+import numpy as np
 from fastapi import WebSocket # Import WebSocket for type hint
-from google.cloud import speech
-from google.api_core.exceptions import DeadlineExceeded, Cancelled
 
 # Import project components
+from app.core import metrics, tracing
 from app.schemas.session import SessionState # Assuming SessionState is there
 from app.utils.connection_manager import manager # Assuming manager is imported/defined
-from app.db.session import SessionLocal # Import SessionLocal to create a DB session
-from app.services import note_service # Import the new note service
-
-# --- ASR Configuration ---
-ASR_RATE_HZ = 16000
-ASR_LANGUAGE_CODE = "en-US"
+from app.services import draft_notes
+from app.services import asr_engines
+from app.services.asr_engines import AsrEngine, RecognitionOptions
+from app.core.config import settings
+from app.utils import audio_chunks
+from app.utils.transcript_updates import TranscriptUpdates
 
 log = logging.getLogger(__name__)
 
-def get_asr_config() -> speech.RecognitionConfig:
-    # ... (Keep existing get_asr_config function) ...
-    return speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=ASR_RATE_HZ,
-        language_code=ASR_LANGUAGE_CODE,
-        enable_automatic_punctuation=True,
-        diarization_config=speech.SpeakerDiarizationConfig( # Keep diarization if needed
-            enable_speaker_diarization=True, min_speaker_count=1, max_speaker_count=2,
-        ),
-    )
+# Sent in place of suppressed silence so the ASR stream does not time out (100 ms of digital silence)
+KEEPALIVE_FRAME = bytes(asr_engines.BYTES_PER_SECOND // 10)
 
-async def audio_stream_generator(state: SessionState) -> AsyncGenerator[speech.StreamingRecognizeRequest, None]:
-    # ... (Keep existing audio_stream_generator function) ...
-    log.info(f"[{state.id}] Starting audio stream generator...")
-    yield speech.StreamingRecognizeRequest(streaming_config=speech.StreamingRecognitionConfig(
-        config=get_asr_config(), interim_results=True, single_utterance=False
-    ))
+async def audio_chunk_generator(state: SessionState, parent_span=None) -> AsyncGenerator[bytes, None]:
+    """
+    Yields the session's buffered audio until it is closed and drained, or the session ends.
+    With voice activity detection (state.vad) only speech is yielded, plus KEEPALIVE_FRAME
+    whenever nothing was sent for DICTATION_VAD_KEEPALIVE_SECONDS.
+    """
+    log.debug("[%s] Starting audio stream generator...", state.id)
+    # Detached: the generator body runs in the ASR engine's task, not the caller's context
+    span = tracing.start_detached_span("asr.audio_generator", parent=parent_span)
+    vad = state.vad
+    last_sent = time.monotonic()
+    chunks = keepalives = 0
     while state.is_active:
         try:
-            chunk = await asyncio.wait_for(state.audio_queue.get(), timeout=5.0)
+            chunk = await asyncio.wait_for(state.audio.get(settings.DICTATION_ASR_CHUNK_BYTES), timeout=5.0)
             if chunk is None: break
-            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+            if vad is not None:
+                chunk = vad.process(chunk) # ~60us per 250ms chunk; not worth a thread hop
+                if not chunk:
+                    if time.monotonic() - last_sent < settings.DICTATION_VAD_KEEPALIVE_SECONDS:
+                        continue
+                    chunk = KEEPALIVE_FRAME
+                    keepalives += 1
+            chunks += 1
+            last_sent = time.monotonic()
+            yield chunk
         except asyncio.TimeoutError:
             if not state.is_active: break
             continue
         except Exception as e:
-            log.error(f"[{state.id}] Audio generator error: {e}")
+            log.error("[%s] Audio generator error: %s", state.id, e)
+            span.record_error(e)
             break
-    log.info(f"[{state.id}] Audio stream generator finished.")
+    span.set_attribute("asr.chunks", chunks)
+    if vad is not None and vad.input_bytes:
+        span.set_attribute("asr.vad_suppressed_ratio", round(vad.suppressed_ratio, 3))
+        span.set_attribute("asr.keepalives", keepalives)
+        metrics.asr_vad_suppressed_ratio.observe(vad.suppressed_ratio)
+        metrics.asr_audio_seconds.inc("forwarded", amount=vad.forwarded_bytes / asr_engines.BYTES_PER_SECOND)
+        metrics.asr_audio_seconds.inc("suppressed", amount=(vad.input_bytes - vad.forwarded_bytes) / asr_engines.BYTES_PER_SECOND)
+    span.end()
+    log.debug("[%s] Audio stream generator finished.", state.id)
 
 
 # --- RENAMED & MODIFIED: Main Processing Function ---
-async def process_dictation_and_save_note(websocket: WebSocket, state: SessionState):
+async def process_dictation_and_save_note(websocket: WebSocket, state: SessionState, engine: Optional[AsrEngine] = None):
     """
-    Handles ASR streaming, sends feedback, accumulates transcript,
-    and saves the final note to the database.
+    Handles ASR streaming, sends feedback, keeps the final segments in a draft
+    note while the session runs (app/services/draft_notes.py) and saves it as
+    the clinical note when the stream ends. `engine` defaults to ASR_ENGINE.
     """
-    db: Session | None = None # Initialize db session variable
+    has_context = bool(state.encounter_id and state.author_id and state.note_type)
+    drafts = draft_notes.DraftWriter(state, settings.DICTATION_DRAFT_FLUSH_SECONDS, settings.DICTATION_DRAFT_FLUSH_SEGMENTS)
+    if has_context:
+        drafts.start()
+    # Interim results coalesced to DICTATION_INTERIM_MAX_RATE; v3 clients get only what changed
+    updates = TranscriptUpdates(lambda message: manager.send_json(state.id, message),
+                                settings.DICTATION_INTERIM_MAX_RATE, diffs=state.protocol == "v3")
+    # ASR phase spans, ended in `finally` so failed sessions are traced too
+    connect_span = tracing.start_detached_span("asr.connect")
+    stream_span = None
     try:
-        # Initialize Google Speech Client
-        client = speech.SpeechAsyncClient()
-        log.info(f"[{state.id}] Google Speech Client initialized for dictation.")
-
-        requests = audio_stream_generator(state)
-        log.info(f"[{state.id}] Audio stream generator created.")
+        engine = engine or asr_engines.get_engine()
+        connect_span.set_attribute("asr.engine", engine.name)
+        chunks = audio_chunk_generator(state, parent_span=tracing.current_span.get())
 
         # Start streaming recognition
-        responses: AsyncGenerator[speech.StreamingRecognizeResponse, None] = await client.streaming_recognize(
-            requests=requests,
-            timeout=300 # 5-minute inactivity timeout
-        )
-        log.info(f"[{state.id}] Google streaming_recognize called, awaiting responses...")
-
-        # Process responses asynchronously
-        async for response in responses:
-            if not state.is_active or state.id not in manager.active_connections:
-                log.warning(f"[{state.id}] WebSocket closed during ASR, stopping processing.")
-                break # Stop processing if client disconnected
-
-            if not response.results: continue
-            result = response.results[0]
-            if not result.alternatives: continue
-
-            transcript_fragment = result.alternatives[0].transcript
-            is_final = result.is_final
-
-            # 1. Send Transcript Update Back to App
-            await manager.send_json(state.id, {
-                "type": "transcript_update",
-                "text": transcript_fragment,
-                "is_final": is_final,
-            })
-            log.debug(f"[{state.id}] Sent transcript fragment: '{transcript_fragment}' (Final: {is_final})")
-
-            # 2. Accumulate Final Transcript
-            if is_final:
-                state.final_transcript += transcript_fragment.strip() + " " # Add space between final segments
+        results = await engine.start_stream(chunks, RecognitionOptions())
+        log.debug("[%s] ASR engine '%s' stream started, awaiting results...", state.id, engine.name)
+        connect_span.end()
+
+        # Process results asynchronously
+        stream_span = tracing.start_detached_span("asr.stream")
+        stream_span.set_attribute("asr.engine", engine.name)
+        first_transcript_pending = True
+        # Closed on every exit, so breaking out releases the engine's stream (and pooled client) at once
+        async with contextlib.aclosing(results):
+            async for result in results:
+                if not state.is_active or state.id not in manager.active_connections:
+                    log.warning("[%s] WebSocket closed during ASR, stopping processing.", state.id)
+                    break # Stop processing if client disconnected
+
+                transcript_fragment = result.text
+                is_final = result.is_final
+                if first_transcript_pending and state.first_audio_at is not None:
+                    metrics.asr_time_to_first_transcript.observe(time.monotonic() - state.first_audio_at, engine.name)
+                    stream_span.set_attribute("asr.first_result_ms", round((time.monotonic() - state.first_audio_at) * 1000))
+                    first_transcript_pending = False
+
+                # 1. Send Transcript Update Back to App (held briefly if interim results come faster than the max rate)
+                await updates.publish(transcript_fragment, is_final)
+                log.debug("[%s] Published transcript fragment: '%s' (Final: %s)", state.id, transcript_fragment, is_final)
+
+                # 2. Keep Final Segments (flushed to the draft note in batches)
+                if is_final and transcript_fragment.strip():
+                    drafts.add(transcript_fragment.strip())
 
         # --- AFTER ASR STREAM FINISHES ---
-        log.info(f"[{state.id}] ASR stream processing finished. Final accumulated transcript length: {len(state.final_transcript)}")
-
-        # 3. Save Final Note to Database
-        if state.final_transcript and state.encounter_id and state.author_id and state.note_type:
-            log.info(f"[{state.id}] Attempting to save final note to database...")
-            # Create a NEW database session specifically for this save operation
-            db = SessionLocal()
-            saved_note = await asyncio.to_thread( # Run synchronous DB operation in thread pool
-                note_service.create_note,
-                db=db,
-                encounter_id=state.encounter_id,
-                author_id=state.author_id,
-                note_type=state.note_type,
-                content=state.final_transcript.strip() # Remove trailing space
-            )
-            if saved_note:
-                await manager.send_json(state.id, {"status": "note_saved", "note_id": saved_note.id})
-                log.info(f"[{state.id}] Note saved successfully (ID: {saved_note.id}).")
-            else:
-                await manager.send_json(state.id, {"status": "error", "message": "Failed to save clinical note."})
-                log.error(f"[{state.id}] Failed to save clinical note via note_service.")
-        else:
-            log.warning(f"[{state.id}] Skipping note save: Missing required context (encounter_id, author_id, note_type) or empty transcript.")
-            await manager.send_json(state.id, {"status": "warning", "message": "Note not saved (missing context or empty transcript)."})
-
-
-    except DeadlineExceeded:
-        log.warning(f"[{state.id}] ASR stream timeout.")
+        await updates.close()
+        stream_span.set_attribute("asr.transcript_segments", len(state.transcript_segments))
+        stream_span.set_attribute("asr.results", updates.results)
+        stream_span.set_attribute("asr.messages", updates.messages)
+        stream_span.end()
+        if state.audio_ended_at is not None:
+            metrics.asr_final_result_latency.observe(time.monotonic() - state.audio_ended_at, engine.name)
+        log.info("[%s] ASR stream processing finished. Final segments: %s", state.id, len(state.transcript_segments))
+
+    except asr_engines.AsrTimeout:
+        log.warning("[%s] ASR stream timeout.", state.id)
         await manager.send_json(state.id, {"status": "timeout", "message": "ASR stream timed out."})
-    except Cancelled:
-        log.info(f"[{state.id}] ASR stream cancelled (expected on disconnect/end).")
+    except asyncio.CancelledError:
+        # Server shutting down: the draft stays behind and the recovery sweep saves it
+        drafts.abandon()
+        raise
     except Exception as e:
-        log.error(f"[{state.id}] CRITICAL ASR Service Error: {e}", exc_info=True)
+        log.error("[%s] CRITICAL ASR Service Error: %s", state.id, e, exc_info=True)
+        (stream_span or connect_span).record_error(e)
         await manager.send_json(state.id, {"status": "asr_error", "message": f"ASR processing failed: {type(e).__name__}"})
     finally:
+        connect_span.end()
+        if stream_span is not None:
+            stream_span.end()
         state.is_active = False # Ensure generator stops
-        if db: # Close the specific DB session we opened
-            db.close()
-        log.info(f"[{state.id}] process_dictation_and_save_note finished.")
+        updates.discard()
+        metrics.asr_transcript_results.inc("sent", amount=updates.messages)
+        metrics.asr_transcript_results.inc("coalesced", amount=updates.results - updates.messages)
+
+    # 3. Save the Note: promote the draft (after an ASR error too, so what was recognised is kept)
+    if has_context and state.transcript_segments:
+        log.debug("[%s] Attempting to save final note to database...", state.id)
+        try:
+            with tracing.start_span("asr.note_save"): # to_thread copies the context, so SQL spans nest here
+                saved_note = await drafts.close()
+        except Exception as e:
+            log.error("[%s] Could not save the note; its draft is left for recovery: %s", state.id, e, exc_info=True)
+            saved_note = None
+        if saved_note:
+            await manager.send_json(state.id, {"status": "note_saved", "note_id": saved_note.id})
+            log.info("[%s] Note saved successfully (ID: %s).", state.id, saved_note.id)
+        else:
+            await manager.send_json(state.id, {"status": "error", "message": "Failed to save clinical note."})
+            log.error("[%s] Failed to save clinical note via note_service.", state.id)
+    else:
+        drafts.abandon() # Nothing to save
+        log.warning("[%s] Skipping note save: Missing required context (encounter_id, author_id, note_type) or empty transcript.", state.id)
+        await manager.send_json(state.id, {"status": "warning", "message": "Note not saved (missing context or empty transcript)."})
+    log.debug("[%s] process_dictation_and_save_note finished.", state.id)
+
+
+def _pcm_span(file_path: str) -> Tuple[int, int]:
+    """(offset, length) of the samples in a WAV file; the whole file for anything else (raw LINEAR16)."""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        try:
+            with wave.open(f, 'rb') as w:
+                # wave stops at the data chunk header, so the file position is where the samples start
+                offset = f.tell()
+                return offset, min(size - offset, w.getnframes() * w.getsampwidth() * w.getnchannels())
+        except (wave.Error, EOFError):
+            return 0, size
+
+
+def _plan_file_chunks(file_path: str, offset: int, length: int) -> List[audio_chunks.AudioChunk]:
+    """Silence-aligned chunks of a recording, read through a memory map (CPU-bound: run in a thread)."""
+    if length < 2:
+        return []
+    samples = np.memmap(file_path, dtype='<i2', mode='r', offset=offset, shape=(length // 2,))
+    return audio_chunks.plan_chunks(
+        samples, asr_engines.SAMPLE_RATE_HZ, settings.DICTATION_CHUNK_SECONDS,
+        settings.DICTATION_CHUNK_OVERLAP_SECONDS, settings.DICTATION_CHUNK_SEARCH_SECONDS,
+    )
 
 
-async def transcribe_file_and_save_note(file_path: str, encounter_id: int, author_id: int, note_type: str = 'doctor_dictation'):
+@tracing.traced("asr.transcribe_file")
+async def transcribe_file(file_path: str, engine: Optional[AsrEngine] = None,
+                          on_progress: Optional[Callable[[float], Awaitable[None]]] = None) -> str:
     """
-    Transcribe a single audio file (WAV/LINEAR16 recommended) and save the resulting note.
-    This is intended for REST-style uploads where the client POSTs a complete audio file.
-    Returns a dict with { transcript, note_id } on success.
+    Transcribe a recording of any length (16 kHz LINEAR16 WAV or raw samples) and return the text.
+    `engine` defaults to ASR_ENGINE.
+    The audio is split at silences into chunks of about DICTATION_CHUNK_SECONDS, overlapping
+    only where a cut has to go through speech (see app/utils/audio_chunks.py). The chunks are
+    recognised DICTATION_CHUNK_CONCURRENCY at a time and stitched back in order; only the
+    chunks being recognised are held in memory.
+    `on_progress(fraction)` is awaited as chunks complete.
     """
-    db = None
+    engine = engine or asr_engines.get_engine()
+    offset, length = await asyncio.to_thread(_pcm_span, file_path)
+    chunks = await asyncio.to_thread(_plan_file_chunks, file_path, offset, length)
+    total = sum(chunk.end - chunk.start for chunk in chunks)
+    log.info("Transcribing file: %s (%.0fs of audio in %s chunks, engine %s)",
+             file_path, length / asr_engines.BYTES_PER_SECOND, len(chunks), engine.name)
+    semaphore = asyncio.Semaphore(settings.DICTATION_CHUNK_CONCURRENCY)
+    done = 0
+
+    async def transcribe_chunk(index: int, chunk: audio_chunks.AudioChunk) -> str:
+        nonlocal done
+        async with semaphore:
+            async with aiofiles.open(file_path, 'rb') as f:
+                await f.seek(offset + chunk.start * 2)
+                audio = await f.read((chunk.end - chunk.start) * 2)
+            with tracing.start_span("asr.recognize", attributes={"asr.engine": engine.name, "asr.chunk": index}):
+                text = await engine.transcribe(audio, RecognitionOptions())
+        done += chunk.end - chunk.start
+        if on_progress is not None:
+            await on_progress(done / total)
+        return text.strip()
+
+    tasks = [asyncio.create_task(transcribe_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
     try:
-        client = speech.SpeechClient()
-        log.info(f"Transcribing file: {file_path}")
-
-        with open(file_path, 'rb') as f:
-            content = f.read()
-
-        audio = speech.RecognitionAudio(content=content)
-        config = get_asr_config()
-
-        # Use synchronous recognize for single-file uploads (suitable for small files)
-        response = client.recognize(config=config, audio=audio)
-
-        # Accumulate transcript
-        transcript = ''
-        for result in response.results:
-            if result.alternatives:
-                transcript += result.alternatives[0].transcript.strip() + ' '
-
-        transcript = transcript.strip()
-        log.info(f"Transcription finished; length={len(transcript)}")
-
-        if transcript:
-            # Save note to DB using note_service (run in thread pool for sync DB ops)
-            db = SessionLocal()
-            saved_note = await asyncio.to_thread(
-                note_service.create_note,
-                db,
-                encounter_id,
-                author_id,
-                note_type,
-                transcript,
-            )
-            note_id = getattr(saved_note, 'id', None)
-            return { 'transcript': transcript, 'note_id': note_id }
-        else:
-            return { 'transcript': '', 'note_id': None }
-
-    except Exception as e:
-        log.error(f"transcribe_file_and_save_note error: {e}", exc_info=True)
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        # One failed chunk fails the file; do not leave the others running
+        for task in tasks:
+            task.cancel()
         raise
-    finally:
-        if db:
-            db.close()
\ No newline at end of file
+
+    # Words in an overlap: at most what a fast speaker (~4 words/s) fits in both overlaps
+    max_overlap_words = max(1, round(settings.DICTATION_CHUNK_OVERLAP_SECONDS * 2 * 4))
+    transcript = audio_chunks.stitch(texts, [chunk.cut_in_speech for chunk in chunks], max_overlap_words)
+    log.info("Transcription finished; length=%s", len(transcript))
+    return transcript
@@ -0,0 +1,253 @@
+# app/services/draft_notes.py
+"""
+Incremental persistence of live dictation transcripts.
+
+A dictation session keeps its final ASR segments in a list
+(SessionState.transcript_segments) and a DraftWriter flushes the new ones
+to the session's draft_notes row every DICTATION_DRAFT_FLUSH_SECONDS, or
+sooner once DICTATION_DRAFT_FLUSH_SEGMENTS are waiting. The first flush
+inserts the row; later ones append with UPDATE ... SET content = content
+|| :text, so no write reads or resends what is already stored. When the
+session ends, the draft is promoted: the ClinicalNote is inserted and the
+draft deleted in one transaction.
+
+If the process dies mid-session the draft stays behind. Sessions refresh
+their draft's updated_at at least every DICTATION_DRAFT_STALE_SECONDS / 4,
+so a draft older than DICTATION_DRAFT_STALE_SECONDS has lost its session;
+every process sweeps for those at startup and periodically, and promotes
+them so the dictation is not lost.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.tracing import traced
+from app.db.session import SessionLocal
+from app.models.draft_note import DraftNote
+from app.models.note import ClinicalNote, NoteType
+from app.schemas.session import SessionState
+from app.services import note_service
+
+log = logging.getLogger(__name__)
+
+draft_writes = metrics.counter(
+    "draft_note_writes_total", "Draft note writes by live dictation sessions, by kind (create, append, heartbeat, failed).",
+    ("kind",),
+)
+drafts_recovered = metrics.counter(
+    "draft_notes_recovered_total", "Drafts left by ended sessions that were promoted to notes (or dropped when empty).",
+    ("outcome",),
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# --- Draft rows ---
+@traced()
+def create_draft(db: Session, *, session_id: str, encounter_id: int, author_id: int, note_type: NoteType,
+                 content: str, segments: int) -> int:
+    draft = DraftNote(session_id=session_id, encounter_id=encounter_id, author_id=author_id, note_type=note_type,
+                      content=content, segments=segments, updated_at=_now())
+    db.add(draft)
+    db.commit()
+    return draft.id
+
+@traced()
+def append_to_draft(db: Session, *, draft_id: int, text: str, segments: int) -> bool:
+    """Appends `text` in the database (no read of the stored content). False if the draft is gone."""
+    result = db.execute(
+        update(DraftNote).where(DraftNote.id == draft_id)
+        .values(content=DraftNote.content + text, segments=DraftNote.segments + segments, updated_at=_now())
+    )
+    db.commit()
+    return result.rowcount == 1
+
+@traced()
+def touch_draft(db: Session, *, draft_id: int) -> None:
+    """Refreshes updated_at so the recovery sweep leaves the draft of an idle session alone."""
+    db.execute(update(DraftNote).where(DraftNote.id == draft_id).values(updated_at=_now()))
+    db.commit()
+
+@traced()
+def promote_draft(db: Session, *, draft_id: Optional[int], encounter_id: int, author_id: int,
+                  note_type: NoteType, content: str) -> Optional[ClinicalNote]:
+    """
+    Saves the session's transcript as a ClinicalNote and deletes its draft (if it
+    has one) in the same commit; if the note cannot be saved, the draft is kept.
+    """
+    if draft_id is not None:
+        db.execute(delete(DraftNote).where(DraftNote.id == draft_id))
+    # create_note commits (deleting the draft with it) or rolls back (keeping it)
+    return note_service.create_note(db, encounter_id=encounter_id, author_id=author_id,
+                                    note_type=note_type, content=content)
+
+@traced()
+def recover_stale_drafts(db: Session) -> int:
+    """
+    Promotes the drafts of sessions that stopped writing DICTATION_DRAFT_STALE_SECONDS
+    ago. Each draft is deleted on the condition that updated_at is unchanged, so
+    a session that is still alive, or another process's sweep, keeps it.
+    """
+    cutoff = _now() - timedelta(seconds=settings.DICTATION_DRAFT_STALE_SECONDS)
+    stale = db.scalars(select(DraftNote).where(DraftNote.updated_at < cutoff).order_by(DraftNote.id)).all()
+    recovered = 0
+    for draft in stale:
+        result = db.execute(delete(DraftNote).where(DraftNote.id == draft.id, DraftNote.updated_at == draft.updated_at))
+        if result.rowcount != 1:
+            db.rollback()
+            continue
+        if not draft.content.strip():
+            db.commit()
+            drafts_recovered.inc("empty")
+            continue
+        note = note_service.create_note(db, encounter_id=draft.encounter_id, author_id=draft.author_id,
+                                        note_type=draft.note_type, content=draft.content)
+        if note is None:
+            db.rollback() # Keep the draft for the next sweep
+            log.error("Could not promote draft %s of dictation %s; will retry.", draft.id, draft.session_id)
+            drafts_recovered.inc("failed")
+            continue
+        log.warning("Recovered draft %s of interrupted dictation %s as note %s (%s segments).",
+                    draft.id, draft.session_id, note.id, draft.segments)
+        drafts_recovered.inc("promoted")
+        recovered += 1
+    return recovered
+
+def _with_session(function, **kwargs):
+    """Runs a draft operation in its own short-lived session (called via asyncio.to_thread)."""
+    db = SessionLocal()
+    try:
+        return function(db, **kwargs)
+    finally:
+        db.close()
+
+
+# --- Live sessions ---
+class DraftWriter:
+    """
+    Flushes a dictation session's new final segments to its draft note from a
+    background task: every `flush_interval` seconds, or when `add` has queued
+    `flush_segments`. Only that task writes, so flushes never overlap; a failed
+    write leaves the segments queued for the next one. `close` stops the task
+    and promotes the draft to the session's note.
+    """
+
+    def __init__(self, state: SessionState, flush_interval: float, flush_segments: int):
+        self.state = state
+        self.flush_interval = flush_interval
+        self.flush_segments = flush_segments
+        self.draft_id: Optional[int] = None
+        self._first_segment = 0 # Segments before this are already in a recovered note
+        self._last_write = time.monotonic()
+        self._closing = False
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name=f"draft-writer-{self.state.id}")
+
+    def add(self, segment: str) -> None:
+        self.state.transcript_segments.append(segment)
+        if len(self.state.transcript_segments) - self.state.saved_segments >= self.flush_segments:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._closing:
+                await self.flush()
+
+    async def flush(self) -> None:
+        state = self.state
+        pending: List[str] = state.transcript_segments[state.saved_segments:]
+        try:
+            if pending:
+                text = " ".join(pending)
+                if self.draft_id is None:
+                    self.draft_id = await asyncio.to_thread(
+                        _with_session, create_draft, session_id=state.id, encounter_id=state.encounter_id,
+                        author_id=state.author_id, note_type=NoteType(state.note_type), content=text,
+                        segments=len(pending),
+                    )
+                    draft_writes.inc("create")
+                elif await asyncio.to_thread(_with_session, append_to_draft, draft_id=self.draft_id,
+                                             text=" " + text, segments=len(pending)):
+                    draft_writes.inc("append")
+                else:
+                    # Swept as stale (the session stalled for longer than DICTATION_DRAFT_STALE_SECONDS);
+                    # its content is a note now, so the session's own note starts after it
+                    log.warning("[%s] Draft %s was recovered while the session was live.", state.id, self.draft_id)
+                    self.draft_id = None
+                    self._first_segment = state.saved_segments
+                    draft_writes.inc("failed")
+                    return
+                state.saved_segments += len(pending)
+                self._last_write = time.monotonic()
+            elif self.draft_id is not None and \
+                    time.monotonic() - self._last_write >= settings.DICTATION_DRAFT_STALE_SECONDS / 4:
+                await asyncio.to_thread(_with_session, touch_draft, draft_id=self.draft_id)
+                draft_writes.inc("heartbeat")
+                self._last_write = time.monotonic()
+        except SQLAlchemyError as e:
+            log.warning("[%s] Could not write the draft note (%s segments pending): %s", state.id, len(pending), e)
+            draft_writes.inc("failed")
+
+    def abandon(self) -> None:
+        """Stops flushing without saving a note (the task was cancelled); the recovery sweep promotes the draft."""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def close(self) -> Optional[ClinicalNote]:
+        """Stops flushing (letting a write in progress finish) and saves the transcript as a note."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+        state = self.state
+        content = " ".join(state.transcript_segments[self._first_segment:]).strip()
+        if not content:
+            return None
+        return await asyncio.to_thread(
+            _with_session, promote_draft, draft_id=self.draft_id, encounter_id=state.encounter_id,
+            author_id=state.author_id, note_type=NoteType(state.note_type), content=content,
+        )
+
+
+# --- Recovery ---
+_recovery_task: Optional[asyncio.Task] = None
+
+async def _sweep_periodically() -> None:
+    while True:
+        try:
+            recovered = await asyncio.to_thread(_with_session, recover_stale_drafts)
+            if recovered:
+                log.info("Promoted %s drafts of interrupted dictations.", recovered)
+        except SQLAlchemyError as e:
+            log.error("Draft recovery sweep failed: %s", e)
+        await asyncio.sleep(settings.DICTATION_DRAFT_STALE_SECONDS / 2)
+
+async def start_recovery() -> None:
+    """Sweeps for drafts of interrupted dictations now and every DICTATION_DRAFT_STALE_SECONDS / 2 (lifespan startup)."""
+    global _recovery_task
+    _recovery_task = asyncio.create_task(_sweep_periodically(), name="draft-recovery")
+
+async def stop_recovery() -> None:
+    global _recovery_task
+    if _recovery_task is not None:
+        _recovery_task.cancel()
+        await asyncio.gather(_recovery_task, return_exceptions=True)
+        _recovery_task = None
@@ -1,35 +1,60 @@
 # app/services/note_service.py
 import logging
+import time
 from typing import Optional, List # Ensure List is imported if needed elsewhere
 from sqlalchemy.orm import Session # <-- ADD THIS IMPORT
 from sqlalchemy.exc import SQLAlchemyError
 from app.models.note import ClinicalNote, NoteType
 from app.models.encounter import Encounter
+from app.models.user import User
+from app.core import metrics
+from app.core.tracing import traced
 # ...
 
 log = logging.getLogger(__name__)
 
 # --- (Existing create_note function remains here) ---
+@traced()
 def create_note(
     db: Session,
     *,
     encounter_id: int,
     author_id: int,
     note_type: NoteType,
-    content: str
+    content: str,
+    commit: bool = True
 ) -> Optional[ClinicalNote]:
-    # ... (existing code) ...
-    log.info(f"Attempting to save note for encounter {encounter_id} by author {author_id}")
+    """
+    Validates and saves a clinical note; the duration is recorded in note_save_duration_seconds.
+    With commit=False the note is only flushed (it has its ID) and the caller commits it
+    with the rest of its transaction.
+    """
+    start = time.perf_counter()
+    note = _create_note(db, encounter_id=encounter_id, author_id=author_id, note_type=note_type, content=content,
+                        commit=commit)
+    metrics.note_save_duration.observe(time.perf_counter() - start, "saved" if note else "failed")
+    return note
+
+def _create_note(
+    db: Session,
+    *,
+    encounter_id: int,
+    author_id: int,
+    note_type: NoteType,
+    content: str,
+    commit: bool = True
+) -> Optional[ClinicalNote]:
+    log.debug("Attempting to save note for encounter %s by author %s", encounter_id, author_id)
     encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
     if not encounter:
-        log.error(f"Cannot save note: Encounter {encounter_id} not found.")
+        log.error("Cannot save note: Encounter %s not found.", encounter_id)
         return None
     author = db.query(User).filter(User.id == author_id).first()
     if not author:
-         log.error(f"Cannot save note: Author {author_id} not found.")
+         log.error("Cannot save note: Author %s not found.", author_id)
          return None
     if not content or not content.strip():
-        log.warning(f"Attempted to save empty note for encounter {encounter_id}.")
+        log.warning("Attempted to save empty note for encounter %s.", encounter_id)
         return None
 
     try:
@@ -40,26 +65,30 @@ def create_note(
             content=content.strip()
         )
         db.add(db_note)
+        if not commit:
+            db.flush()
+            return db_note
         db.commit()
         db.refresh(db_note)
-        log.info(f"Successfully saved note ID: {db_note.id} for encounter {encounter_id}")
+        log.info("Successfully saved note ID: %s for encounter %s", db_note.id, encounter_id)
         return db_note
     except SQLAlchemyError as e:
-        log.error(f"Database error saving note for encounter {encounter_id}: {e}", exc_info=True)
+        log.error("Database error saving note for encounter %s: %s", encounter_id, e, exc_info=True)
         db.rollback()
         return None
     except Exception as e:
-        log.error(f"Unexpected error saving note for encounter {encounter_id}: {e}", exc_info=True)
+        log.error("Unexpected error saving note for encounter %s: %s", encounter_id, e, exc_info=True)
         db.rollback()
         return None
 
 # --- NEW: Function to get notes for an encounter ---
+@traced()
 def get_notes_for_encounter(db: Session, *, encounter_id: int) -> List[ClinicalNote]:
     """
     Retrieves all clinical notes associated with a specific encounter,
     ordered by creation time (newest first).
     """
-    log.debug(f"Querying for notes associated with encounter ID: {encounter_id}")
+    log.debug("Querying for notes associated with encounter ID: %s", encounter_id)
     # Optional: Add validation to check if encounter_id exists first
     notes = (
         db.query(ClinicalNote)
@@ -67,5 +96,5 @@ def get_notes_for_encounter(db: Session, *, encounter_id: int) -> List[ClinicalN
         .order_by(ClinicalNote.created_at.desc()) # Show newest notes first
         .all()
     )
-    log.info(f"Found {len(notes)} notes for encounter ID: {encounter_id}")
+    log.debug("Found %s notes for encounter ID: %s", len(notes), encounter_id)
     return notes
\ No newline at end of file
@@ -1,6 +1,5 @@
 # app/services/patient_service.py
 import logging
-import datetime
 from typing import Optional, List, Dict, Any # Ensure all needed types are imported
 
 from sqlalchemy.orm import Session
@@ -14,47 +13,44 @@ from app.models.encounter import Encounter
 from app.models.note import ClinicalNote
 from app.models.task import NurseTask
 from app.schemas.patient import PatientCreate
+from app.utils.id_allocator import patient_id_allocator
+from app.core.tracing import traced
 
-# Configure logging
+# Configure logging (handlers are set up once in app/core/logging_config.py)
 log = logging.getLogger(__name__)
-# Ensure logging is configured (e.g., in main.py or here)
-logging.basicConfig(level=logging.INFO)
-# Consider setting level to DEBUG for more detailed history query logs
-# logging.basicConfig(level=logging.DEBUG)
+# Set LOG_LEVEL=DEBUG for the detailed history query logs
 
 
 # --- Patient ID Generation ---
-def generate_patient_id() -> str:
+def generate_patient_id(db: Session) -> str:
     """
-    Generates a unique patient ID based on date and a simple sequence/time component.
-    Format: YYYYMMDD-NNNN (e.g., 20251028-1516) - Using HHMM as placeholder sequence.
+    Generates a unique patient ID from the date and a database-backed sequence number.
+    Format: YYYYMMDD-NNNNNN (e.g., 20251028-000042).
+    Numbers are reserved in blocks per worker, so this usually needs no DB round trip.
     """
-    now = datetime.datetime.now()
-    date_str = now.strftime("%Y%m%d")
-    sequence_placeholder = now.strftime("%H%M") # Using HHMM
-
-    patient_id = f"{date_str}-{sequence_placeholder}"
-    log.debug(f"Generated potential Patient ID: {patient_id}")
-    # TODO: Add DB check for collision and increment logic if needed for high volume.
+    patient_id = patient_id_allocator.next_id(db.get_bind())
+    log.debug("Generated Patient ID: %s", patient_id)
     return patient_id
 
 # --- Patient Retrieval Functions ---
+@traced()
 def get_patient_by_id(db: Session, *, patient_id: str) -> Optional[Patient]:
     """Fetches a patient by their unique ID."""
-    log.debug(f"Querying for patient with ID: {patient_id}")
+    log.debug("Querying for patient with ID: %s", patient_id)
     patient = db.query(Patient).filter(Patient.id == patient_id).first()
     if patient:
-        log.debug(f"Patient found for ID: {patient_id}")
+        log.debug("Patient found for ID: %s", patient_id)
     else:
-        log.warning(f"Patient not found for ID: {patient_id}")
+        log.warning("Patient not found for ID: %s", patient_id)
     return patient
 
+@traced()
 def search_patients_by_name(db: Session, *, name_query: str, skip: int = 0, limit: int = 100) -> List[Patient]:
     """
     Searches for patients by full name (case-insensitive partial match).
     Includes basic pagination.
     """
-    log.debug(f"Searching for patients with name containing: '{name_query}' (skip={skip}, limit={limit})")
+    log.debug("Searching for patients with name containing: '%s' (skip=%s, limit=%s)", name_query, skip, limit)
     query_term = f"%{name_query}%"
     patients = (
         db.query(Patient)
@@ -64,21 +60,19 @@ def search_patients_by_name(db: Session, *, name_query: str, skip: int = 0, limi
         .limit(limit)
         .all()
     )
-    log.info(f"Found {len(patients)} patients matching '{name_query}'.")
+    log.debug("Found %s patients matching '%s'.", len(patients), name_query)
     return patients
 
 # --- Patient Creation ---
+@traced()
 def create_patient(db: Session, *, patient_in: PatientCreate) -> Optional[Patient]:
     """
     Registers a new patient in the database with a uniquely generated ID.
     """
-    log.info(f"Attempting to register patient: {patient_in.full_name}")
+    log.debug("Attempting to register patient: %s", patient_in.full_name)
     try:
-        new_patient_id = generate_patient_id()
-        existing_patient = get_patient_by_id(db, patient_id=new_patient_id)
-        if existing_patient:
-            log.error(f"Patient ID collision detected for ID: {new_patient_id}. Aborting creation.")
-            return None
+        # Sequence-backed IDs are unique by construction; no collision pre-check needed
+        new_patient_id = generate_patient_id(db)
 
         db_patient = Patient(
             id=new_patient_id,
@@ -89,27 +83,28 @@ def create_patient(db: Session, *, patient_in: PatientCreate) -> Optional[Patien
         db.add(db_patient)
         db.commit()
         db.refresh(db_patient)
-        log.info(f"Successfully registered patient: {db_patient.full_name} (ID: {db_patient.id})")
+        log.info("Successfully registered patient: %s (ID: %s)", db_patient.full_name, db_patient.id)
         return db_patient
     except SQLAlchemyError as e:
-        log.error(f"Database error during patient registration for {patient_in.full_name}: {e}", exc_info=True)
+        log.error("Database error during patient registration for %s: %s", patient_in.full_name, e, exc_info=True)
         db.rollback()
         return None
     except Exception as e:
-        log.error(f"Unexpected error during patient registration for {patient_in.full_name}: {e}", exc_info=True)
+        log.error("Unexpected error during patient registration for %s: %s", patient_in.full_name, e, exc_info=True)
         db.rollback()
         return None
 
 # --- Patient History Retrieval ---
+@traced()
 def get_patient_history(db: Session, *, patient_id: str) -> List[Dict[str, Any]]:
     """
     Retrieves a unified historical timeline of all Encounters, Notes, and Tasks
     for a specific patient, ordered by creation time (newest first).
     """
-    log.info(f"Querying full history for patient ID: {patient_id}")
+    log.debug("Querying full history for patient ID: %s", patient_id)
 
     if not get_patient_by_id(db, patient_id=patient_id):
-        log.warning(f"Cannot get history: Patient {patient_id} not found.")
+        log.warning("Cannot get history: Patient %s not found.", patient_id)
         return []
 
     # 1. Select Encounters - CAST ENUMS TO STRING
@@ -123,7 +118,7 @@ def get_patient_history(db: Session, *, patient_id: str) -> List[Dict[str, Any]]
         )
         .where(Encounter.patient_id == patient_id)
     )
-    log.debug(f"History Query (Encounters): {encounters_q}")
+    log.debug("History Query (Encounters): %s", encounters_q)
 
     # 2. Select Clinical Notes - CAST ENUM TO STRING
     notes_q = (
@@ -132,13 +127,13 @@ def get_patient_history(db: Session, *, patient_id: str) -> List[Dict[str, Any]]
             ClinicalNote.id.label("id"),
             ClinicalNote.created_at.label("timestamp"),
             ClinicalNote.note_type.cast(String).label("subject"), # <-- CAST FIX
-            func.left(ClinicalNote.content, 100).label("detail") # Preview
+            func.substr(ClinicalNote.content, 1, 100).label("detail") # Preview
         )
         .where(ClinicalNote.encounter_id.in_(
             select(Encounter.id).where(Encounter.patient_id == patient_id)
         ))
     )
-    log.debug(f"History Query (Notes): {notes_q}")
+    log.debug("History Query (Notes): %s", notes_q)
 
     # 3. Select Nurse Tasks - CAST ENUM TO STRING
     tasks_q = (
@@ -146,29 +141,29 @@ def get_patient_history(db: Session, *, patient_id: str) -> List[Dict[str, Any]]
             literal_column("'TASK'").label("type"),
             NurseTask.id.label("id"),
             NurseTask.created_at.label("timestamp"),
-            func.left(NurseTask.description, 100).label("subject"), # Preview
+            func.substr(NurseTask.description, 1, 100).label("subject"), # Preview
             NurseTask.status.cast(String).label("detail") # <-- CAST FIX
         )
         .where(NurseTask.encounter_id.in_(
             select(Encounter.id).where(Encounter.patient_id == patient_id)
         ))
     )
-    log.debug(f"History Query (Tasks): {tasks_q}")
+    log.debug("History Query (Tasks): %s", tasks_q)
 
     # Combine all results using UNION ALL and order by timestamp descending
     full_query = union_all(encounters_q, notes_q, tasks_q).order_by(literal_column("timestamp").desc())
-    log.debug(f"History Query (Full Union): {full_query}")
+    log.debug("History Query (Full Union): %s", full_query)
 
     try:
         # Execute the query
         result = db.execute(full_query).mappings().all()
-        log.debug(f"History query result (raw): {result}")
+        log.debug("History query result (raw): %s", result)
 
         # Convert ResultMapping objects to standard Python dictionaries
         history = [dict(row) for row in result]
 
-        log.info(f"Found {len(history)} total history events for patient {patient_id}.")
+        log.debug("Found %s total history events for patient %s.", len(history), patient_id)
         return history
     except SQLAlchemyError as e:
-        log.error(f"Database error fetching history for patient {patient_id}: {e}", exc_info=True)
+        log.error("Database error fetching history for patient %s: %s", patient_id, e, exc_info=True)
         return [] # Return empty list on error
\ No newline at end of file
@@ -12,32 +12,33 @@ from app.models.task import NurseTask, TaskStatus # Import model and enum
 from app.schemas.task import TaskCreate, TaskUpdate # Import relevant schemas
 from app.models.encounter import Encounter # Import Encounter to check existence
 from app.models.user import User, UserRole # Import User to check existence/role
+from app.core.tracing import traced
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO) # Ensure logging is configured
 
 # --- Task Creation ---
+@traced()
 def create_task(db: Session, *, task_in: TaskCreate) -> Optional[NurseTask]:
     """
     Creates a new nurse task for a specific encounter.
     Validates encounter existence and optionally assigned nurse existence/role.
     """
-    log.info(f"Attempting to create task for encounter ID: {task_in.encounter_id}")
+    log.debug("Attempting to create task for encounter ID: %s", task_in.encounter_id)
 
     # 1. Check if encounter exists
     encounter = db.query(Encounter).filter(Encounter.id == task_in.encounter_id).first()
     if not encounter:
-        log.error(f"Cannot create task: Encounter {task_in.encounter_id} not found.")
+        log.error("Cannot create task: Encounter %s not found.", task_in.encounter_id)
         return None
 
     # 2. Check if assigned nurse exists and has the correct role (optional)
     if task_in.assigned_nurse_id is not None:
         assigned_nurse = db.query(User).filter(User.id == task_in.assigned_nurse_id).first()
         if not assigned_nurse:
-            log.error(f"Cannot create task: Assigned nurse {task_in.assigned_nurse_id} not found.")
+            log.error("Cannot create task: Assigned nurse %s not found.", task_in.assigned_nurse_id)
             return None
         if assigned_nurse.role != UserRole.NURSE:
-            log.error(f"Cannot assign task: User {assigned_nurse.id} is not a nurse.")
+            log.error("Cannot assign task: User %s is not a nurse.", assigned_nurse.id)
             return None
 
     try:
@@ -51,59 +52,62 @@ def create_task(db: Session, *, task_in: TaskCreate) -> Optional[NurseTask]:
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
-        log.info(f"Successfully created task ID: {db_task.id} for encounter {task_in.encounter_id}")
+        log.info("Successfully created task ID: %s for encounter %s", db_task.id, task_in.encounter_id)
         return db_task
     except SQLAlchemyError as e:
-        log.error(f"Database error during task creation for encounter {task_in.encounter_id}: {e}", exc_info=True)
+        log.error("Database error during task creation for encounter %s: %s", task_in.encounter_id, e, exc_info=True)
         db.rollback()
         return None
     except Exception as e:
-        log.error(f"Unexpected error during task creation for encounter {task_in.encounter_id}: {e}", exc_info=True)
+        log.error("Unexpected error during task creation for encounter %s: %s", task_in.encounter_id, e, exc_info=True)
         db.rollback()
         return None
 
 # --- Task Retrieval ---
+@traced()
 def get_tasks_for_encounter(db: Session, *, encounter_id: int, status_filter: Optional[TaskStatus] = None) -> List[NurseTask]:
     """
     Retrieves all tasks for a given patient encounter, ordered newest first.
     """
-    log.debug(f"Querying tasks for encounter ID: {encounter_id} with status filter: {status_filter}")
+    log.debug("Querying tasks for encounter ID: %s with status filter: %s", encounter_id, status_filter)
     query = db.query(NurseTask).filter(NurseTask.encounter_id == encounter_id)
     if status_filter:
         query = query.filter(NurseTask.status == status_filter)
     tasks = query.order_by(desc(NurseTask.created_at)).all()
-    log.info(f"Found {len(tasks)} tasks for encounter {encounter_id}.")
+    log.debug("Found %s tasks for encounter %s.", len(tasks), encounter_id)
     return tasks
 
+@traced()
 def get_tasks_for_nurse(db: Session, *, nurse_id: int, status_filter: Optional[TaskStatus] = TaskStatus.PENDING) -> List[NurseTask]:
     """
     Retrieves tasks assigned to a specific nurse, filtering by status (PENDING by default).
     """
-    log.debug(f"Querying tasks for nurse ID: {nurse_id} with status filter: {status_filter}")
+    log.debug("Querying tasks for nurse ID: %s with status filter: %s", nurse_id, status_filter)
     assigned_nurse = db.query(User).filter(User.id == nurse_id).first()
     if not assigned_nurse or assigned_nurse.role not in [UserRole.NURSE, UserRole.ADMIN]: # Allow Admins to see?
-        log.warning(f"Access denied or invalid ID: User {nurse_id} is not a nurse or does not exist.")
+        log.warning("Access denied or invalid ID: User %s is not a nurse or does not exist.", nurse_id)
         return []
 
     query = db.query(NurseTask).filter(NurseTask.assigned_nurse_id == nurse_id)
     if status_filter:
         query = query.filter(NurseTask.status == status_filter)
     tasks = query.order_by(NurseTask.due_at, NurseTask.created_at).all()
-    log.info(f"Found {len(tasks)} tasks for nurse {nurse_id}.")
+    log.debug("Found %s tasks for nurse %s.", len(tasks), nurse_id)
     return tasks
 
 # --- Task Completion ---
+@traced()
 def complete_task(db: Session, *, task_id: int, completing_nurse_id: int) -> Optional[NurseTask]:
     """
     Marks a task as COMPLETED and records the completion timestamp.
     """
-    log.info(f"Nurse {completing_nurse_id} attempting to complete task ID: {task_id}")
+    log.debug("Nurse %s attempting to complete task ID: %s", completing_nurse_id, task_id)
     db_task = db.query(NurseTask).filter(NurseTask.id == task_id).first()
     if not db_task:
-        log.warning(f"Task ID {task_id} not found for completion attempt.")
+        log.warning("Task ID %s not found for completion attempt.", task_id)
         return None
     if db_task.status == TaskStatus.COMPLETED:
-        log.warning(f"Task ID {task_id} is already marked complete.")
+        log.warning("Task ID %s is already marked complete.", task_id)
         # Return the task anyway, as the desired state is achieved
         return db_task
 
@@ -113,14 +117,14 @@ def complete_task(db: Session, *, task_id: int, completing_nurse_id: int) -> Opt
         # If unassigned, assign to completer
         if db_task.assigned_nurse_id is None:
             db_task.assigned_nurse_id = completing_nurse_id
-            log.info(f"Task {task_id} was unassigned; setting completer as assigned nurse.")
+            log.info("Task %s was unassigned; setting completer as assigned nurse.", task_id)
 
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
-        log.info(f"Successfully COMPLETED task ID: {db_task.id} by user {completing_nurse_id}.")
+        log.info("Successfully COMPLETED task ID: %s by user %s.", db_task.id, completing_nurse_id)
         return db_task
     except SQLAlchemyError as e:
-        log.error(f"Database error completing task {task_id}: {e}", exc_info=True)
+        log.error("Database error completing task %s: %s", task_id, e, exc_info=True)
         db.rollback()
         return None
\ No newline at end of file
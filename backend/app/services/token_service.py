@@ -0,0 +1,155 @@
+# app/services/token_service.py
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update, insert
+
+from app.core.config import settings
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.core.tracing import traced
+
+log = logging.getLogger(__name__)
+
+
+# --- Helpers ---
+def hash_refresh_token(raw_token: str) -> str:
+    """
+    SHA-256 digest of a refresh token. Tokens are 256 random bits, so a fast hash
+    is sufficient (there is nothing to brute-force) and keeps refreshes cheap.
+    """
+    return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+def _new_raw_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# --- Issue ---
+@traced()
+def issue_refresh_token(db: Session, *, user_id: int, family_id: Optional[str] = None) -> str:
+    """
+    Creates and stores a new refresh token for a user.
+
+    Args:
+        db: The SQLAlchemy database session.
+        user_id: Owner of the token.
+        family_id: Rotation family to join; a new family is started if None (fresh login).
+
+    Returns:
+        The raw refresh token (only its hash is persisted).
+    """
+    raw_token = _new_raw_token()
+    db.execute(
+        insert(RefreshToken).values(
+            token_hash=hash_refresh_token(raw_token),
+            family_id=family_id or secrets.token_hex(16),
+            user_id=user_id,
+            expires_at=_expiry(),
+        )
+    )
+    db.commit()
+    log.debug("Issued refresh token for user ID: %s", user_id)
+    return raw_token
+
+
+# --- Rotate ---
+@traced()
+def rotate_refresh_token(db: Session, *, raw_token: str) -> Optional[Tuple[str, str]]:
+    """
+    Exchanges a refresh token for a new one (rotation) and returns the owner's username.
+
+    Reads only the token row and the username column - no password check, no User entity.
+    A token that was already used or revoked triggers revocation of its whole family,
+    since that indicates the token was copied.
+
+    Returns:
+        (username, new_raw_token) on success, otherwise None.
+    """
+    token_hash = hash_refresh_token(raw_token)
+    row = db.execute(
+        select(RefreshToken.id, RefreshToken.family_id, RefreshToken.user_id,
+               RefreshToken.expires_at, RefreshToken.revoked_at, User.username)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == token_hash)
+    ).first()
+    if row is None:
+        log.warning("Refresh failed: unknown refresh token.")
+        return None
+
+    now = datetime.now(timezone.utc)
+    if row.revoked_at is not None:
+        log.warning("Refresh token reuse detected for user ID %s; revoking token family.", row.user_id)
+        revoke_token_family(db, family_id=row.family_id)
+        return None
+    if _as_aware(row.expires_at) <= now:
+        log.info("Refresh failed: token expired for user ID %s.", row.user_id)
+        return None
+
+    try:
+        # Conditional update makes rotation atomic: of two concurrent refreshes with the
+        # same token, only one sees rowcount == 1.
+        result = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            log.warning("Refresh token for user ID %s was rotated concurrently.", row.user_id)
+            return None
+        new_raw_token = _new_raw_token()
+        db.execute(
+            insert(RefreshToken).values(
+                token_hash=hash_refresh_token(new_raw_token),
+                family_id=row.family_id,
+                user_id=row.user_id,
+                expires_at=_expiry(),
+            )
+        )
+        db.commit()
+        log.debug("Rotated refresh token for user ID: %s", row.user_id)
+        return row.username, new_raw_token
+    except SQLAlchemyError as e:
+        log.error("Database error rotating refresh token for user ID %s: %s", row.user_id, e, exc_info=True)
+        db.rollback()
+        return None
+
+
+# --- Revoke ---
+def revoke_token_family(db: Session, *, family_id: str) -> int:
+    """Revokes every still-active token in a rotation family. Returns the number revoked."""
+    try:
+        result = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        log.error("Database error revoking refresh token family %s: %s", family_id, e, exc_info=True)
+        db.rollback()
+        return 0
+
+@traced()
+def revoke_refresh_token(db: Session, *, raw_token: str) -> bool:
+    """Revokes the family of the given token (logout). Returns False if the token is unknown."""
+    family_id = db.execute(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(raw_token))
+    ).scalar_one_or_none()
+    if family_id is None:
+        return False
+    revoke_token_family(db, family_id=family_id)
+    return True
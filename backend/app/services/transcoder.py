@@ -0,0 +1,347 @@
+# app/services/transcoder.py
+import asyncio
+import functools
+import logging
+import shutil
+import struct
+import time
+import wave
+from typing import Awaitable, Callable, Optional, Tuple
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+from app.utils.dictation_protocol import AudioCodec
+
+log = logging.getLogger(__name__)
+
+TARGET_RATE_HZ = 16000 # What the ASR engines are configured for (LINEAR16 mono)
+
+Sink = Callable[[bytes], Awaitable[None]]
+
+audio_decode_duration = metrics.histogram(
+    "audio_decode_duration_seconds", "Time to turn received audio into 16 kHz mono LINEAR16, by decoder.", ("decoder",),
+)
+audio_decode_errors = metrics.counter(
+    "audio_decode_errors_total", "Received audio that could not be decoded, by decoder.", ("decoder",),
+)
+
+
+class DecodeError(ValueError):
+    """Audio that cannot be turned into LINEAR16 (unknown format, ffmpeg missing or failing)."""
+
+
+@functools.lru_cache(maxsize=1)
+def ffmpeg_path() -> Optional[str]:
+    """Resolved FFMPEG_PATH, or None if ffmpeg is not installed. Looked up once per process."""
+    return shutil.which(settings.FFMPEG_PATH)
+
+
+def ffmpeg_args(input_format: Optional[str] = None, low_latency: bool = False) -> list:
+    """ffmpeg reading stdin and writing 16 kHz mono s16le to stdout."""
+    args = [ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if low_latency:
+        # Start decoding after the first packets instead of probing seconds of input
+        args += ["-fflags", "nobuffer", "-probesize", "4096", "-analyzeduration", "0"]
+    if input_format:
+        args += ["-f", input_format]
+    return args + ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(TARGET_RATE_HZ), "pipe:1"]
+
+
+# --- Format Sniffing ---
+# Containers whose files must be decoded whole (index at the end), and streams that can be piped
+SEGMENT_CONTAINERS = ("mp4",)
+STREAM_CONTAINERS = ("ogg", "webm", "mp3", "adts")
+
+
+def sniff_container(data: bytes) -> str:
+    """Container of a received message from its magic bytes; "raw" for headerless PCM."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[4:8] == b"ftyp":
+        return "mp4"
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:3] == b"ID3":
+        return "mp3"
+    if len(data) > 1 and data[0] == 0xFF and data[1] & 0xF6 == 0xF0:
+        return "adts"
+    return "raw"
+
+
+def parse_wav(data: bytes) -> Tuple[int, int, bytes]:
+    """(sample_rate, channels, 16-bit samples) of a PCM WAV file; tolerates streamed (unsized) data chunks."""
+    offset = 12
+    rate = channels = None
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if audio_format != 1 or bits != 16:
+                raise DecodeError(f"WAV must be 16-bit PCM (format {audio_format}, {bits} bits)")
+        elif chunk_id == b"data":
+            if rate is None:
+                break
+            return rate, channels, data[body:body + size] if size else data[body:]
+        offset = body + size + (size & 1)
+    raise DecodeError("WAV file without fmt/data chunks")
+
+
+def check_target_wav(path: str) -> None:
+    """Raises DecodeError unless the file is a 16 kHz mono 16-bit PCM WAV (what the engines read as it is)."""
+    try:
+        with wave.open(path, "rb") as w:
+            rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+    except (wave.Error, EOFError) as e:
+        raise DecodeError(f"not a PCM WAV file ({e})") from e
+    if (rate, channels, width) != (TARGET_RATE_HZ, 1, 2):
+        raise DecodeError(f"WAV is {rate} Hz, {channels} channels, {width * 8}-bit; "
+                          f"needs {TARGET_RATE_HZ} Hz mono 16-bit")
+
+
+# --- Resampling ---
+class PcmResampler:
+    """
+    Streaming 16-bit PCM to 16 kHz mono: channels are averaged, then a
+    windowed-sinc low-pass (when downsampling) and linear interpolation, all as
+    numpy array operations. Filter history and the interpolation phase carry
+    over between chunks, so chunk boundaries do not click. CPU-bound: call
+    `process` off the event loop.
+    """
+
+    def __init__(self, rate_in: int, channels: int = 1, rate_out: int = TARGET_RATE_HZ, taps: int = 63):
+        self.rate_in = rate_in
+        self.channels = max(1, channels)
+        self.rate_out = rate_out
+        self.step = rate_in / rate_out # Input samples per output sample
+        self._pending = b"" # Bytes of an incomplete frame from the previous chunk
+        self._taps: Optional[np.ndarray] = None
+        if rate_in > rate_out:
+            cutoff = 0.45 * rate_out / rate_in # Just below the output Nyquist, as a fraction of the input rate
+            n = np.arange(taps) - (taps - 1) / 2
+            self._taps = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)).astype(np.float32)
+            self._history = np.zeros(taps - 1, dtype=np.float32)
+        self._prev = np.zeros(0, dtype=np.float32) # Last filtered sample of the previous chunk
+        self._pos = 0.0 # Next output position, in input samples from the start of [prev] + chunk
+
+    @property
+    def passthrough(self) -> bool:
+        return self.rate_in == self.rate_out and self.channels == 1
+
+    def process(self, pcm: bytes) -> bytes:
+        frame_bytes = 2 * self.channels
+        data = self._pending + pcm
+        usable = len(data) - len(data) % frame_bytes
+        self._pending = data[usable:]
+        if self.passthrough:
+            return data[:usable]
+        x = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+        if self.channels > 1:
+            x = x.reshape(-1, self.channels).mean(axis=1)
+        if self.rate_in == self.rate_out:
+            return np.clip(np.rint(x), -32768, 32767).astype("<i2").tobytes()
+        if self._taps is not None:
+            padded = np.concatenate((self._history, x))
+            self._history = padded[len(padded) - len(self._taps) + 1:]
+            x = np.convolve(padded, self._taps, mode="valid")
+        z = np.concatenate((self._prev, x))
+        if len(z) < 2:
+            self._prev = z
+            return b""
+        positions = np.arange(self._pos, len(z) - 1, self.step)
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)
+        out = z[index] * (1 - frac) + z[index + 1] * frac
+        self._pos = (positions[-1] + self.step if len(positions) else self._pos) - (len(z) - 1)
+        self._prev = z[-1:]
+        return np.clip(np.rint(out), -32768, 32767).astype("<i2").tobytes()
+
+
+# --- ffmpeg ---
+async def decode_segment(data: bytes) -> bytes:
+    """One complete recording (e.g. an m4a segment) to 16 kHz mono PCM, in an ffmpeg subprocess."""
+    if ffmpeg_path() is None:
+        raise DecodeError(f"decoding this audio needs ffmpeg ({settings.FFMPEG_PATH} not found)")
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_args(), stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, stderr = await process.communicate(data)
+    if process.returncode != 0:
+        raise DecodeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()[-200:]}")
+    return pcm
+
+
+async def transcode_file(src: str, dst: str) -> None:
+    """Any audio file to a 16 kHz mono WAV, in an ffmpeg subprocess."""
+    if ffmpeg_path() is None:
+        raise DecodeError(f"transcoding needs ffmpeg ({settings.FFMPEG_PATH} not found)")
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+        "-i", src, "-ar", str(TARGET_RATE_HZ), "-ac", "1", dst,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise DecodeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()[-200:]}")
+
+
+class FfmpegStream:
+    """
+    A long-lived ffmpeg process for streamable formats (Ogg/WebM Opus, MP3,
+    ADTS AAC): compressed bytes go to stdin as they arrive, PCM is forwarded
+    to the sink as ffmpeg produces it.
+    """
+
+    def __init__(self, sink: Sink, input_format: Optional[str] = None):
+        self.sink = sink
+        self.input_format = input_format
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if ffmpeg_path() is None:
+            raise DecodeError(f"decoding this audio needs ffmpeg ({settings.FFMPEG_PATH} not found)")
+        self._process = await asyncio.create_subprocess_exec(
+            *ffmpeg_args(self.input_format, low_latency=True),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._forward())
+
+    async def _forward(self) -> None:
+        while chunk := await self._process.stdout.read(8192):
+            await self.sink(chunk)
+
+    def _check_reader(self) -> None:
+        """Re-raises what stopped the PCM reader (e.g. AudioBufferOverflow from the sink)."""
+        if self._reader.done():
+            error = None if self._reader.cancelled() else self._reader.exception()
+            if error is not None:
+                raise error
+            raise DecodeError("ffmpeg closed its output")
+
+    async def feed(self, data: bytes) -> None:
+        if self._process is None:
+            await self.start()
+        self._check_reader()
+        if self._process.returncode is not None:
+            raise DecodeError(f"ffmpeg exited with status {self._process.returncode}")
+        self._process.stdin.write(data)
+        # Without a reader, ffmpeg blocks on its full stdout and drain would never return
+        drain = asyncio.ensure_future(self._process.stdin.drain())
+        await asyncio.wait((drain, self._reader), return_when=asyncio.FIRST_COMPLETED)
+        if not drain.done():
+            drain.cancel()
+            self._check_reader()
+        try:
+            drain.result()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise DecodeError("ffmpeg stopped reading its input") from e
+
+    async def close(self) -> None:
+        """Ends the input and waits for ffmpeg to flush the last PCM to the sink."""
+        if self._process is None:
+            return
+        if not self._process.stdin.is_closing():
+            self._process.stdin.close()
+        if not self._reader.done(): # A failed reader was already raised by feed
+            try:
+                await asyncio.wait_for(self._reader, timeout=10.0)
+            except asyncio.TimeoutError:
+                self._reader.cancel()
+                await asyncio.gather(self._reader, return_exceptions=True)
+        if self._process.returncode is None:
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=0 if self._reader_failed() else 2.0)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                # Nothing reads stdout any more; drop what is left so the pipe reaches EOF and wait() returns
+                await self._process.stdout.read()
+                await self._process.wait()
+
+    def _reader_failed(self) -> bool:
+        return self._reader.cancelled() or self._reader.exception() is not None
+
+
+# --- Session Decoder ---
+class AudioDecoder:
+    """
+    Per-session stage between the WebSocket and the ASR audio buffer: turns
+    each received message into 16 kHz mono LINEAR16 for `sink`, whatever the
+    client sent - raw PCM at any rate, WAV, complete m4a segments (the Expo
+    recorder) or a continuous Opus/MP3/AAC stream.
+    """
+
+    def __init__(self, sink: Sink, session_id: str = ""):
+        self.sink = sink
+        self.session_id = session_id
+        self._resampler: Optional[PcmResampler] = None
+        self._stream: Optional[FfmpegStream] = None
+
+    async def _pcm(self, pcm: bytes, rate: int, channels: int) -> None:
+        if self._resampler is None or (self._resampler.rate_in, self._resampler.channels) != (rate, channels):
+            self._resampler = PcmResampler(rate, channels)
+        if self._resampler.passthrough:
+            pcm = self._resampler.process(pcm)
+        else:
+            with audio_decode_duration.time("resample"):
+                pcm = await asyncio.to_thread(self._resampler.process, pcm)
+        if pcm:
+            await self.sink(pcm)
+
+    async def feed(self, data: bytes, sample_rate: int = TARGET_RATE_HZ, channels: int = 1,
+                   codec: Optional[AudioCodec] = None) -> None:
+        """
+        Decodes one message. `codec` is the v2/v3 frame header's: PCM and WAV
+        frames are taken as declared and never sniffed (PCM samples can look like
+        a stream header). Legacy clients (None) are recognised by magic bytes,
+        and headerless data is always PCM. `sample_rate`/`channels` describe
+        headerless PCM (frame header; legacy clients send 16 kHz mono). Raises DecodeError.
+        """
+        if codec == AudioCodec.PCM_S16LE:
+            container = "raw"
+        elif codec == AudioCodec.WAV:
+            container = "wav"
+        elif codec is not None:
+            # AAC/Opus: an m4a segment, or the start or continuation of a stream (only its first bytes carry a header)
+            container = sniff_container(data)
+            if container not in SEGMENT_CONTAINERS and self._stream is not None:
+                container = "stream"
+            elif container in ("raw", "wav"):
+                container = codec.name.lower() # Not PCM whatever it looks like: let ffmpeg probe it
+        else:
+            container = sniff_container(data)
+            if container in STREAM_CONTAINERS and self._stream is not None:
+                container = "stream" # Ogg pages and ADTS/MP3 frames each repeat their header
+        try:
+            if container == "stream":
+                await self._stream.feed(data)
+            elif container == "raw":
+                await self._pcm(data, sample_rate, channels)
+            elif container == "wav":
+                rate, wav_channels, pcm = parse_wav(data)
+                await self._pcm(pcm, rate, wav_channels)
+            elif container in SEGMENT_CONTAINERS:
+                started = time.perf_counter()
+                pcm = await decode_segment(data)
+                audio_decode_duration.observe(time.perf_counter() - started, "segment")
+                await self.sink(pcm)
+            else:
+                if self._stream is None:
+                    log.debug("[%s] Starting ffmpeg stream decoder for %s audio.", self.session_id, container)
+                    stream = FfmpegStream(self.sink)
+                    await stream.start() # Raises without ffmpeg; the next header tries again
+                    self._stream = stream
+                await self._stream.feed(data)
+        except DecodeError:
+            audio_decode_errors.inc(container)
+            raise
+
+    async def close(self) -> None:
+        """Flushes buffered audio to the sink; call before ending the ASR stream."""
+        if self._stream is not None:
+            await self._stream.close()
+            self._stream = None
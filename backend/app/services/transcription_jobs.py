@@ -0,0 +1,357 @@
+# app/services/transcription_jobs.py
+"""
+Durable queue of uploaded dictation recordings to transcribe.
+
+POST /api/v1/dictation/upload spools the file to DICTATION_UPLOAD_DIR, adds
+a QUEUED row to transcription_jobs and returns its ID; clients poll
+GET /api/v1/dictation/jobs/{id}. Each process runs DICTATION_JOB_WORKERS
+worker tasks that claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so
+workers in any number of processes share the table without taking the same
+job. A worker transcodes the file to 16 kHz mono WAV (an upload ffmpeg
+cannot decode - or, without ffmpeg, one that is not such a WAV already -
+fails the attempt), streams it to the job's ASR engine (writing progress,
+which doubles as its heartbeat), saves the note through
+note_service.create_note in the same transaction that marks the job
+COMPLETED, and deletes the file. Failed attempts are retried with doubling
+backoff up to DICTATION_JOB_MAX_ATTEMPTS; a RUNNING job whose heartbeat is
+older than DICTATION_JOB_LEASE_SECONDS (its worker died) is claimed again.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import aiofiles.os
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.core.tracing import traced
+from app.db.session import SessionLocal
+from app.models.encounter import Encounter
+from app.models.note import NoteType
+from app.models.transcription_job import JobStatus, TranscriptionJob
+from app.services import asr_engines, asr_service, note_service, transcoder
+
+log = logging.getLogger(__name__)
+
+jobs_finished = metrics.counter(
+    "transcription_jobs_total",
+    "Transcription job attempts, by outcome (completed, retried, failed, superseded: reclaimed after its lease ran out, "
+    "abandoned: left to the lease timeout because the outcome could not be recorded).",
+    ("outcome",),
+)
+job_duration = metrics.histogram(
+    "transcription_job_duration_seconds", "Time from upload to a transcription job completing or failing.",
+    ("outcome",), buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# --- Queue ---
+@traced()
+def create_job(db: Session, *, audio_path: str, encounter_id: int, author_id: int,
+               note_type: NoteType = NoteType.DOCTOR_DICTATION, engine: Optional[str] = None) -> Optional[TranscriptionJob]:
+    """Queues the transcription of a spooled upload. Returns None if the encounter does not exist."""
+    if db.get(Encounter, encounter_id) is None:
+        log.warning("Cannot queue transcription: Encounter %s not found.", encounter_id)
+        return None
+    job = TranscriptionJob(
+        status=JobStatus.QUEUED, audio_path=audio_path, engine=engine, note_type=note_type,
+        progress=0.0, attempts=0, available_at=_now(), encounter_id=encounter_id, author_id=author_id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    log.info("Queued transcription job %s for encounter %s", job.id, encounter_id)
+    return job
+
+@traced()
+def get_job(db: Session, *, job_id: int) -> Optional[TranscriptionJob]:
+    return db.get(TranscriptionJob, job_id)
+
+@traced()
+def claim_next_job(db: Session) -> Optional[TranscriptionJob]:
+    """
+    Marks the oldest due job RUNNING for the calling worker and returns it.
+
+    The candidate row is locked with FOR UPDATE SKIP LOCKED, so concurrent workers
+    pass over each other's picks instead of queueing behind them. Dialects without
+    row locks (SQLite) ignore the clause; the conditional update still keeps two
+    workers from claiming the same job.
+    """
+    now = _now()
+    row = db.execute(
+        select(TranscriptionJob.id, TranscriptionJob.status, TranscriptionJob.attempts)
+        .where(or_(
+            and_(TranscriptionJob.status == JobStatus.QUEUED, TranscriptionJob.available_at <= now),
+            and_(TranscriptionJob.status == JobStatus.RUNNING,
+                 TranscriptionJob.heartbeat_at < now - timedelta(seconds=settings.DICTATION_JOB_LEASE_SECONDS)),
+        ))
+        .order_by(TranscriptionJob.available_at, TranscriptionJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if row is None:
+        db.rollback() # End the transaction (and its snapshot) before the worker sleeps
+        return None
+    result = db.execute(
+        update(TranscriptionJob)
+        .where(TranscriptionJob.id == row.id, TranscriptionJob.status == row.status,
+               TranscriptionJob.attempts == row.attempts)
+        .values(status=JobStatus.RUNNING, attempts=row.attempts + 1, heartbeat_at=now)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return None
+    db.commit()
+    if row.status == JobStatus.RUNNING:
+        log.warning("Transcription job %s lost its worker; claimed again (attempt %s).", row.id, row.attempts + 1)
+    return db.get(TranscriptionJob, row.id)
+
+@traced()
+def record_progress(db: Session, *, job_id: int, progress: Optional[float] = None) -> None:
+    """Stores a running job's progress (None: unchanged) and refreshes its heartbeat."""
+    values = dict(heartbeat_at=_now())
+    if progress is not None:
+        values["progress"] = min(1.0, progress)
+    db.execute(
+        update(TranscriptionJob)
+        .where(TranscriptionJob.id == job_id, TranscriptionJob.status == JobStatus.RUNNING)
+        .values(**values)
+    )
+    db.commit()
+
+@traced()
+def complete_job(db: Session, *, job: TranscriptionJob, transcript: str) -> bool:
+    """
+    Saves the transcript as the job's note (none if it is empty) and marks the job
+    COMPLETED in one commit, so an attempt that fails here leaves no note for the
+    retry to duplicate. Only the attempt holding the job completes it: returns
+    False, saving nothing, if the job was claimed again after its lease ran out.
+    """
+    note_id = None
+    if transcript:
+        note = note_service.create_note(db, encounter_id=job.encounter_id, author_id=job.author_id,
+                                        note_type=job.note_type, content=transcript, commit=False)
+        if note is None:
+            raise RuntimeError("the note could not be saved")
+        note_id = note.id
+    result = db.execute(
+        update(TranscriptionJob)
+        .where(TranscriptionJob.id == job.id, TranscriptionJob.status == JobStatus.RUNNING,
+               TranscriptionJob.attempts == job.attempts)
+        .values(status=JobStatus.COMPLETED, progress=1.0, note_id=note_id, error=None, finished_at=_now())
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return False
+    db.commit()
+    log.info("Transcription job %s completed (note %s).", job.id, note_id)
+    return True
+
+@traced()
+def fail_attempt(db: Session, *, job_id: int, attempts: int, error: str) -> JobStatus:
+    """Schedules a retry of a failed attempt, or fails the job once it is out of attempts. Returns the new status."""
+    if attempts < settings.DICTATION_JOB_MAX_ATTEMPTS:
+        backoff = settings.DICTATION_JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+        values = dict(status=JobStatus.QUEUED, available_at=_now() + timedelta(seconds=backoff))
+    else:
+        values = dict(status=JobStatus.FAILED, finished_at=_now())
+    db.execute(update(TranscriptionJob).where(TranscriptionJob.id == job_id).values(error=error[:2000], **values))
+    db.commit()
+    return values["status"]
+
+@traced()
+def requeue_job(db: Session, *, job_id: int) -> None:
+    """Hands an interrupted job back to the queue without counting the attempt (shutdown)."""
+    db.execute(
+        update(TranscriptionJob)
+        .where(TranscriptionJob.id == job_id, TranscriptionJob.status == JobStatus.RUNNING)
+        .values(status=JobStatus.QUEUED, available_at=_now(), attempts=TranscriptionJob.attempts - 1)
+    )
+    db.commit()
+
+def _with_session(function, **kwargs):
+    """Runs a queue operation in its own short-lived session (called via asyncio.to_thread)."""
+    db = SessionLocal()
+    try:
+        return function(db, **kwargs)
+    finally:
+        db.close()
+
+
+# --- Workers ---
+class TranscriptionWorkers:
+    """
+    `size` worker tasks on the event loop; the work itself is async (ffmpeg
+    subprocess, ASR streams) and queue operations run in threads, so workers
+    do not hold up WebSocket sessions. `notify` wakes idle workers when a job
+    is queued; otherwise they poll every `poll_interval` seconds, which also
+    picks up retries and jobs queued by other processes.
+    """
+
+    def __init__(self, size: int, poll_interval: float):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(i), name=f"transcription-worker-{i}") for i in range(self.size)]
+        log.info("Started %s transcription workers.", self.size)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self, index: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(_with_session, claim_next_job)
+            except SQLAlchemyError as e:
+                log.error("Transcription worker %s could not claim a job: %s", index, e)
+                job = None
+            if job is not None:
+                try:
+                    await self._process(job)
+                except Exception:
+                    # Keep the worker alive; the job stays RUNNING and is claimed again once its lease runs out
+                    log.exception("Transcription worker %s failed on job %s.", index, job.id)
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Refreshes the job's heartbeat while a step that reports no progress (transcoding) runs."""
+        while True:
+            await asyncio.sleep(settings.DICTATION_JOB_PROGRESS_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(_with_session, record_progress, job_id=job_id)
+            except SQLAlchemyError as e:
+                log.warning("Job %s: could not refresh the heartbeat: %s", job_id, e)
+
+    async def _process(self, job: TranscriptionJob) -> None:
+        wav_path = None
+        last_write = time.monotonic()
+
+        async def on_progress(progress: float) -> None:
+            nonlocal last_write
+            if time.monotonic() - last_write >= settings.DICTATION_JOB_PROGRESS_INTERVAL_SECONDS:
+                last_write = time.monotonic()
+                try:
+                    await asyncio.to_thread(_with_session, record_progress, job_id=job.id, progress=progress)
+                except SQLAlchemyError as e:
+                    log.warning("Job %s: could not record progress: %s", job.id, e)
+
+        span = tracing.start_detached_span("transcription_job")
+        span.set_attribute("job.id", job.id)
+        span.set_attribute("job.attempt", job.attempts)
+        outcome = "abandoned"
+        try:
+            if job.attempts > settings.DICTATION_JOB_MAX_ATTEMPTS:
+                raise RuntimeError(f"gave up after {job.attempts - 1} attempts")
+            engine = await asyncio.to_thread(asr_engines.get_engine, job.engine)
+            audio_path = job.audio_path
+            # 16 kHz mono WAV for the engines. Anything else would be read as raw samples and transcribed as
+            # noise, so an upload ffmpeg cannot decode (or, without ffmpeg, one in another format) fails the attempt
+            if transcoder.ffmpeg_path() is not None:
+                # Per attempt: a worker that lost its lease may still be writing the previous attempt's file
+                wav_path = f"{job.audio_path}.{job.attempts}.16k.wav"
+                heartbeat = asyncio.create_task(self._heartbeat(job.id))
+                try:
+                    await transcoder.transcode_file(job.audio_path, wav_path)
+                    audio_path = wav_path
+                finally:
+                    heartbeat.cancel()
+            else:
+                try:
+                    await asyncio.to_thread(transcoder.check_target_wav, job.audio_path)
+                except transcoder.DecodeError as e:
+                    raise transcoder.DecodeError(f"{e}, and no ffmpeg to transcode it") from e
+            transcript = await asr_service.transcribe_file(audio_path, engine, on_progress=on_progress)
+
+            if not transcript:
+                log.warning("Job %s: no speech recognised; completing without a note.", job.id)
+            if await asyncio.to_thread(_with_session, complete_job, job=job, transcript=transcript):
+                outcome = "completed"
+            else:
+                outcome = "superseded"
+                log.warning("Transcription job %s attempt %s was claimed again meanwhile; result dropped.",
+                            job.id, job.attempts)
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back rather than leaving it to the lease timeout
+            try:
+                await asyncio.to_thread(_with_session, requeue_job, job_id=job.id)
+            except SQLAlchemyError as e:
+                log.warning("Job %s: could not requeue it at shutdown; the lease timeout will: %s", job.id, e)
+            span.end()
+            raise
+        except Exception as e:
+            span.record_error(e)
+            error = f"{type(e).__name__}: {e}"
+            try:
+                status = await asyncio.to_thread(_with_session, fail_attempt, job_id=job.id, attempts=job.attempts,
+                                                 error=error)
+                outcome = "retried" if status == JobStatus.QUEUED else "failed"
+            except SQLAlchemyError as db_error:
+                log.error("Job %s: could not record the failed attempt: %s", job.id, db_error)
+            log.warning("Transcription job %s attempt %s failed (%s): %s", job.id, job.attempts, outcome, error)
+        finally:
+            if wav_path is not None:
+                try:
+                    await aiofiles.os.remove(wav_path)
+                except OSError:
+                    pass
+
+        span.set_attribute("job.outcome", outcome)
+        span.end()
+        jobs_finished.inc(outcome)
+        if outcome not in ("retried", "superseded", "abandoned"): # The job (and its upload) is still in use
+            job_duration.observe((_now() - _as_aware(job.created_at)).total_seconds(), outcome)
+            try:
+                await aiofiles.os.remove(job.audio_path)
+            except OSError:
+                pass
+
+
+workers: Optional[TranscriptionWorkers] = None
+
+async def start_workers() -> None:
+    """Creates the upload spool directory and starts this process's workers (lifespan startup)."""
+    global workers
+    await aiofiles.os.makedirs(settings.DICTATION_UPLOAD_DIR, exist_ok=True)
+    if settings.DICTATION_JOB_WORKERS > 0:
+        workers = TranscriptionWorkers(settings.DICTATION_JOB_WORKERS, settings.DICTATION_JOB_POLL_SECONDS)
+        workers.start()
+
+async def stop_workers() -> None:
+    global workers
+    if workers is not None:
+        await workers.stop()
+        workers = None
+
+def notify_workers() -> None:
+    """Wakes this process's idle workers for a newly queued job."""
+    if workers is not None:
+        workers.notify()
@@ -1,23 +1,68 @@
 # app/services/user_service.py
+import asyncio
 import logging
-from typing import Optional, List
+from typing import Callable, Optional, List
 
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError # Import specific DB errors
 
 from app.models.user import UserRole # Import UserRole enum
-from sqlalchemy import desc # Import desc for ordering
+from sqlalchemy import desc, select, update # Import desc for ordering
+from sqlalchemy.engine import Row
 
 # Import necessary components from your project structure
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_password, verify_password_async
 from app.models.user import User
 from app.schemas.user import UserCreate
+from app.core.tracing import traced
 
-# Configure logging (ensure it's configured globally or adjust level here)
-logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
 
+# --- User Change Hooks ---
+# Callbacks invoked with the username whenever a user row is created or modified
+# through this service (e.g. the auth principal cache registers its invalidation here).
+_user_change_hooks: List[Callable[[str], None]] = []
+
+def register_user_change_hook(hook: Callable[[str], None]) -> None:
+    """Registers a callback to be notified (with the username) when a user row changes."""
+    if hook not in _user_change_hooks:
+        _user_change_hooks.append(hook)
+
+def _notify_user_changed(username: str) -> None:
+    for hook in _user_change_hooks:
+        try:
+            hook(username)
+        except Exception as e:
+            log.error("User change hook %r failed for %s: %s", hook, username, e, exc_info=True)
+
+
+@traced()
+def get_user_identity_by_username(db: Session, *, username: str) -> Optional[Row]:
+    """
+    Fetch only (id, username, role) for a user, without loading the ORM entity
+    or its selectin relationships. Used on the authentication hot path.
+
+    Returns:
+        A row with `id`, `username` and `role` attributes, or None if not found.
+    """
+    stmt = select(User.id, User.username, User.role).where(User.username == username)
+    return db.execute(stmt).first()
+
+
+@traced()
+def get_user_credentials_by_username(db: Session, *, username: str) -> Optional[Row]:
+    """
+    Fetch only (id, username, hashed_password) for a user. Used by login so password
+    checks don't load the full entity and its relationships.
+
+    Returns:
+        A row with `id`, `username` and `hashed_password` attributes, or None if not found.
+    """
+    stmt = select(User.id, User.username, User.hashed_password).where(User.username == username)
+    return db.execute(stmt).first()
+
+
 def get_user_by_username(db: Session, *, username: str) -> Optional[User]:
     """
     Fetch a single user from the database by their username (email).
@@ -29,31 +74,35 @@ def get_user_by_username(db: Session, *, username: str) -> Optional[User]:
     Returns:
         The User database model instance if found, otherwise None.
     """
-    log.debug(f"Querying for user with username: {username}")
+    log.debug("Querying for user with username: %s", username)
     # Consider case-insensitivity if needed: filter(func.lower(User.username) == username.lower())
     user = db.query(User).filter(User.username == username).first()
     if user:
-        log.debug(f"User found: {username}")
+        log.debug("User found: %s", username)
     else:
-        log.debug(f"User not found: {username}")
+        log.debug("User not found: %s", username)
     return user
 
 
-def create_user(db: Session, *, user_in: UserCreate) -> Optional[User]:
+@traced()
+def create_user(db: Session, *, user_in: UserCreate, hashed_password: Optional[str] = None) -> Optional[User]:
     """
     Create a new user in the database after hashing their password.
 
     Args:
         db: The SQLAlchemy database session.
         user_in: Pydantic schema containing the new user's data.
+        hashed_password: Optional precomputed hash (e.g. from the async hashing pool);
+                         if omitted the password is hashed inline.
 
     Returns:
         The newly created User database model instance, or None if creation failed.
     """
-    log.info(f"Attempting to create user: {user_in.username}")
+    log.debug("Attempting to create user: %s", user_in.username)
     try:
         # Hash the password securely before storing
-        hashed_password = get_password_hash(user_in.password)
+        if hashed_password is None:
+            hashed_password = get_password_hash(user_in.password)
 
         # Create the SQLAlchemy User model instance
         db_user = User(
@@ -67,15 +116,16 @@ def create_user(db: Session, *, user_in: UserCreate) -> Optional[User]:
         db.add(db_user)
         db.commit()
         db.refresh(db_user) # Get ID and defaults assigned by the DB
-        log.info(f"Successfully created user in DB: {db_user.username} (ID: {db_user.id})")
+        log.info("Successfully created user in DB: %s (ID: %s)", db_user.username, db_user.id)
+        _notify_user_changed(db_user.username)
         return db_user
 
     except SQLAlchemyError as e:
-        log.error(f"Database error occurred during user creation for {user_in.username}: {e}", exc_info=True)
+        log.error("Database error occurred during user creation for %s: %s", user_in.username, e, exc_info=True)
         db.rollback() # Roll back the transaction on error
         return None
     except Exception as e:
-        log.error(f"Unexpected error during user creation for {user_in.username}: {e}", exc_info=True)
+        log.error("Unexpected error during user creation for %s: %s", user_in.username, e, exc_info=True)
         db.rollback()
         return None
 
@@ -92,22 +142,76 @@ def authenticate_user(db: Session, *, username: str, password: str) -> Optional[
     Returns:
         The User database model instance if authentication is successful, otherwise None.
     """
-    log.debug(f"Authenticating user: {username}")
+    log.debug("Authenticating user: %s", username)
     user = get_user_by_username(db, username=username)
 
     # Check if user exists
     if not user:
-        log.warning(f"Authentication failed: User '{username}' not found.")
+        log.warning("Authentication failed: User '%s' not found.", username)
         return None
 
     # Verify the provided password against the stored hash
     if not verify_password(password, user.hashed_password):
-        log.warning(f"Authentication failed: Incorrect password for user '{username}'.")
+        log.warning("Authentication failed: Incorrect password for user '%s'.", username)
         return None
 
     # Authentication successful
-    log.info(f"Authentication successful for user: {username}")
+    log.debug("Authentication successful for user: %s", username)
+    return user
+
+
+@traced()
+async def authenticate_user_async(db: Session, *, username: str, password: str) -> Optional[Row]:
+    """
+    Async variant of authenticate_user for request handlers.
+    The DB lookups run in worker threads and bcrypt runs in the password hashing
+    process pool. If the stored hash uses outdated parameters (e.g. the configured
+    bcrypt cost changed), it is transparently replaced with the upgraded hash.
+
+    Returns:
+        A row with `id`, `username` and `hashed_password` if authentication succeeds, otherwise None.
+
+    Raises:
+        PasswordHasherBusy: If the hashing pool queue is full.
+    """
+    log.debug("Authenticating user: %s", username)
+    user = await asyncio.to_thread(get_user_credentials_by_username, db, username=username)
+    if not user:
+        log.warning("Authentication failed: User '%s' not found.", username)
+        return None
+
+    matches, new_hash = await verify_password_async(password, user.hashed_password)
+    if not matches:
+        log.warning("Authentication failed: Incorrect password for user '%s'.", username)
+        return None
+
+    if new_hash:
+        await asyncio.to_thread(update_password_hash, db, user_id=user.id, hashed_password=new_hash)
+
+    log.debug("Authentication successful for user: %s", username)
     return user
+
+
+@traced()
+def update_password_hash(db: Session, *, user_id: int, hashed_password: str) -> bool:
+    """
+    Replaces a user's stored password hash (used for transparent bcrypt cost upgrades).
+
+    Returns:
+        True if the hash was updated, False on error.
+    """
+    try:
+        db.execute(update(User).where(User.id == user_id).values(hashed_password=hashed_password))
+        db.commit()
+        log.info("Upgraded password hash for user ID: %s", user_id)
+        return True
+    except SQLAlchemyError as e:
+        log.error("Database error upgrading password hash for user ID %s: %s", user_id, e, exc_info=True)
+        db.rollback()
+        return False
+
+
+@traced()
 def get_all_users(db: Session, *, skip: int = 0, limit: int = 100) -> List[User]:
     """
     Retrieves a list of all non-admin users (Doctors and Nurses).
@@ -121,7 +225,7 @@ def get_all_users(db: Session, *, skip: int = 0, limit: int = 100) -> List[User]
     Returns:
         A list of User objects.
     """
-    log.info("Querying for all non-admin users.")
+    log.debug("Querying for all non-admin users.")
     users = (
         db.query(User)
         .filter(User.role != UserRole.ADMIN) # Exclude admins from the list
@@ -130,5 +234,5 @@ def get_all_users(db: Session, *, skip: int = 0, limit: int = 100) -> List[User]
         .limit(limit)
         .all()
     )
-    log.info(f"Retrieved {len(users)} non-admin users.")
+    log.debug("Retrieved %s non-admin users.", len(users))
     return users
\ No newline at end of file
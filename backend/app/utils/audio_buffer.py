@@ -0,0 +1,125 @@
+# app/utils/audio_buffer.py
+import asyncio
+import time
+from typing import Optional
+
+OVERLOAD_POLICIES = ("block", "drop_oldest", "fail")
+
+
+class AudioBufferOverflow(Exception):
+    """Audio arrived faster than the ASR stream drains it and the session's policy is "fail"."""
+
+
+class AudioRingBuffer:
+    """
+    Byte-budgeted FIFO of LINEAR16 audio for one session: a single
+    preallocated bytearray used as a ring, instead of a queue of `bytes`
+    objects, so a stalled ASR stream costs at most `capacity` bytes.
+
+    When a write does not fit, `policy` decides:
+      * block       - wait for the reader, which stops reading the socket and
+                      lets TCP flow control push back on the client;
+      * drop_oldest - discard the oldest audio (whole samples) to make room;
+      * fail        - raise AudioBufferOverflow.
+
+    One writer and one reader, both on the event loop.
+    """
+
+    __slots__ = ("capacity", "policy", "_buf", "_head", "_size", "_closed",
+                 "_readable", "_writable", "dropped_bytes", "blocked_seconds", "high_water")
+
+    def __init__(self, capacity: int, policy: str = "block"):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"unknown overload policy '{policy}' (expected one of {', '.join(OVERLOAD_POLICIES)})")
+        self.capacity = max(2, capacity - capacity % 2) # Whole 16-bit samples
+        self.policy = policy
+        self._buf = bytearray(self.capacity)
+        self._head = 0 # Offset of the oldest byte
+        self._size = 0
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.dropped_bytes = 0
+        self.blocked_seconds = 0.0 # Time writers spent waiting for space
+        self.high_water = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _write(self, data: memoryview) -> None:
+        tail = (self._head + self._size) % self.capacity
+        first = min(len(data), self.capacity - tail)
+        self._buf[tail:tail + first] = data[:first]
+        self._buf[:len(data) - first] = data[first:]
+        self._size += len(data)
+        self.high_water = max(self.high_water, self._size)
+        self._readable.set()
+        if self._size == self.capacity:
+            self._writable.clear()
+
+    def _discard(self, n: int) -> None:
+        self._head = (self._head + n) % self.capacity
+        self._size -= n
+
+    async def put(self, data: bytes) -> None:
+        """Appends audio, applying the overload policy if it does not fit. Writes after close are ignored."""
+        if self._closed or not data:
+            return
+        view = memoryview(data)
+        free = self.capacity - self._size
+        if len(view) <= free:
+            self._write(view)
+            return
+        if self.policy == "fail":
+            raise AudioBufferOverflow(f"{self._size} bytes buffered, no room for {len(view)} more")
+        if self.policy == "drop_oldest":
+            if len(view) > self.capacity:
+                self.dropped_bytes += len(view) - self.capacity
+                view = view[len(view) - self.capacity:]
+            excess = len(view) - (self.capacity - self._size)
+            excess = min(self._size, excess + excess % 2)
+            self.dropped_bytes += excess
+            self._discard(excess)
+            self._write(view)
+            return
+        # block: write what fits, wait for the reader, repeat
+        started = time.monotonic()
+        try:
+            while len(view) and not self._closed:
+                free = self.capacity - self._size
+                if free:
+                    self._write(view[:free])
+                    view = view[free:]
+                if len(view):
+                    await self._writable.wait()
+        finally:
+            self.blocked_seconds += time.monotonic() - started
+
+    async def get(self, max_bytes: int) -> Optional[bytes]:
+        """Up to `max_bytes` of the oldest audio, waiting for some; None once closed and drained."""
+        while not self._size:
+            if self._closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        n = min(self._size, max_bytes - max_bytes % 2)
+        end = self._head + n
+        if end <= self.capacity:
+            chunk = bytes(self._buf[self._head:end])
+        else:
+            chunk = bytes(self._buf[self._head:]) + bytes(self._buf[:end - self.capacity])
+        self._discard(n)
+        self._writable.set()
+        return chunk
+
+    def close(self) -> None:
+        """End of audio: the reader drains what is left, then gets None; blocked writers return."""
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
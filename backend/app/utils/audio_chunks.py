@@ -0,0 +1,115 @@
+# app/utils/audio_chunks.py
+"""
+Splitting long 16-bit recordings into overlapping chunks at silences, and
+stitching the chunks' transcripts back together.
+
+A chunk ends near the target length at the quietest stretch in the search
+window before it, so cuts land in pauses between words and the chunks simply
+abut there. Only when a cut has to go through speech do the chunks on both
+sides extend `overlap` past it, so the word it splits is heard whole at least
+once; words in the overlap then come back from both neighbours and `stitch`
+drops the repeat.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+FRAME_SECONDS = 0.02 # Level analysis frame
+QUIET_WINDOW_SECONDS = 0.3 # A pause must be about this long to be a cut point
+SILENCE_FLOOR_DB = -50.0 # Always silence below this (dBFS)
+SILENCE_ABOVE_NOISE_DB = 6.0 # ... or within this of the recording's noise floor
+SILENCE_BELOW_MEDIAN_DB = 10.0 # ... but never closer than this to its median level (recordings with few pauses)
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    start: int # First sample, overlap included
+    end: int   # One past the last sample, overlap included
+    cut_in_speech: bool # The cut before this chunk went through speech, so it starts with overlap that may repeat words
+
+
+def frame_levels(samples: np.ndarray, frame: int, block_frames: int = 4096) -> np.ndarray:
+    """
+    Mean power of consecutive `frame`-sample frames (the tail shorter than a frame is
+    ignored). Converted a block at a time, so a memory-mapped recording is never
+    loaded as a whole.
+    """
+    count = len(samples) // frame
+    power = np.empty(count, dtype=np.float32)
+    for first in range(0, count, block_frames):
+        last = min(count, first + block_frames)
+        frames = samples[first * frame:last * frame].reshape(-1, frame).astype(np.float32) / 32768.0
+        power[first:last] = np.einsum("ij,ij->i", frames, frames) / frame
+    return power
+
+
+def plan_chunks(samples: np.ndarray, rate: int, chunk_seconds: float, overlap_seconds: float,
+                search_seconds: float) -> List[AudioChunk]:
+    """Chunks of at most `chunk_seconds`, plus overlap at cuts through speech, covering all of `samples`."""
+    frame = max(1, int(rate * FRAME_SECONDS))
+    chunk = max(1, int(chunk_seconds / FRAME_SECONDS))
+    search = min(chunk - 1, max(1, int(search_seconds / FRAME_SECONDS)))
+    overlap = int(overlap_seconds * rate)
+    if len(samples) == 0:
+        return []
+    if len(samples) <= chunk * frame:
+        return [AudioChunk(0, len(samples), False)]
+
+    power = frame_levels(samples, frame)
+    # Average power of the window centred on each frame; its minimum is the quietest pause
+    window = max(1, int(QUIET_WINDOW_SECONDS / FRAME_SECONDS))
+    quiet = np.convolve(power, np.ones(window, dtype=np.float32) / window, mode="same")
+    noise_floor, median = (float(level) for level in np.percentile(power, (10, 50)))
+    threshold = max(10 ** (SILENCE_FLOOR_DB / 10), min(noise_floor * 10 ** (SILENCE_ABOVE_NOISE_DB / 10),
+                                                       median / 10 ** (SILENCE_BELOW_MEDIAN_DB / 10)))
+
+    cuts = [] # (sample, in speech)
+    position = 0 # In frames
+    while len(power) - position > chunk:
+        low, high = position + chunk - search, position + chunk
+        cut = low + int(np.argmin(quiet[low:high]))
+        in_speech = bool(quiet[cut] > threshold)
+        if not in_speech:
+            # Middle of the pause, leaving margin on both sides for words the level analysis missed
+            first = last = cut
+            while first > low and quiet[first - 1] <= threshold:
+                first -= 1
+            while last + 1 < high and quiet[last + 1] <= threshold:
+                last += 1
+            cut = (first + last) // 2
+        cuts.append((cut * frame, in_speech))
+        position = cut
+
+    chunks = []
+    boundaries = [(0, False)] + cuts + [(len(samples), False)]
+    for (start, in_speech), (end, end_in_speech) in zip(boundaries, boundaries[1:]):
+        # Overlap only where stitch dedupes it; at a pause it would hand both chunks the same edge words
+        chunks.append(AudioChunk(max(0, start - overlap) if in_speech else start,
+                                 min(len(samples), end + overlap) if end_in_speech else end, in_speech))
+    return chunks
+
+
+def _normalise(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(texts: Sequence[str], cut_in_speech: Sequence[bool], max_overlap_words: int) -> str:
+    """
+    Joins chunk transcripts in order. Where a cut went through speech, the longest
+    run of up to `max_overlap_words` words that ends the text so far and starts the
+    next chunk (ignoring case and punctuation) is kept once.
+    """
+    words: List[str] = []
+    for text, dedupe in zip(texts, cut_in_speech):
+        following = text.split()
+        if dedupe and words and following:
+            tail = [_normalise(w) for w in words[-max_overlap_words:]]
+            head = [_normalise(w) for w in following[:max_overlap_words]]
+            for size in range(min(len(tail), len(head)), 0, -1):
+                if tail[-size:] == head[:size]:
+                    following = following[size:]
+                    break
+        words.extend(following)
+    return " ".join(words)
@@ -1,7 +1,8 @@
 # app/utils/connection_manager.py
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
 
 log = logging.getLogger(__name__)
 
@@ -10,12 +11,20 @@ class ConnectionManager:
     def __init__(self):
         # Stores active connections using session_id as the key
         self.active_connections: Dict[str, WebSocket] = {}
+        # Sessions whose messages go out as binary frames in another encoding than JSON (e.g. msgpack)
+        self.binary_encoders: Dict[str, Callable[[dict], bytes]] = {}
 
-    async def connect(self, session_id: str, websocket: WebSocket):
-        """Accepts a new WebSocket connection and adds it to the manager."""
-        await websocket.accept()
+    async def connect(self, session_id: str, websocket: WebSocket, subprotocol: Optional[str] = None,
+                      binary_encoder: Optional[Callable[[dict], bytes]] = None):
+        """
+        Accepts a new WebSocket connection (with the negotiated subprotocol, if any) and adds it to the manager.
+        With `binary_encoder`, send_json sends this session's messages encoded by it in binary frames.
+        """
+        await websocket.accept(subprotocol=subprotocol)
         self.active_connections[session_id] = websocket
-        log.info(f"WebSocket connected: {session_id} (Total: {len(self.active_connections)})")
+        if binary_encoder is not None:
+            self.binary_encoders[session_id] = binary_encoder
+        log.info("WebSocket connected: %s (Total: %s)", session_id, len(self.active_connections))
 
     def disconnect(self, session_id: str):
         """Removes a WebSocket connection from the manager."""
@@ -23,9 +32,10 @@ class ConnectionManager:
             # We don't necessarily close the websocket here,
             # that's usually handled by the endpoint's try/except/finally
             del self.active_connections[session_id]
-            log.info(f"WebSocket disconnected: {session_id} (Remaining: {len(self.active_connections)})")
+            self.binary_encoders.pop(session_id, None)
+            log.info("WebSocket disconnected: %s (Remaining: %s)", session_id, len(self.active_connections))
         else:
-            log.warning(f"Attempted to disconnect non-existent session: {session_id}")
+            log.warning("Attempted to disconnect non-existent session: %s", session_id)
 
     async def send_personal_message(self, message: str, session_id: str):
         """Sends a text message to a specific WebSocket connection."""
@@ -33,26 +43,34 @@ class ConnectionManager:
             websocket = self.active_connections[session_id]
             try:
                 await websocket.send_text(message)
-                log.debug(f"Sent text to {session_id}: {message[:50]}...")
+                log.debug("Sent text to %s: %s...", session_id, message[:50])
             except Exception as e:
-                log.error(f"Error sending text to {session_id}: {e}")
+                log.error("Error sending text to %s: %s", session_id, e)
                 # Consider removing connection if send fails
                 # self.disconnect(session_id)
         else:
-            log.warning(f"Attempted to send text to non-existent session: {session_id}")
+            log.warning("Attempted to send text to non-existent session: %s", session_id)
 
     async def send_json(self, session_id: str, data: dict):
-        """Sends JSON data to a specific WebSocket connection."""
+        """Sends JSON data (or its binary encoding, see `connect`) to a specific WebSocket connection."""
         if session_id in self.active_connections:
             websocket = self.active_connections[session_id]
+            if websocket.client_state == WebSocketState.DISCONNECTED:
+                # Client already closed (e.g. ended the dictation); results produced after that are dropped
+                log.debug("Dropping JSON for closed session %s: Type=%s", session_id, data.get('type', data.get('status')))
+                return
             try:
-                await websocket.send_json(data)
-                log.debug(f"Sent JSON to {session_id}: Type={data.get('type', 'N/A')}")
+                encoder = self.binary_encoders.get(session_id)
+                if encoder is not None:
+                    await websocket.send_bytes(encoder(data))
+                else:
+                    await websocket.send_json(data)
+                log.debug("Sent JSON to %s: Type=%s", session_id, data.get('type', 'N/A'))
             except Exception as e:
-                log.error(f"Error sending JSON to {session_id}: {e}")
+                log.error("Error sending JSON to %s: %s", session_id, e)
                 # Consider removing connection if send fails
         else:
-            log.warning(f"Attempted to send JSON to non-existent session: {session_id}")
+            log.warning("Attempted to send JSON to non-existent session: %s", session_id)
 
     async def broadcast(self, message: str):
         """Sends a text message to all active WebSocket connections."""
@@ -61,13 +79,13 @@ class ConnectionManager:
             try:
                 await websocket.send_text(message)
             except Exception as e:
-                log.error(f"Error broadcasting to {session_id}, marking for removal: {e}")
+                log.error("Error broadcasting to %s, marking for removal: %s", session_id, e)
                 disconnected_sessions.append(session_id)
         
         # Clean up connections that failed during broadcast
         for session_id in disconnected_sessions:
             self.disconnect(session_id)
-        log.info(f"Broadcast sent to {len(self.active_connections)} connections.")
+        log.debug("Broadcast sent to %s connections.", len(self.active_connections))
 
 # --- Optional: Create a single instance to be imported ---
 manager = ConnectionManager()
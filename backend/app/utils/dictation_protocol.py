@@ -0,0 +1,133 @@
+# app/utils/dictation_protocol.py
+"""
+Dictation WebSocket protocols v2 and v3, negotiated with the `hvs.dictation.v2`,
+`hvs.dictation.v3` or `hvs.dictation.v3+msgpack` subprotocol
+(Sec-WebSocket-Protocol; the server accepts the most compact one offered that it supports).
+Clients that offer none get the legacy protocol: binary frames are audio
+(16 kHz LINEAR16 or a recognised container), text frames the same base64-encoded.
+
+v2 binary frames are a fixed 20-byte big-endian header followed by the
+payload (PCM samples, or bytes of a compressed recording/stream, which the
+server decodes to 16 kHz mono - see app/services/transcoder.py):
+
+    offset size field
+    0      1    version      (2)
+    1      1    codec        (AudioCodec)
+    2      2    flags        (reserved, 0)
+    4      4    sample_rate  (Hz)
+    8      4    sequence     (per session, from 0)
+    12     8    timestamp_ms (client capture time of the first sample, Unix ms)
+
+v2 text frames are JSON control messages:
+
+    {"type": "start"}  -> {"type": "started", "codecs": [...], "preferred_sample_rate": 16000}
+    {"type": "flush"}  -> {"type": "flushed", "sequence": n} once the audio up to n reached the ASR engine
+    {"type": "stop"}   -> end of audio; the note is saved and the server closes the socket
+
+v3 uses the same audio frames and control messages, but transcripts arrive
+as differences from the hypothesis the client already has:
+
+    {"type": "transcript_delta", "keep": 12, "text": "tail", "is_final": false}
+
+meaning "keep the first `keep` characters (code points) of the current
+hypothesis and append `text`". A final delta completes the hypothesis; the
+next one starts from "". With `hvs.dictation.v3+msgpack` every server message
+is a msgpack map in a binary frame instead of JSON text (requires the
+`msgpack` package on the server; without it only the JSON variant is offered).
+Client messages stay as above.
+
+In all protocols interim results are sent at most DICTATION_INTERIM_MAX_RATE
+times a second (see app/utils/transcript_updates.py); finals are never held back.
+"""
+import enum
+import json
+import struct
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+try:
+    import msgpack # Optional: only for the hvs.dictation.v3+msgpack subprotocol (pip install msgpack)
+except ImportError:
+    msgpack = None
+
+SUBPROTOCOL_V2 = "hvs.dictation.v2"
+SUBPROTOCOL_V3 = "hvs.dictation.v3"
+SUBPROTOCOL_V3_MSGPACK = "hvs.dictation.v3+msgpack"
+VERSION = 2 # Of the audio frame header, which v3 shares
+HEADER = struct.Struct("!BBHIIQ")
+
+CONTROL_TYPES = ("start", "flush", "stop")
+
+
+class AudioCodec(enum.IntEnum):
+    PCM_S16LE = 1 # Raw 16-bit mono at the header's sample rate
+    WAV = 2       # 16-bit PCM in a RIFF/WAVE file
+    AAC = 3       # Complete m4a segments (e.g. Expo HIGH_QUALITY recordings) or an ADTS stream
+    OPUS = 4      # Ogg or WebM stream
+
+
+# Codecs decoded in-process; the others need ffmpeg on the server
+PCM_CODECS = (AudioCodec.PCM_S16LE, AudioCodec.WAV)
+
+
+def supported_codecs(ffmpeg_available: bool) -> list:
+    return [codec.name.lower() for codec in AudioCodec if ffmpeg_available or codec in PCM_CODECS]
+
+
+class ProtocolError(ValueError):
+    """A frame or control message that does not follow the protocol."""
+
+
+@dataclass(frozen=True)
+class AudioFrame:
+    sequence: int
+    codec: AudioCodec
+    sample_rate: int
+    timestamp_ms: int
+    payload: bytes
+
+
+def choose_subprotocol(offered: Iterable[str]) -> Optional[str]:
+    """The subprotocol to accept from the client's offer; None means legacy."""
+    offered = set(offered)
+    preference = (SUBPROTOCOL_V3_MSGPACK, SUBPROTOCOL_V3, SUBPROTOCOL_V2) if msgpack else (SUBPROTOCOL_V3, SUBPROTOCOL_V2)
+    return next((subprotocol for subprotocol in preference if subprotocol in offered), None)
+
+
+def protocol_name(subprotocol: Optional[str]) -> str:
+    """SessionState.protocol for an accepted subprotocol: "legacy", "v2" or "v3"."""
+    if subprotocol is None:
+        return "legacy"
+    return "v2" if subprotocol == SUBPROTOCOL_V2 else "v3"
+
+
+def encode_msgpack(message: dict) -> bytes:
+    return msgpack.packb(message, use_bin_type=True)
+
+
+def parse_frame(data: bytes) -> AudioFrame:
+    if len(data) < HEADER.size:
+        raise ProtocolError(f"frame of {len(data)} bytes is shorter than the {HEADER.size}-byte header")
+    version, codec, _flags, sample_rate, sequence, timestamp_ms = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ProtocolError(f"unsupported frame version {version}")
+    try:
+        codec = AudioCodec(codec)
+    except ValueError:
+        raise ProtocolError(f"unknown codec {codec}") from None
+    return AudioFrame(sequence, codec, sample_rate, timestamp_ms, data[HEADER.size:])
+
+
+def encode_frame(sequence: int, payload: bytes, sample_rate: int = 16000,
+                 codec: AudioCodec = AudioCodec.PCM_S16LE, timestamp_ms: int = 0) -> bytes:
+    return HEADER.pack(VERSION, codec, 0, sample_rate, sequence, timestamp_ms) + payload
+
+
+def parse_control(text: str) -> dict:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        raise ProtocolError("text frames must be JSON control messages in protocol v2") from None
+    if not isinstance(message, dict) or message.get("type") not in CONTROL_TYPES:
+        raise ProtocolError(f"unknown control message (expected type one of {', '.join(CONTROL_TYPES)})")
+    return message
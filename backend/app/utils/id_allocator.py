@@ -0,0 +1,97 @@
+# app/utils/id_allocator.py
+import datetime
+import logging
+import threading
+from collections import deque
+from typing import Deque, List
+
+from sqlalchemy import Engine, func, select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.models.id_sequence import IdSequence, patient_id_seq
+
+log = logging.getLogger(__name__)
+
+
+class PatientIdAllocator:
+    """
+    Hands out collision-free, human-readable patient IDs (YYYYMMDD-NNNNNN).
+
+    The numeric part comes from a database sequence, so uniqueness never depends
+    on the clock and no pre-insert SELECT is needed. To keep registration cheap,
+    each worker reserves a block of sequence numbers in one round trip and serves
+    IDs from memory until the block runs out. Numbers skipped when a worker exits
+    with part of a block unused are simply never issued (same as any DB sequence).
+    """
+
+    def __init__(self, sequence_name: str = "patient_id", block_size: int = 50):
+        self.sequence_name = sequence_name
+        self.block_size = max(1, block_size)
+        self._reserved: Deque[int] = deque()
+        self._lock = threading.Lock() # Sync endpoints run in a threadpool
+
+    def next_id(self, bind: Engine, now: datetime.datetime | None = None) -> str:
+        """
+        Returns the next patient ID, reserving a fresh block from the database if needed.
+
+        Args:
+            bind: Engine (or connection) used to reserve a new block.
+            now: Optional timestamp for the date prefix (defaults to the current time).
+        """
+        with self._lock:
+            if not self._reserved:
+                self._reserved.extend(self._reserve_block(bind))
+            number = self._reserved.popleft()
+
+        date_str = (now or datetime.datetime.now()).strftime("%Y%m%d")
+        # Zero-pad to 6 digits: never collides with legacy 4-digit HHMM IDs
+        return f"{date_str}-{number:06d}"
+
+    def _reserve_block(self, bind: Engine) -> List[int]:
+        """Reserves `block_size` sequence numbers in a single DB round trip."""
+        if bind.dialect.supports_sequences:
+            numbers = self._reserve_from_sequence(bind)
+        else:
+            numbers = self._reserve_from_table(bind)
+        log.debug("Reserved patient ID block %s..%s (%s IDs)", numbers[0], numbers[-1], len(numbers))
+        return numbers
+
+    def _reserve_from_sequence(self, bind: Engine) -> List[int]:
+        # One nextval() per row of generate_series: concurrent workers may interleave,
+        # but every number is unique and the sequence definition stays independent of block size.
+        stmt = select(patient_id_seq.next_value()).select_from(
+            func.generate_series(1, self.block_size)
+        )
+        with bind.connect() as connection:
+            numbers = sorted(connection.execute(stmt).scalars().all())
+        return numbers
+
+    def _reserve_from_table(self, bind: Engine) -> List[int]:
+        # Emulated sequence: bump the counter in its own committed transaction so the
+        # reservation survives even if the caller's registration is rolled back.
+        for _ in range(2): # Second attempt covers a race on first-row creation
+            try:
+                with bind.begin() as connection:
+                    result = connection.execute(
+                        update(IdSequence)
+                        .where(IdSequence.name == self.sequence_name)
+                        .values(next_value=IdSequence.next_value + self.block_size)
+                    )
+                    if result.rowcount == 0:
+                        connection.execute(
+                            insert(IdSequence).values(
+                                name=self.sequence_name, next_value=1 + self.block_size
+                            )
+                        )
+                    end = connection.execute(
+                        select(IdSequence.next_value).where(IdSequence.name == self.sequence_name)
+                    ).scalar_one()
+                return list(range(end - self.block_size, end))
+            except IntegrityError:
+                log.debug("Concurrent creation of sequence row '%s', retrying.", self.sequence_name)
+        raise RuntimeError(f"Could not reserve IDs from sequence '{self.sequence_name}'")
+
+
+# --- Single process-wide instance ---
+patient_id_allocator = PatientIdAllocator(block_size=settings.PATIENT_ID_BLOCK_SIZE)
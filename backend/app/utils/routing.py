@@ -0,0 +1,23 @@
+# app/utils/routing.py
+from typing import Optional, Sequence
+
+from starlette.routing import BaseRoute, Match
+from starlette.types import Scope
+
+
+def resolve_route_template(routes: Sequence[BaseRoute], scope: Scope) -> Optional[str]:
+    """
+    Returns the path template (e.g. "/api/v1/patients/{patient_id}/history") of the
+    route that will handle `scope`, or None if nothing matches.
+
+    Used by middleware that runs before routing (rate limiting, metrics) so labels
+    and cost weights are per route instead of per concrete URL.
+    """
+    partial: Optional[str] = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", None) # Path matched, method didn't (405)
+    return partial
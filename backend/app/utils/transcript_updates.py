@@ -0,0 +1,86 @@
+# app/utils/transcript_updates.py
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+
+class TranscriptUpdates:
+    """
+    Delivers one dictation session's ASR results to its client.
+
+    Interim results go out at most `max_rate` times a second (0 = all of them):
+    an interim arriving sooner after the last one is held, and replaced by any
+    newer interim, until the interval is up - so the client still sees the
+    latest hypothesis within 1 / max_rate seconds, just not every step to it.
+    Final results are sent at once and drop a held interim they supersede.
+
+    With `diffs` (protocol v3) a message carries only what changed: the
+    client keeps the first `keep` characters of its current hypothesis and
+    appends `text`; a final result completes the hypothesis and the next one
+    starts empty. Otherwise every message has the full hypothesis.
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], max_rate: float, diffs: bool):
+        self._send = send
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.diffs = diffs
+        self.results = 0  # ASR results published
+        self.messages = 0 # Messages sent
+        self._client_text = "" # The hypothesis the client has (diffs)
+        self._last_interim_at: Optional[float] = None
+        self._held: Optional[str] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock() # Keeps a timed send and a final in order
+
+    async def publish(self, text: str, is_final: bool) -> None:
+        self.results += 1
+        if is_final:
+            self._cancel_timer()
+            self._held = None
+            await self._emit(text, True)
+            return
+        now = asyncio.get_running_loop().time()
+        due = 0.0 if self._last_interim_at is None else self._last_interim_at + self.interval - now
+        if due <= 0 and self._timer is None:
+            await self._emit(text, False)
+            return
+        self._held = text
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._send_held(due))
+
+    async def close(self) -> None:
+        """Sends a held interim result at once (the stream ended without a final for it)."""
+        self._cancel_timer()
+        if self._held is not None:
+            text, self._held = self._held, None
+            await self._emit(text, False)
+
+    def discard(self) -> None:
+        """Drops a held interim result (the session failed)."""
+        self._cancel_timer()
+        self._held = None
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _send_held(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._timer = None # From here on the send is committed; a final waits for it on the lock
+        text, self._held = self._held, None
+        if text is not None:
+            await self._emit(text, False)
+
+    async def _emit(self, text: str, is_final: bool) -> None:
+        async with self._lock:
+            if self.diffs:
+                keep = len(os.path.commonprefix((self._client_text, text)))
+                message = {"type": "transcript_delta", "keep": keep, "text": text[keep:], "is_final": is_final}
+                self._client_text = "" if is_final else text
+            else:
+                message = {"type": "transcript_update", "text": text, "is_final": is_final}
+            if not is_final:
+                self._last_interim_at = asyncio.get_running_loop().time()
+            self.messages += 1
+            await self._send(message)
@@ -0,0 +1,85 @@
+# app/utils/vad.py
+import numpy as np
+
+FRAME_MS = 20
+MIN_SPEECH_DB = -55.0 # Nothing quieter is speech, however quiet the room (dBFS)
+FRICATIVE_ZCR = (0.2, 0.65) # Zero-crossing rate of unvoiced consonants (s, f, sh): quiet but noisy
+NOISE_RISE_DB_PER_SECOND = 2.0 # How fast the noise floor estimate follows a room getting louder
+
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing voice activity detection on a 16-bit mono PCM stream.
+
+    Each 20 ms frame is speech when its level is `snr_db` over the noise floor,
+    or half that with a fricative-like zero-crossing rate. The floor is tracked
+    by minimum statistics: it drops to the quietest frame at once and otherwise
+    rises by NOISE_RISE_DB_PER_SECOND, so pauses between words keep it honest. Speech frames
+    are extended by `hangover_ms` after and `padding_ms` before (trailing
+    non-speech frames are held back until the next chunk shows whether speech
+    follows), so word onsets and endings survive. All per-frame work is numpy
+    array operations on the whole chunk; only the state at the chunk boundary is
+    carried over.
+    """
+
+    def __init__(self, sample_rate: int = 16000, snr_db: float = 9.0, hangover_ms: float = 300.0,
+                 padding_ms: float = 200.0):
+        self.frame = sample_rate * FRAME_MS // 1000
+        self.snr_db = snr_db
+        self.hangover = int(hangover_ms // FRAME_MS)
+        self.padding = int(padding_ms // FRAME_MS)
+        self.noise_db = None # Estimated from the first chunk
+        self._remainder = b"" # Partial frame
+        self._held = np.empty((0, self.frame), dtype="<i2") # Trailing non-speech frames, up to `padding`
+        self._since_speech = self.hangover + 1 # Frames since the last speech frame
+        self.input_bytes = 0
+        self.forwarded_bytes = 0
+
+    @property
+    def suppressed_ratio(self) -> float:
+        return 1.0 - self.forwarded_bytes / self.input_bytes if self.input_bytes else 0.0
+
+    def _classify(self, frames: np.ndarray) -> np.ndarray:
+        samples = frames.astype(np.float32)
+        power = np.einsum("ij,ij->i", samples, samples) / (self.frame * 32768.0 ** 2)
+        level_db = 10 * np.log10(power + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame - 1)
+        quietest = float(level_db.min())
+        if self.noise_db is None:
+            self.noise_db = quietest
+        above = level_db - self.noise_db
+        speech = (level_db > MIN_SPEECH_DB) & (
+            (above > self.snr_db) | ((above > self.snr_db / 2) & (zcr >= FRICATIVE_ZCR[0]) & (zcr <= FRICATIVE_ZCR[1]))
+        )
+        self.noise_db = min(quietest, self.noise_db + NOISE_RISE_DB_PER_SECOND * len(frames) * FRAME_MS / 1000)
+        return speech
+
+    def process(self, pcm: bytes) -> bytes:
+        """The speech (with hangover and padding) in the next piece of the stream; b"" while silent."""
+        self.input_bytes += len(pcm)
+        data = self._remainder + pcm
+        usable = len(data) // (self.frame * 2) * self.frame * 2
+        self._remainder = data[usable:]
+        if not usable:
+            return b""
+        frames = np.frombuffer(data, dtype="<i2", count=usable // 2).reshape(-1, self.frame)
+        speech = self._classify(frames)
+
+        held = len(self._held)
+        frames = np.concatenate((self._held, frames)) if held else frames
+        speech = np.concatenate((np.zeros(held, dtype=bool), speech))
+        index = np.arange(len(frames))
+        # Hangover: frames up to `hangover` after the last speech frame (carried over from earlier chunks)
+        last = np.maximum.accumulate(np.where(speech, index, held - 1 - self._since_speech))
+        active = index - last <= self.hangover
+        # Padding: frames up to `padding` before the next speech frame in this chunk
+        following = np.minimum.accumulate(np.where(speech, index, len(frames) + self.padding)[::-1])[::-1]
+        active |= following - index <= self.padding
+
+        self._since_speech = int(len(frames) - 1 - last[-1])
+        inactive_tail = len(frames) - 1 - (np.flatnonzero(active)[-1] if active.any() else -1)
+        self._held = frames[len(frames) - min(inactive_tail, self.padding):]
+        out = frames[active].tobytes()
+        self.forwarded_bytes += len(out)
+        return out
@@ -0,0 +1,3 @@
+# perf/__init__.py
+# Performance tooling (benchmarks, load tests). Run scripts from the backend/ folder,
+# e.g. `python -m perf.bench_login --help`.
@@ -0,0 +1,269 @@
+# perf/bench_dictation.py
+"""
+Concurrent dictation WebSocket benchmark against the fake speech backend.
+
+Starts the server with ASR_ENGINE=fake (deterministic results,
+`--asr-latency-ms` after the audio that produced them), then opens `--sessions`
+WebSockets on /ws/dictation/{session_id}. Each session streams 16 kHz mono
+LINEAR16 audio at real-time rate (`--audio` WAV file, or synthetic audio) and
+closes, which makes the server save the note.
+
+`--protocol` picks the wire format: v2 (framed binary, negotiated with the
+hvs.dictation.v2 subprotocol, ended with a "stop" control message), or the
+legacy raw binary or base64 text frames (ended by closing the socket).
+
+Reports:
+  * transcript round trip: time from sending the chunk that completes an
+    interim interval to receiving its transcript_update (includes the fake
+    backend's latency, subtracted in the "overhead" column);
+  * time to the first transcript per session;
+  * bytes on the wire per second of audio;
+  * server CPU per session (% of one core while streaming) and RSS per session;
+  * note save and final-result latency, from the server's /metrics histograms.
+
+    python -m perf.bench_dictation --sessions 50 --seconds 30
+    python -m perf.bench_dictation --sessions 200 --ramp 10 --audio sample.wav
+    python -m perf.bench_dictation --sessions 100 --protocol base64 --chunk-ms 1800
+"""
+import argparse
+import array
+import asyncio
+import base64
+import json
+import math
+import random
+import threading
+import time
+import wave
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from app.utils import dictation_protocol
+from perf import common
+
+PASSWORD = "BenchPassword123!"
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+
+def seed() -> int:
+    """Creates one doctor, a patient and an encounter. Returns the encounter ID."""
+    common.create_schema()
+    from app.core.security import get_password_hash
+    from app.db.session import SessionLocal
+    from app.models.encounter import Encounter, EncounterStatus, EncounterType
+    from app.models.patient import Patient
+    from app.models.user import User, UserRole
+
+    db = SessionLocal()
+    try:
+        db.add(User(username="dictation@hospital.test", hashed_password=get_password_hash(PASSWORD),
+                    role=UserRole.DOCTOR))
+        db.add(Patient(id="BENCH-DICTATION", full_name="Dictation Bench"))
+        encounter = Encounter(patient_id="BENCH-DICTATION", encounter_type=EncounterType.ADMISSION,
+                              current_status=EncounterStatus.ACTIVE)
+        db.add(encounter)
+        db.commit()
+        return encounter.id
+    finally:
+        db.close()
+
+
+def load_audio(path: Optional[str], seconds: float) -> bytes:
+    """16 kHz mono 16-bit PCM: the given WAV file, or `seconds` of a noisy synthetic tone."""
+    if path:
+        with wave.open(path, "rb") as w:
+            if (w.getframerate(), w.getnchannels(), w.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise SystemExit(f"{path} must be 16 kHz mono 16-bit PCM (ffmpeg -i in -ar 16000 -ac 1 out.wav)")
+            return w.readframes(w.getnframes())
+    rng = random.Random(0)
+    samples = array.array("h", (
+        int(6000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE) * (0.5 + 0.5 * math.sin(i / 4000))
+            + rng.gauss(0, 800))
+        for i in range(int(seconds * SAMPLE_RATE))
+    ))
+    return samples.tobytes()
+
+
+# --- Server resource sampling ---
+class ResourceSampler:
+    """Polls the server's RSS on a thread; CPU is read as before/after totals."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, common.process_rss_bytes(self.pid))
+
+    def __enter__(self) -> "ResourceSampler":
+        self.idle_rss = common.process_rss_bytes(self.pid)
+        self.cpu_start = common.process_cpu_seconds(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = common.process_cpu_seconds(self.pid) - self.cpu_start
+
+
+# --- Sessions ---
+class SessionResult:
+    def __init__(self):
+        self.round_trips: List[float] = []
+        self.first_transcript: Optional[float] = None
+        self.updates = 0
+        self.wire_bytes = 0
+        self.error: Optional[str] = None
+
+
+async def run_session(ws_url: str, index: int, token: str, encounter_id: int, audio: bytes,
+                      args: argparse.Namespace, start_delay: float) -> SessionResult:
+    result = SessionResult()
+    await asyncio.sleep(start_delay)
+    chunk_bytes = int(BYTES_PER_SECOND * args.chunk_ms / 1000) // 2 * 2
+    interim_bytes = int(BYTES_PER_SECOND * args.interim_ms / 1000)
+    sent_at: List[float] = [] # Send time of each chunk
+    url = f"{ws_url}/ws/dictation/bench-{index}?encounter_id={encounter_id}&token={token}"
+    subprotocols = [dictation_protocol.SUBPROTOCOL_V2] if args.protocol == "v2" else None
+    try:
+        async with websockets.connect(url, max_size=None, subprotocols=subprotocols) as ws:
+            greeting = json.loads(await ws.recv())
+            if greeting.get("status") != "connected":
+                raise RuntimeError(f"unexpected greeting {greeting}")
+            expected = "v2" if args.protocol == "v2" else "legacy"
+            if greeting.get("protocol") != expected:
+                raise RuntimeError(f"server negotiated {greeting.get('protocol')}, expected {expected}")
+
+            async def receive() -> None:
+                async for raw in ws:
+                    now = time.perf_counter()
+                    message = json.loads(raw)
+                    if message.get("type") != "transcript_update":
+                        continue
+                    result.updates += 1
+                    if result.first_transcript is None:
+                        result.first_transcript = now - sent_at[0]
+                    # The n-th result covers audio up to n * interim_bytes (see asr_engines.FakeEngine)
+                    chunk = min(len(sent_at) - 1, -(-result.updates * interim_bytes // chunk_bytes) - 1)
+                    result.round_trips.append(now - sent_at[chunk])
+
+            receiver = asyncio.create_task(receive())
+            started = time.perf_counter()
+            for n, offset in enumerate(range(0, len(audio), chunk_bytes)):
+                # Real-time pacing against the session clock, so scheduler delays do not accumulate
+                delay = started + n * args.chunk_ms / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent_at.append(time.perf_counter())
+                chunk = audio[offset:offset + chunk_bytes]
+                if args.protocol == "v2":
+                    message = dictation_protocol.encode_frame(n, chunk, timestamp_ms=int(time.time() * 1000))
+                elif args.protocol == "base64":
+                    message = base64.b64encode(chunk).decode("ascii")
+                else:
+                    message = chunk
+                result.wire_bytes += len(message)
+                await ws.send(message)
+            if args.protocol == "v2":
+                # The server delivers the remaining results, saves the note and closes
+                await ws.send(json.dumps({"type": "stop"}))
+                await asyncio.wait_for(receiver, timeout=args.asr_latency_ms / 1000 + 10.0)
+            else:
+                # Collect results still in flight before closing (closing ends the stream and saves the note)
+                await asyncio.sleep(args.asr_latency_ms / 1000 + 1.0)
+                receiver.cancel()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def main_async(server: common.ServerHandle, encounter_id: int, audio: bytes,
+                     args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60.0) as client:
+        response = await client.post("/api/v1/login/token",
+                                     data={"username": "dictation@hospital.test", "password": PASSWORD})
+        token = response.json()["access_token"]
+
+    audio_seconds = len(audio) / BYTES_PER_SECOND
+    print(f"{args.sessions} sessions x {audio_seconds:.1f}s audio, ramp {args.ramp}s, "
+          f"fake ASR latency {args.asr_latency_ms}ms, protocol {args.protocol}")
+    with ResourceSampler(server.pid) as resources:
+        started = time.monotonic()
+        results = await asyncio.gather(*(
+            run_session(server.ws_url, i, token, encounter_id, audio, args, args.ramp * i / max(1, args.sessions))
+            for i in range(args.sessions)
+        ))
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(1.0) # Let the server finish saving notes for the last sessions
+
+    failed = [r.error for r in results if r.error]
+    round_trips = [t for r in results for t in r.round_trips]
+    firsts = [r.first_transcript for r in results if r.first_transcript is not None]
+    latency = args.asr_latency_ms / 1000
+    print(common.format_row("transcript round trip", common.summarize(round_trips, elapsed), width=30))
+    print(common.format_row("  overhead (minus ASR latency)",
+                            common.summarize([t - latency for t in round_trips], elapsed), width=30))
+    print(common.format_row("time to first transcript", common.summarize(firsts, elapsed), width=30))
+
+    streaming_seconds = audio_seconds * args.sessions
+    wire_bytes = sum(r.wire_bytes for r in results)
+    print(f"wire: {wire_bytes / streaming_seconds / 1024:.1f} KB per audio second "
+          f"({wire_bytes / (len(audio) * args.sessions) * 100 - 100:+.1f}% vs raw PCM)")
+    print(f"server CPU: {resources.cpu_seconds:.2f}s total, "
+          f"{resources.cpu_seconds / streaming_seconds * 100:.2f}% of a core per streaming session")
+    print(f"server RSS: idle {resources.idle_rss / 2**20:.1f} MB, peak {resources.peak_rss / 2**20:.1f} MB, "
+          f"{(resources.peak_rss - resources.idle_rss) / max(1, args.sessions) / 1024:.0f} KB per session")
+
+    samples = common.fetch_metrics(server.base_url)
+    for label, name, match in (
+        ("note save", "note_save_duration_seconds", {"outcome": "saved"}),
+        ("final result after audio end", "asr_final_result_latency_seconds", {"engine": "fake"}),
+    ):
+        h = common.histogram_summary(samples, name, **match)
+        print(f"{label:<30} n={h['count']:>7.0f} mean={h['mean_ms']:>8.1f}ms "
+              f"p50~{h['p50_ms']:>8.1f}ms p95~{h['p95_ms']:>8.1f}ms")
+    if failed:
+        print(f"{len(failed)} sessions failed, e.g. {failed[0]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to use (default: temporary SQLite file)")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent dictation sessions")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Synthetic audio length per session")
+    parser.add_argument("--audio", help="16 kHz mono 16-bit WAV to stream instead of synthetic audio")
+    parser.add_argument("--chunk-ms", type=float, default=100.0, help="Audio per WebSocket message")
+    parser.add_argument("--protocol", choices=("v2", "raw", "base64"), default="v2",
+                        help="v2 framed binary, or legacy raw binary / base64 text frames")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which sessions are started")
+    parser.add_argument("--asr-latency-ms", type=float, default=300.0, help="Fake backend result latency")
+    parser.add_argument("--interim-ms", type=float, default=500.0, help="Audio per fake interim result")
+    args = parser.parse_args()
+
+    common.use_database(args.database_url)
+    encounter_id = seed()
+    audio = load_audio(args.audio, args.seconds)
+    env = {
+        "ASR_ENGINE": "fake",
+        "FAKE_ASR_LATENCY_MS": str(args.asr_latency_ms),
+        "FAKE_ASR_INTERIM_MS": str(args.interim_ms),
+        "DICTATION_VAD_ENABLED": "false", # Results are matched to audio offsets, which silence suppression would shift
+        "DICTATION_INTERIM_MAX_RATE": "0", # Every result is timed, so none may be coalesced
+        "RATE_LIMIT_ENABLED": "false",
+        "METRICS_ENABLED": "true",
+        "LOG_LEVEL": "WARNING",
+    }
+    with common.run_server(env) as server:
+        asyncio.run(main_async(server, encounter_id, audio, args))
+
+
+if __name__ == "__main__":
+    main()
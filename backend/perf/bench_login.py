@@ -0,0 +1,131 @@
+# perf/bench_login.py
+"""
+Login throughput benchmark alongside a concurrent read workload.
+
+Measures what a login burst (e.g. shift change) does to the rest of the API:
+  1. read-only phase:  GET /api/v1/patients/{id} from `--readers` clients;
+  2. mixed phase:      the same reads plus `--login-clients` clients hammering
+                       POST /api/v1/login/token.
+
+Compare runs with the hashing pool enabled and disabled, e.g.
+    python -m perf.bench_login --hash-workers 2
+    python -m perf.bench_login --hash-workers 0     # bcrypt in the request threadpool
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import httpx
+
+from perf import common
+
+PASSWORD = "BenchPassword123!"
+
+
+def seed(num_users: int) -> str:
+    """Creates `num_users` nurses sharing one password hash, plus one patient. Returns the patient ID."""
+    common.create_schema()
+    from app.core.security import get_password_hash
+    from app.db.session import SessionLocal
+    from app.models.patient import Patient
+    from app.models.user import User, UserRole
+
+    hashed = get_password_hash(PASSWORD) # One bcrypt run; all users share it
+    db = SessionLocal()
+    try:
+        db.add_all(
+            User(username=f"bench{i}@hospital.test", hashed_password=hashed, role=UserRole.NURSE)
+            for i in range(num_users)
+        )
+        patient = Patient(id="BENCH-000001", full_name="Bench Patient")
+        db.add(patient)
+        db.commit()
+        return patient.id
+    finally:
+        db.close()
+
+
+async def login(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post("/api/v1/login/token", data={"username": username, "password": PASSWORD})
+
+
+async def reader(client: httpx.AsyncClient, token: str, patient_id: str, stop_at: float, out: List[float]) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        response = await client.get(f"/api/v1/patients/{patient_id}", headers=headers)
+        if response.status_code == 200:
+            out.append(time.perf_counter() - start)
+
+
+async def login_client(client: httpx.AsyncClient, index: int, num_users: int, stop_at: float,
+                       out: List[float], statuses: Dict[int, int]) -> None:
+    i = index
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        response = await login(client, f"bench{i % num_users}@hospital.test")
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            out.append(time.perf_counter() - start)
+        i += 1
+
+
+async def run_phase(base_url: str, token: str, patient_id: str, args: argparse.Namespace, with_logins: bool) -> None:
+    limits = httpx.Limits(max_connections=args.readers + args.login_clients + 4)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        reads: List[float] = []
+        logins: List[float] = []
+        statuses: Dict[int, int] = {}
+        started = time.monotonic()
+        stop_at = started + args.duration
+        tasks = [reader(client, token, patient_id, stop_at, reads) for _ in range(args.readers)]
+        if with_logins:
+            tasks += [
+                login_client(client, i, args.users, stop_at, logins, statuses)
+                for i in range(args.login_clients)
+            ]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+
+    label = "mixed" if with_logins else "read-only"
+    print(common.format_row(f"[{label}] GET /patients/{{id}}", common.summarize(reads, elapsed)))
+    if with_logins:
+        print(common.format_row(f"[{label}] POST /login/token", common.summarize(logins, elapsed)))
+        print(f"[{label}] login status codes: {dict(sorted(statuses.items()))}")
+
+
+async def main_async(base_url: str, patient_id: str, args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        token = (await login(client, "bench0@hospital.test")).json()["access_token"]
+    await run_phase(base_url, token, patient_id, args, with_logins=False)
+    await run_phase(base_url, token, patient_id, args, with_logins=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to use (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=16, help="Concurrent read clients")
+    parser.add_argument("--login-clients", type=int, default=16, help="Concurrent login clients in the mixed phase")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--hash-workers", type=int, default=2, help="PASSWORD_HASH_WORKERS for the server (0 = threads)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    common.use_database(args.database_url)
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds) # Seed hashes at the server's cost
+    patient_id = seed(args.users)
+    env = {
+        "PASSWORD_HASH_WORKERS": str(args.hash_workers),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "RATE_LIMIT_ENABLED": "false", # Measure hashing, not the limiter
+    }
+    print(f"Server: hash workers={args.hash_workers}, bcrypt rounds={args.bcrypt_rounds}")
+    with common.run_server(env) as server:
+        asyncio.run(main_async(server.base_url, patient_id, args))
+
+
+if __name__ == "__main__":
+    main()
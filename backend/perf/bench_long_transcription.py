@@ -0,0 +1,111 @@
+# perf/bench_long_transcription.py
+"""
+Wall-clock time to transcribe a long recording (the upload job path,
+asr_service.transcribe_file) against the fake engine, by chunk concurrency.
+
+Generates `--minutes` of speech-like 16 kHz audio (bursts of "words" with short
+gaps and longer pauses between sentences, over a low noise floor), then runs
+the file through silence splitting, parallel recognition and stitching once
+per `--concurrency` value. The fake engine's one-shot recognition takes
+`--latency-ms` plus `--rtf` seconds per second of audio, so serial
+transcription runs at about `--rtf` x real time.
+
+Reports chunks, how many cuts landed in pauses, wall time and the resulting
+real-time factor.
+
+    python -m perf.bench_long_transcription --minutes 30 --concurrency 1,4,8
+    python -m perf.bench_long_transcription --minutes 60 --rtf 0.5 --chunk-seconds 30
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from perf import common
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(minutes: float, seed: int = 0) -> np.ndarray:
+    """Words of 0.15-0.5s (noisy harmonic bursts), 50-150ms apart, sentences 3-12 words, 0.4-1.2s pauses."""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    out = (rng.normal(0, 10, total)).astype(np.float32) # Noise floor around -70 dBFS
+    position = 0
+    while position < total:
+        for _ in range(rng.integers(3, 13)):
+            length = int(rng.uniform(0.15, 0.5) * SAMPLE_RATE)
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = rng.uniform(100, 220)
+            word = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5)) * np.hanning(length)
+            word = word * rng.uniform(3000, 9000) + rng.normal(0, 300, length)
+            end = min(total, position + length)
+            out[position:end] += word[:end - position]
+            position = end + int(rng.uniform(0.05, 0.15) * SAMPLE_RATE)
+            if position >= total:
+                break
+        position += int(rng.uniform(0.4, 1.2) * SAMPLE_RATE)
+    return np.clip(out, -32768, 32767).astype("<i2")
+
+
+async def run(path: str, engine, concurrency: int) -> float:
+    from app.core.config import settings
+    from app.services import asr_service
+    settings.DICTATION_CHUNK_CONCURRENCY = concurrency
+    started = time.perf_counter()
+    await asr_service.transcribe_file(path, engine)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30.0, help="Recording length")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated chunk concurrency values")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fake engine latency per request")
+    parser.add_argument("--rtf", type=float, default=0.3, help="Fake engine processing seconds per audio second")
+    parser.add_argument("--chunk-seconds", type=float, help="Override DICTATION_CHUNK_SECONDS")
+    args = parser.parse_args()
+
+    common.use_database(None) # asr_service imports the DB session
+    from app.core.config import settings
+    from app.services import asr_engines, asr_service
+    if args.chunk_seconds:
+        settings.DICTATION_CHUNK_SECONDS = args.chunk_seconds
+    engine = asr_engines.FakeEngine(args.latency_ms / 1000, 0.5, 3.0, batch_rtf=args.rtf)
+
+    samples = speech_like(args.minutes)
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(samples.tobytes())
+
+        started = time.perf_counter()
+        chunks = asr_service._plan_file_chunks(path, *asr_service._pcm_span(path))
+        planning = time.perf_counter() - started
+        cuts = chunks[1:]
+        in_speech = sum(chunk.cut_in_speech for chunk in cuts)
+        lengths = [(chunk.end - chunk.start) / SAMPLE_RATE for chunk in chunks]
+        print(f"{args.minutes:.0f} min recording: {len(chunks)} chunks of {min(lengths):.1f}-{max(lengths):.1f}s "
+              f"(overlap included), {len(cuts) - in_speech}/{len(cuts)} cuts in pauses, planned in {planning * 1000:.0f}ms")
+        print(f"fake engine: {args.latency_ms:.0f}ms + {args.rtf} x audio per request, "
+              f"chunk target {settings.DICTATION_CHUNK_SECONDS:.0f}s, "
+              f"overlap at cuts in speech {settings.DICTATION_CHUNK_OVERLAP_SECONDS:.1f}s")
+
+        audio_seconds = args.minutes * 60
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            elapsed = asyncio.run(run(path, engine, concurrency))
+            print(f"concurrency {concurrency:>3}: {elapsed:>8.1f}s wall, {elapsed / audio_seconds:.3f} x real time")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
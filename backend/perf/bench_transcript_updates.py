@@ -0,0 +1,233 @@
+# perf/bench_transcript_updates.py
+"""
+Frames and bytes the server sends per dictation session for transcript
+updates, and how late the client sees each result, by wire format.
+
+Runs `--sessions` concurrent dictations of `--seconds` synthetic audio
+against ASR_ENGINE=fake with frequent interim results (`--interim-ms`, like
+Cloud Speech's), once per configuration:
+
+  * v2 every result   - full hypothesis per result (DICTATION_INTERIM_MAX_RATE=0)
+  * v2 coalesced      - full hypothesis, at most `--max-rate` interims a second
+  * v3 coalesced      - diff-style updates (keep + changed tail), JSON text frames
+  * v3+msgpack        - the same as msgpack binary frames (if msgpack is installed)
+
+each with permessage-deflate off and on (UVICORN_WS_PER_MESSAGE_DEFLATE).
+Server-to-client bytes are counted on the wire by a local TCP proxy, so they
+include frame headers, compression and the handshake. The client rebuilds
+the transcript from the updates and checks that every configuration ends
+with the same text.
+
+"display lag" is, for each fake result, the time from sending the audio that
+completes it to the client first showing that result or a later one, minus
+the fake backend's latency: what coalescing adds to perceived latency.
+
+    python -m perf.bench_transcript_updates --sessions 20 --seconds 20
+    python -m perf.bench_transcript_updates --interim-ms 100 --max-rate 2
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+import httpx
+import websockets
+
+from app.utils import dictation_protocol
+from perf import bench_dictation, common
+
+WORDS_PER_RESULT = 2 # asr_engines.FakeEngine default
+
+
+class CountingProxy:
+    """Forwards TCP connections to the server and counts the bytes it sends back."""
+
+    def __init__(self, target_port: int):
+        self.target_port = target_port
+        self.downstream_bytes = 0
+        self.port = common.free_port()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+
+        async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, counted: bool) -> None:
+            try:
+                while data := await reader.read(65536):
+                    if counted:
+                        self.downstream_bytes += len(data)
+                    writer.write(data)
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        await asyncio.gather(pipe(client_reader, server_writer, False), pipe(server_reader, client_writer, True))
+
+
+class SessionResult:
+    def __init__(self):
+        self.frames = 0
+        self.lags: List[float] = []
+        self.transcript: List[str] = []
+        self.error: Optional[str] = None
+
+
+async def run_session(ws_url: str, index: int, token: str, encounter_id: int, audio: bytes, subprotocol: str,
+                      args: argparse.Namespace, start_delay: float) -> SessionResult:
+    result = SessionResult()
+    await asyncio.sleep(start_delay)
+    chunk_bytes = int(bench_dictation.BYTES_PER_SECOND * args.chunk_ms / 1000) // 2 * 2
+    interim_bytes = int(bench_dictation.BYTES_PER_SECOND * args.interim_ms / 1000)
+    results_per_utterance = max(1, round(args.utterance_ms / args.interim_ms))
+    sent_at: List[float] = []
+    shown: List[float] = [] # shown[i]: when result i + 1 (or a later one) was first on screen
+    url = f"{ws_url}/ws/dictation/updates-{index}?encounter_id={encounter_id}&token={token}"
+    msgpack_encoded = subprotocol == dictation_protocol.SUBPROTOCOL_V3_MSGPACK
+    try:
+        async with websockets.connect(url, max_size=None, subprotocols=[subprotocol],
+                                      compression="deflate") as ws:
+            if ws.subprotocol != subprotocol:
+                raise RuntimeError(f"server accepted {ws.subprotocol}, offered {subprotocol}")
+
+            async def receive() -> None:
+                hypothesis = ""
+                async for raw in ws:
+                    now = time.perf_counter()
+                    result.frames += 1
+                    message = dictation_protocol.msgpack.unpackb(raw) if msgpack_encoded else json.loads(raw)
+                    if message.get("type") == "transcript_delta":
+                        hypothesis = hypothesis[:message["keep"]] + message["text"]
+                    elif message.get("type") == "transcript_update":
+                        hypothesis = message["text"]
+                    else:
+                        continue
+                    # Which fake result this is (see asr_engines.FakeEngine.result)
+                    utterance = len(result.transcript)
+                    if message["is_final"]:
+                        result.transcript.append(hypothesis)
+                        hypothesis = ""
+                        newest = (utterance + 1) * results_per_utterance
+                    else:
+                        newest = utterance * results_per_utterance + len(hypothesis.split()) // WORDS_PER_RESULT
+                    while len(shown) < newest:
+                        shown.append(now)
+
+            receiver = asyncio.create_task(receive())
+            started = time.perf_counter()
+            for n, offset in enumerate(range(0, len(audio), chunk_bytes)):
+                delay = started + n * args.chunk_ms / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent_at.append(time.perf_counter())
+                await ws.send(dictation_protocol.encode_frame(n, audio[offset:offset + chunk_bytes]))
+            await ws.send(json.dumps({"type": "stop"}))
+            await asyncio.wait_for(receiver, timeout=args.asr_latency_ms / 1000 + 10.0)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    latency = args.asr_latency_ms / 1000
+    for i, at in enumerate(shown):
+        # Result i + 1 is due once the chunk holding byte (i + 1) * interim_bytes was sent
+        chunk = min(len(sent_at) - 1, -(-(i + 1) * interim_bytes // chunk_bytes) - 1)
+        result.lags.append(at - sent_at[chunk] - latency)
+    return result
+
+
+async def run_configuration(server: common.ServerHandle, name: str, subprotocol: str, token: str, encounter_id: int,
+                            audio: bytes, args: argparse.Namespace) -> Optional[str]:
+    proxy = CountingProxy(int(server.ws_url.rsplit(":", 1)[1]))
+    await proxy.start()
+    try:
+        started = time.monotonic()
+        results = await asyncio.gather(*(
+            run_session(f"ws://127.0.0.1:{proxy.port}", i, token, encounter_id, audio, subprotocol, args,
+                        args.ramp * i / max(1, args.sessions))
+            for i in range(args.sessions)
+        ))
+        elapsed = time.monotonic() - started
+    finally:
+        await proxy.stop()
+
+    sessions = len(results)
+    lags = common.summarize([lag for r in results for lag in r.lags], elapsed)
+    print(f"{name:<32} {sum(r.frames for r in results) / sessions:>8.0f} "
+          f"{proxy.downstream_bytes / sessions / 1024:>9.1f} "
+          f"{lags['p50_ms']:>9.1f}ms {lags['p95_ms']:>9.1f}ms")
+    failed = [r.error for r in results if r.error]
+    if failed:
+        print(f"  {len(failed)} sessions failed, e.g. {failed[0]}")
+    return " | ".join(results[0].transcript) if results and not results[0].error else None
+
+
+async def main_async(server: common.ServerHandle, encounter_id: int, audio: bytes, args: argparse.Namespace,
+                     configurations, label: str, transcripts: dict) -> None:
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60.0) as client:
+        response = await client.post("/api/v1/login/token", data={"username": "dictation@hospital.test",
+                                                                   "password": bench_dictation.PASSWORD})
+        token = response.json()["access_token"]
+    for name, subprotocol in configurations:
+        full_name = f"{name}, {label}"
+        transcripts[full_name] = await run_configuration(server, full_name, subprotocol, token, encounter_id,
+                                                         audio, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent dictation sessions per configuration")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Synthetic audio length per session")
+    parser.add_argument("--chunk-ms", type=float, default=100.0, help="Audio per WebSocket message")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which sessions are started")
+    parser.add_argument("--asr-latency-ms", type=float, default=300.0, help="Fake backend result latency")
+    parser.add_argument("--interim-ms", type=float, default=100.0, help="Audio per fake interim result")
+    parser.add_argument("--utterance-ms", type=float, default=6000.0, help="Audio per fake final result")
+    parser.add_argument("--max-rate", type=float, default=4.0, help="DICTATION_INTERIM_MAX_RATE when coalescing")
+    args = parser.parse_args()
+
+    common.use_database(None)
+    encounter_id = bench_dictation.seed()
+    audio = bench_dictation.load_audio(None, args.seconds)
+    coalesced = [("v2 coalesced", dictation_protocol.SUBPROTOCOL_V2),
+                 ("v3 coalesced", dictation_protocol.SUBPROTOCOL_V3)]
+    if dictation_protocol.msgpack is not None:
+        coalesced.append(("v3+msgpack coalesced", dictation_protocol.SUBPROTOCOL_V3_MSGPACK))
+    else:
+        print("msgpack is not installed; skipping hvs.dictation.v3+msgpack")
+
+    print(f"{args.sessions} sessions x {args.seconds:.0f}s, interim result every {args.interim_ms:.0f}ms of audio, "
+          f"final every {args.utterance_ms:.0f}ms, coalesced to {args.max_rate:g}/s")
+    print(f"{'configuration':<32} {'frames':>8} {'KB':>9} {'lag p50':>11} {'lag p95':>11}   (per session)")
+    transcripts = {}
+    for deflate in ("false", "true"):
+        for max_rate, configurations in (("0", [("v2 every result", dictation_protocol.SUBPROTOCOL_V2)]),
+                                         (str(args.max_rate), coalesced)):
+            env = {
+                "ASR_ENGINE": "fake",
+                "FAKE_ASR_LATENCY_MS": str(args.asr_latency_ms),
+                "FAKE_ASR_INTERIM_MS": str(args.interim_ms),
+                "FAKE_ASR_UTTERANCE_MS": str(args.utterance_ms),
+                "DICTATION_VAD_ENABLED": "false", # Results are matched to audio offsets
+                "DICTATION_INTERIM_MAX_RATE": max_rate,
+                "UVICORN_WS_PER_MESSAGE_DEFLATE": deflate,
+                "RATE_LIMIT_ENABLED": "false",
+                "LOG_LEVEL": "WARNING",
+            }
+            label = "deflate" if deflate == "true" else "no deflate"
+            with common.run_server(env) as server:
+                asyncio.run(main_async(server, encounter_id, audio, args, configurations, label, transcripts))
+
+    distinct = {text for text in transcripts.values() if text is not None}
+    print("final transcripts " + ("identical in every configuration" if len(distinct) == 1
+                                  else f"DIFFER ({len(distinct)} variants)"))
+
+
+if __name__ == "__main__":
+    main()
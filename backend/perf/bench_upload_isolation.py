@@ -0,0 +1,171 @@
+# perf/bench_upload_isolation.py
+"""
+Checks that large dictation uploads do not slow down live dictation sessions.
+
+Starts the server with ASR_ENGINE=fake and runs two phases of `--sessions`
+concurrent dictation WebSockets (see perf/bench_dictation.py):
+
+  * baseline - sessions only;
+  * uploads  - the same sessions while `--uploads` clients keep posting
+               `--upload-seconds` of 44.1 kHz stereo WAV to
+               POST /api/v1/dictation/upload (streamed to disk and queued) and
+               polling the transcription job until its note is saved (the
+               server's job workers transcode with ffmpeg when available and
+               recognise it).
+
+Reports the transcript round-trip overhead and the server's event loop lag
+(event_loop_lag_distribution_seconds) per phase. With uploads kept off the
+event loop the two phases should match.
+
+    python -m perf.bench_upload_isolation --sessions 20 --uploads 4
+    python -m perf.bench_upload_isolation --sessions 50 --uploads 8 --upload-seconds 600
+"""
+import argparse
+import array
+import asyncio
+import io
+import math
+import time
+import wave
+from typing import Dict, List, Tuple
+
+import httpx
+
+from perf import bench_dictation, common
+
+UPLOAD_RATE = 44100
+
+
+def upload_audio(seconds: float) -> bytes:
+    """A 44.1 kHz stereo 16-bit WAV file (needs transcoding, like a phone recording)."""
+    second = array.array("h", (
+        int(8000 * math.sin(2 * math.pi * 330 * (i // 2) / UPLOAD_RATE)) for i in range(UPLOAD_RATE * 2)
+    )).tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(UPLOAD_RATE)
+        w.writeframes(second * int(seconds))
+    return buffer.getvalue()
+
+
+def histogram_delta(before: Dict[str, List[Tuple[Dict[str, str], float]]],
+                    after: Dict[str, List[Tuple[Dict[str, str], float]]], name: str):
+    """The samples of histogram `name` observed between two scrapes."""
+    delta = {}
+    for suffix in ("_bucket", "_count", "_sum"):
+        earlier = {tuple(sorted(labels.items())): v for labels, v in before.get(name + suffix, [])}
+        delta[name + suffix] = [(labels, v - earlier.get(tuple(sorted(labels.items())), 0.0))
+                                for labels, v in after.get(name + suffix, [])]
+    return delta
+
+
+async def upload_loop(client: httpx.AsyncClient, token: str, encounter_id: int, data: bytes,
+                      stop: asyncio.Event, durations: List[float], errors: List[str]) -> None:
+    """Uploads, then polls the transcription job until it ends; repeats until `stop`."""
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/dictation/upload", params={"encounter_id": encounter_id}, headers=headers,
+                files={"file": ("upload.wav", data, "audio/wav")},
+            )
+            if response.status_code != 202:
+                errors.append(f"{response.status_code} {response.text[:200]}")
+                continue
+            job_url = response.json()["status_url"]
+            while (job := (await client.get(job_url, headers=headers)).json())["status"] in ("queued", "running"):
+                await asyncio.sleep(0.2)
+            if job["status"] != "completed" or job["note_id"] is None:
+                errors.append(f"job {job['id']} {job['status']}: {job['error']}")
+            else:
+                durations.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+
+async def run_phase(server: common.ServerHandle, name: str, token: str, encounter_id: int, audio: bytes,
+                    upload: bytes, args: argparse.Namespace) -> None:
+    before = common.fetch_metrics(server.base_url)
+    stop = asyncio.Event()
+    durations: List[float] = []
+    errors: List[str] = []
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=300.0) as client:
+        uploaders = [asyncio.create_task(upload_loop(client, token, encounter_id, upload, stop, durations, errors))
+                     for _ in range(args.uploads if name == "uploads" else 0)]
+        started = time.monotonic()
+        results = await asyncio.gather(*(
+            bench_dictation.run_session(server.ws_url, i, token, encounter_id, audio, args,
+                                        args.ramp * i / max(1, args.sessions))
+            for i in range(args.sessions)
+        ))
+        elapsed = time.monotonic() - started
+        stop.set()
+        await asyncio.gather(*uploaders)
+    after = common.fetch_metrics(server.base_url)
+
+    latency = args.asr_latency_ms / 1000
+    overheads = [t - latency for r in results for t in r.round_trips]
+    print(common.format_row(f"{name}: round trip overhead", common.summarize(overheads, elapsed), width=32))
+    lag = common.histogram_summary(histogram_delta(before, after, "event_loop_lag_distribution_seconds"),
+                                   "event_loop_lag_distribution_seconds")
+    print(f"{name + ': event loop lag':<32} n={lag['count']:>7.0f} mean={lag['mean_ms']:>8.1f}ms "
+          f"p50~{lag['p50_ms']:>8.1f}ms p95~{lag['p95_ms']:>8.1f}ms")
+    if uploaders:
+        print(common.format_row(f"{name}: upload to note saved", common.summarize(durations, elapsed), width=32))
+        print(f"{'':<32} {len(upload) / 2**20:.1f} MB per upload, "
+              f"{len(durations) * len(upload) / elapsed / 2**20:.1f} MB/s uploaded")
+    failed = [r.error for r in results if r.error] + errors
+    if failed:
+        print(f"{name}: {len(failed)} failures, e.g. {failed[0]}")
+
+
+async def main_async(server: common.ServerHandle, encounter_id: int, audio: bytes, upload: bytes,
+                     args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60.0) as client:
+        response = await client.post("/api/v1/login/token", data={"username": "dictation@hospital.test",
+                                                                   "password": bench_dictation.PASSWORD})
+        token = response.json()["access_token"]
+
+    print(f"{args.sessions} sessions x {len(audio) / bench_dictation.BYTES_PER_SECOND:.1f}s audio, "
+          f"{args.uploads} concurrent uploads of {args.upload_seconds:.0f}s, fake ASR latency {args.asr_latency_ms}ms")
+    await run_phase(server, "baseline", token, encounter_id, audio, upload, args)
+    await run_phase(server, "uploads", token, encounter_id, audio, upload, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to use (default: temporary SQLite file)")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent dictation sessions per phase")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Synthetic audio length per session")
+    parser.add_argument("--uploads", type=int, default=4, help="Concurrent upload clients in the second phase")
+    parser.add_argument("--upload-seconds", type=float, default=120.0, help="Length of each uploaded recording")
+    parser.add_argument("--chunk-ms", type=float, default=100.0, help="Audio per WebSocket message")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which sessions are started")
+    parser.add_argument("--asr-latency-ms", type=float, default=300.0, help="Fake backend result latency")
+    parser.add_argument("--interim-ms", type=float, default=500.0, help="Audio per fake interim result")
+    args = parser.parse_args()
+    args.protocol = "v2"
+
+    common.use_database(args.database_url)
+    encounter_id = bench_dictation.seed()
+    audio = bench_dictation.load_audio(None, args.seconds)
+    upload = upload_audio(args.upload_seconds)
+    env = {
+        "ASR_ENGINE": "fake",
+        "FAKE_ASR_LATENCY_MS": str(args.asr_latency_ms),
+        "FAKE_ASR_INTERIM_MS": str(args.interim_ms),
+        "DICTATION_VAD_ENABLED": "false", # Results are matched to audio offsets, which silence suppression would shift
+        "DICTATION_INTERIM_MAX_RATE": "0", # Every result is timed, so none may be coalesced
+        "RATE_LIMIT_ENABLED": "false",
+        "METRICS_ENABLED": "true",
+        "LOG_LEVEL": "WARNING",
+    }
+    with common.run_server(env) as server:
+        asyncio.run(main_async(server, encounter_id, audio, upload, args))
+
+
+if __name__ == "__main__":
+    main()
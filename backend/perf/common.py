@@ -0,0 +1,176 @@
+# perf/common.py
+"""
+Shared helpers for the performance scripts in this folder: a throwaway SQLite
+database, a uvicorn server subprocess and latency summaries.
+
+Scripts must call `use_database()` BEFORE importing anything from `app`, because
+`app.core.config` reads DATABASE_URL at import time.
+"""
+import contextlib
+import math
+import os
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS_TOKEN = secrets.token_hex(16) # Scrape token for the servers started here
+
+
+# --- Database ---
+def use_database(database_url: Optional[str] = None) -> str:
+    """
+    Points this process (and servers started from it) at `database_url`,
+    or at a fresh temporary SQLite file if none is given. Returns the URL.
+    """
+    if not database_url:
+        fd, path = tempfile.mkstemp(prefix="hvs_perf_", suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "perf-secret-key")
+    return database_url
+
+def create_schema() -> None:
+    """Creates all tables for the current DATABASE_URL (like create_tables.py)."""
+    from app.db.base import Base
+    from app.db.session import engine
+    Base.metadata.create_all(bind=engine)
+
+
+# --- Server ---
+@dataclass
+class ServerHandle:
+    base_url: str
+    ws_url: str
+    pid: int
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def run_server(
+    env_overrides: Optional[Dict[str, str]] = None,
+    port: Optional[int] = None,
+    workers: int = 1,
+    startup_timeout: float = 60.0,
+) -> Iterator[ServerHandle]:
+    """
+    Starts `uvicorn app.main:app` in a subprocess and yields a handle with its URLs and PID.
+    The server inherits this process's environment (DATABASE_URL etc.) plus `env_overrides`,
+    and accepts METRICS_TOKEN for /metrics (see fetch_metrics).
+    """
+    port = port or free_port()
+    env = {**os.environ, "METRICS_TOKEN": METRICS_TOKEN, **(env_overrides or {})}
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited during startup (code {proc.returncode})")
+            try:
+                if httpx.get(f"{base_url}/", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not become ready in time")
+            time.sleep(0.2)
+        yield ServerHandle(base_url=base_url, ws_url=f"ws://127.0.0.1:{port}", pid=proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# --- Server Process ---
+def process_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process (Linux /proc)."""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        fields = f.read().rsplit(b")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def process_rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/statm", "rb") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def fetch_metrics(base_url: str) -> Dict[str, List[Tuple[Dict[str, str], float]]]:
+    """Scrapes /metrics into {sample name: [(labels, value), ...]}."""
+    samples: Dict[str, List[Tuple[Dict[str, str], float]]] = {}
+    response = httpx.get(f"{base_url}/metrics", headers={"Authorization": f"Bearer {METRICS_TOKEN}"}, timeout=10.0)
+    response.raise_for_status()
+    for line in response.text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, _, value = line.rpartition(" ")
+        name, _, label_text = series.partition("{")
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', label_text))
+        samples.setdefault(name, []).append((labels, float(value)))
+    return samples
+
+def histogram_summary(samples: Dict[str, List[Tuple[Dict[str, str], float]]], name: str,
+                      **match: str) -> Dict[str, float]:
+    """Count, mean and bucket-interpolated p50/p95 (milliseconds) of the histogram series matching `match` labels."""
+    def series(suffix: str) -> List[Tuple[Dict[str, str], float]]:
+        return [(labels, v) for labels, v in samples.get(f"{name}{suffix}", [])
+                if all(labels.get(k) == want for k, want in match.items())]
+
+    count = sum(v for _, v in series("_count"))
+    total = sum(v for _, v in series("_sum"))
+    buckets = sorted((float(labels["le"]), v) for labels, v in series("_bucket"))
+    result = {"count": count, "mean_ms": total / count * 1000 if count else float("nan")}
+    for q in (50, 95):
+        result[f"p{q}_ms"] = float("nan")
+        target, lower, below = count * q / 100, 0.0, 0.0
+        for bound, cumulative in buckets:
+            if count and cumulative >= target:
+                upper = bound if bound != math.inf else lower
+                share = (target - below) / (cumulative - below) if cumulative > below else 1.0
+                result[f"p{q}_ms"] = (lower + (upper - lower) * share) * 1000
+                break
+            lower, below = bound, cumulative
+    return result
+
+
+# --- Statistics ---
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (q in 0..100)."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Returns count, throughput and p50/p95/p99 (milliseconds) for a list of latencies in seconds."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "rps": len(values) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+def format_row(name: str, stats: Dict[str, float], width: int = 40) -> str:
+    return (
+        f"{name:<{width}} n={stats['count']:>7} {stats['rps']:>9.1f}/s "
+        f"p50={stats['p50_ms']:>8.1f}ms p95={stats['p95_ms']:>8.1f}ms p99={stats['p99_ms']:>8.1f}ms"
+    )
@@ -0,0 +1,391 @@
+# perf/query_plans.py
+"""
+Query-plan regression check for the service layer.
+
+Runs every query-building function in patient_service, encounter_service,
+task_service, note_service and user_service against a database that
+perf/datagen.py filled, records each SQL statement they send, and EXPLAINs it
+(`EXPLAIN (FORMAT JSON)` on Postgres, `EXPLAIN QUERY PLAN` on SQLite). Writes
+run inside a transaction that is rolled back, so the data set is not changed.
+
+Each plan is reduced to the access path per table (seq scan, index scan and
+which index) plus row and cost estimates, and compared with a baseline JSON:
+  * REGRESSION: a table read through an index in the baseline is now seq-scanned,
+    or the estimated rows or cost grew more than `--blowup` times;
+  * WARNING:    a different index or join strategy is used, a new seq scan
+    appears, or the query text changed.
+The exit code is 1 if there are regressions, so this can gate a model or
+migration change:
+
+    python -m perf.datagen --database-url $DB --scale 100 --reset
+    python -m perf.query_plans --database-url $DB --update-baseline   # on the old schema
+    python -m perf.query_plans --database-url $DB                     # after the change
+
+Compare only plans taken on the same database engine and data scale.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from perf import common
+
+DEFAULT_BASELINE = "perf/query_plans_baseline.json"
+SKIPPED_STATEMENTS = ("INSERT", "BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+
+# Postgres node types that read a table, and how they access it
+SCAN_NODES = {
+    "Seq Scan": "seq", "Parallel Seq Scan": "seq",
+    "Index Scan": "index", "Index Only Scan": "index", "Bitmap Heap Scan": "index",
+}
+SQLITE_DETAIL = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?P<table>\w+)(?: AS \w+)?"
+    r"(?: USING (?:(?:COVERING )?INDEX (?P<index>\w+)|(?P<pk>INTEGER PRIMARY KEY)|(?P<auto>AUTOMATIC \w+ INDEX)))?"
+)
+
+
+# --- Cases ---
+@dataclass
+class Sample:
+    """Representative arguments, picked from the generated data."""
+    hot_patient_id: str # Most encounters
+    patient_id: str # A typical patient
+    hot_encounter_id: int # Most notes
+    encounter_id: int
+    busy_nurse_id: int # Most pending tasks
+    doctor_id: int
+    username: str
+    pending_task_id: int
+    common_name: str
+    rare_name: str
+
+
+def pick_sample(db) -> Sample:
+    from sqlalchemy import func, select
+    from app.models.encounter import Encounter
+    from app.models.note import ClinicalNote
+    from app.models.patient import Patient
+    from app.models.task import NurseTask, TaskStatus
+    from app.models.user import User, UserRole
+
+    def first(stmt):
+        value = db.execute(stmt.limit(1)).scalar()
+        if value is None:
+            sys.exit("The database has no data; fill it with perf/datagen.py first.")
+        return value
+
+    hot_patient = first(select(Encounter.patient_id).group_by(Encounter.patient_id).order_by(func.count().desc()))
+    hot_encounter = first(select(ClinicalNote.encounter_id).group_by(ClinicalNote.encounter_id)
+                          .order_by(func.count().desc()))
+    busy_nurse = first(select(NurseTask.assigned_nurse_id).where(NurseTask.status == TaskStatus.PENDING)
+                       .group_by(NurseTask.assigned_nurse_id).order_by(func.count().desc()))
+    patient_count = db.execute(select(func.count()).select_from(Patient)).scalar()
+    names = db.execute(select(Patient.full_name).order_by(Patient.id).limit(500)).scalars().all()
+    surnames = sorted({name.split()[-1] for name in names}, key=lambda s: sum(n.endswith(s) for n in names))
+    return Sample(
+        hot_patient_id=hot_patient,
+        patient_id=first(select(Patient.id).order_by(Patient.id).offset(patient_count // 2)),
+        hot_encounter_id=hot_encounter,
+        encounter_id=first(select(Encounter.id).where(Encounter.id != hot_encounter).order_by(Encounter.id)),
+        busy_nurse_id=busy_nurse,
+        doctor_id=first(select(User.id).where(User.role == UserRole.DOCTOR).order_by(User.id)),
+        username=first(select(User.username).where(User.role == UserRole.NURSE).order_by(User.id)),
+        pending_task_id=first(select(NurseTask.id).where(NurseTask.status == TaskStatus.PENDING).order_by(NurseTask.id)),
+        common_name=surnames[-1][:4],
+        rare_name=surnames[0],
+    )
+
+
+def build_cases() -> Dict[str, Callable[[Any, Sample], Any]]:
+    """Service calls to capture, keyed "<service>.<function>[:variant]"; plans are keyed "<case>@<table>"."""
+    from app.models.encounter import EncounterType, LabReportStatus
+    from app.models.note import NoteType
+    from app.models.task import TaskStatus
+    from app.models.user import UserRole
+    from app.schemas.encounter import EncounterCreate, EncounterUpdate
+    from app.schemas.patient import PatientCreate
+    from app.schemas.task import TaskCreate
+    from app.schemas.user import UserCreate
+    from app.services import encounter_service, note_service, patient_service, task_service, user_service
+
+    soon = datetime.now(timezone.utc) + timedelta(hours=2)
+    return {
+        "patient_service.get_patient_by_id": lambda db, s: patient_service.get_patient_by_id(db, patient_id=s.patient_id),
+        "patient_service.search_patients_by_name:common": lambda db, s: patient_service.search_patients_by_name(
+            db, name_query=s.common_name, limit=20),
+        "patient_service.search_patients_by_name:rare": lambda db, s: patient_service.search_patients_by_name(
+            db, name_query=s.rare_name, limit=20),
+        "patient_service.get_patient_history:hot": lambda db, s: patient_service.get_patient_history(
+            db, patient_id=s.hot_patient_id),
+        "patient_service.get_patient_history": lambda db, s: patient_service.get_patient_history(
+            db, patient_id=s.patient_id),
+        "patient_service.create_patient": lambda db, s: patient_service.create_patient(
+            db, patient_in=PatientCreate(full_name="Plan Check")),
+
+        "encounter_service.get_encounter_by_id": lambda db, s: encounter_service.get_encounter_by_id(
+            db, encounter_id=s.encounter_id),
+        "encounter_service.create_initial_encounter": lambda db, s: encounter_service.create_initial_encounter(
+            db, encounter_in=EncounterCreate(patient_id=s.patient_id, encounter_type=EncounterType.TRIAGE)),
+        "encounter_service.update_encounter": lambda db, s: encounter_service.update_encounter(
+            db, encounter_id=s.encounter_id, encounter_update=EncounterUpdate(next_med_due_at=soon)),
+        "encounter_service.update_lab_status": lambda db, s: encounter_service.update_lab_status(
+            db, encounter_id=s.encounter_id, new_status=LabReportStatus.ORDERED, expected_at=soon),
+        "encounter_service.get_medication_alerts": lambda db, s: encounter_service.get_medication_alerts(db),
+        "encounter_service.get_delayed_lab_alerts": lambda db, s: encounter_service.get_delayed_lab_alerts(db),
+
+        "task_service.create_task": lambda db, s: task_service.create_task(db, task_in=TaskCreate(
+            description="Plan check", encounter_id=s.encounter_id, assigned_nurse_id=s.busy_nurse_id, due_at=soon)),
+        "task_service.get_tasks_for_encounter:hot": lambda db, s: task_service.get_tasks_for_encounter(
+            db, encounter_id=s.hot_encounter_id),
+        "task_service.get_tasks_for_encounter:pending": lambda db, s: task_service.get_tasks_for_encounter(
+            db, encounter_id=s.encounter_id, status_filter=TaskStatus.PENDING),
+        "task_service.get_tasks_for_nurse:busy": lambda db, s: task_service.get_tasks_for_nurse(
+            db, nurse_id=s.busy_nurse_id),
+        "task_service.complete_task": lambda db, s: task_service.complete_task(
+            db, task_id=s.pending_task_id, completing_nurse_id=s.busy_nurse_id),
+
+        "note_service.create_note": lambda db, s: note_service.create_note(
+            db, encounter_id=s.encounter_id, author_id=s.doctor_id, note_type=NoteType.DOCTOR_DICTATION,
+            content="Plan check note."),
+        "note_service.get_notes_for_encounter:hot": lambda db, s: note_service.get_notes_for_encounter(
+            db, encounter_id=s.hot_encounter_id),
+        "note_service.get_notes_for_encounter": lambda db, s: note_service.get_notes_for_encounter(
+            db, encounter_id=s.encounter_id),
+
+        "user_service.get_user_identity_by_username": lambda db, s: user_service.get_user_identity_by_username(
+            db, username=s.username),
+        "user_service.get_user_credentials_by_username": lambda db, s: user_service.get_user_credentials_by_username(
+            db, username=s.username),
+        "user_service.get_user_by_username": lambda db, s: user_service.get_user_by_username(db, username=s.username),
+        "user_service.create_user": lambda db, s: user_service.create_user(
+            db, user_in=UserCreate(username="plan.check@example.com", password="x", role=UserRole.NURSE),
+            hashed_password="not-a-real-hash"),
+        "user_service.update_password_hash": lambda db, s: user_service.update_password_hash(
+            db, user_id=s.doctor_id, hashed_password="not-a-real-hash"),
+        "user_service.get_all_users": lambda db, s: user_service.get_all_users(db, limit=100),
+    }
+
+
+# --- Capture ---
+def capture_plans(engine, cases: Dict[str, Callable[[Any, Sample], Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs each case in a session joined to an outer transaction (service commits
+    become savepoint releases), records the statements it executed and returns
+    their plans keyed "<case>#<n>". Everything is rolled back afterwards.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from app.utils.id_allocator import patient_id_allocator
+
+    # Reserve a block of patient IDs up front so create_patient does not open its own connection
+    patient_id_allocator.next_id(engine)
+
+    captured: Dict[str, List[Tuple[str, Any]]] = {}
+    current: List[Tuple[str, Any]] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(SKIPPED_STATEMENTS):
+            current.append((statement, parameters[0] if executemany and parameters else parameters))
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            sample = pick_sample(Session(bind=connection))
+            for name, case in cases.items():
+                current = []
+                event.listen(connection, "before_cursor_execute", on_execute)
+                db = Session(bind=connection, join_transaction_mode="create_savepoint")
+                try:
+                    case(db, sample)
+                finally:
+                    event.remove(connection, "before_cursor_execute", on_execute)
+                    db.close()
+                captured[name] = list(current)
+            plans: Dict[str, Dict[str, Any]] = {}
+            for name, statements in captured.items():
+                seen = set()
+                for sql, params in statements:
+                    shape = normalize_sql(sql)
+                    if shape in seen: # e.g. a refresh after commit repeating the initial load
+                        continue
+                    seen.add(shape)
+                    # Keyed by target table rather than position: relationship loads run in no fixed order
+                    table = _target_table(sql)
+                    key = f"{name}@{table}"
+                    n = 2
+                    while key in plans:
+                        key = f"{name}@{table}#{n}"
+                        n += 1
+                    plans[key] = explain(connection, sql, params)
+        finally:
+            transaction.rollback()
+    return plans
+
+
+def _sqlite_savepoints(engine) -> None:
+    """pysqlite defers BEGIN and breaks SAVEPOINT nesting; let SQLAlchemy emit BEGIN itself."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+# --- Explain ---
+_IN_LIST = re.compile(r"IN \((?:\?|%\(\w+\)s)(?:, (?:\?|%\(\w+\)s))*\)")
+_TARGET = re.compile(r"^\s*(?:UPDATE\s+(\w+)|DELETE\s+FROM\s+(\w+)|SELECT\b.*?\bFROM\s+(\w+))", re.S | re.I)
+
+def normalize_sql(sql: str) -> str:
+    """Whitespace-collapsed SQL with expanded IN lists folded, so batch sizes do not look like new queries."""
+    return _IN_LIST.sub("IN (...)", " ".join(sql.split()))
+
+def _target_table(sql: str) -> str:
+    match = _TARGET.match(sql)
+    return next((group for group in match.groups() if group), "?") if match else "?"
+
+
+def explain(connection, sql: str, params: Any) -> Dict[str, Any]:
+    digest = hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+    if connection.dialect.name == "postgresql":
+        raw = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+        root = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        nodes: List[Dict[str, Any]] = []
+        _walk_pg(root, nodes)
+        return {"sql": sql, "sql_hash": digest, "rows": root.get("Plan Rows"),
+                "cost": root.get("Total Cost"), "nodes": nodes}
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+    nodes = []
+    for row in rows:
+        detail = row[-1]
+        match = SQLITE_DETAIL.match(detail)
+        if match is None:
+            nodes.append({"node": detail})
+            continue
+        # SCAN walks the whole table, even in index order ("SCAN t USING INDEX i"); SEARCH is a lookup
+        access = "seq" if match["op"] == "SCAN" else "index"
+        nodes.append({"node": detail, "relation": match["table"], "access": access,
+                      "index": match["index"] or ("rowid" if match["pk"] else match["auto"])})
+    return {"sql": sql, "sql_hash": digest, "rows": None, "cost": None, "nodes": nodes}
+
+
+def _walk_pg(node: Dict[str, Any], out: List[Dict[str, Any]]) -> None:
+    entry = {"node": node["Node Type"], "rows": node.get("Plan Rows")}
+    if node.get("Relation Name"):
+        entry["relation"] = node["Relation Name"]
+        entry["access"] = SCAN_NODES.get(node["Node Type"], "other")
+        entry["index"] = node.get("Index Name")
+    out.append(entry)
+    for child in node.get("Plans", []):
+        _walk_pg(child, out)
+
+
+# --- Compare ---
+def _access_by_relation(plan: Dict[str, Any]) -> Dict[str, Tuple[str, Optional[str]]]:
+    access: Dict[str, Tuple[str, Optional[str]]] = {}
+    for node in plan["nodes"]:
+        relation = node.get("relation")
+        if relation:
+            previous = access.get(relation)
+            # A table read several ways (e.g. subquery + outer query) is as bad as its worst read
+            if previous is None or node["access"] == "seq":
+                access[relation] = (node["access"], node.get("index"))
+    return access
+
+
+def _join_shape(plan: Dict[str, Any]) -> List[str]:
+    return [n["node"] for n in plan["nodes"] if "relation" not in n and ("Join" in n["node"] or n["node"] == "Nested Loop")]
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], blowup: float,
+            min_rows: float) -> Tuple[List[str], List[str]]:
+    regressions: List[str] = []
+    warnings: List[str] = []
+    for key in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(key), current.get(key)
+        if old is None:
+            warnings.append(f"{key}: new query (not in baseline)")
+            continue
+        if new is None:
+            warnings.append(f"{key}: no longer executed")
+            continue
+        if old["sql_hash"] != new["sql_hash"]:
+            warnings.append(f"{key}: query text changed")
+        old_access, new_access = _access_by_relation(old), _access_by_relation(new)
+        for relation, (access, index) in new_access.items():
+            before = old_access.get(relation)
+            if before is None:
+                if access == "seq":
+                    warnings.append(f"{key}: new seq scan on {relation}")
+            elif before[0] == "index" and access == "seq":
+                regressions.append(f"{key}: {relation} was read via {before[1]}, now a seq scan")
+            elif before[0] == access == "index" and before[1] != index:
+                warnings.append(f"{key}: {relation} now uses index {index} instead of {before[1]}")
+        if _join_shape(old) != _join_shape(new):
+            warnings.append(f"{key}: join strategy {_join_shape(old)} -> {_join_shape(new)}")
+        for field, label in (("rows", "row estimate"), ("cost", "cost estimate")):
+            before, after = old.get(field), new.get(field)
+            if before is not None and after is not None and after >= min_rows and after > max(before, 1) * blowup:
+                regressions.append(f"{key}: {label} grew {after / max(before, 1):.0f}x ({before:g} -> {after:g})")
+    return regressions, warnings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Database filled by perf/datagen.py")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline plans JSON (relative to backend/)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the current plans as the new baseline")
+    parser.add_argument("--blowup", type=float, default=10.0, help="Flag row/cost estimates that grow by more than this factor")
+    parser.add_argument("--min-rows", type=float, default=100.0, help="Ignore blowups whose new estimate is below this")
+    parser.add_argument("--show", action="store_true", help="Print every captured statement and its access paths")
+    args = parser.parse_args()
+
+    common.use_database(args.database_url)
+    from app.db.session import engine
+    if engine.dialect.name == "sqlite":
+        _sqlite_savepoints(engine)
+        engine.dispose() # Apply the connect hook to fresh connections
+
+    plans = capture_plans(engine, build_cases())
+    if args.show:
+        for key, plan in plans.items():
+            print(f"{key}\n    {' '.join(plan['sql'].split())[:200]}")
+            for node in plan["nodes"]:
+                print(f"      {node['node']} {node.get('relation') or ''} {node.get('index') or ''}".rstrip())
+
+    document = {
+        "meta": {"dialect": engine.dialect.name, "created_at": datetime.now(timezone.utc).isoformat()},
+        "plans": plans,
+    }
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print(f"Wrote {len(plans)} plans to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        sys.exit(f"No baseline at {args.baseline}; run with --update-baseline first.")
+    if baseline["meta"]["dialect"] != engine.dialect.name:
+        sys.exit(f"Baseline was taken on {baseline['meta']['dialect']}, not {engine.dialect.name}.")
+
+    regressions, warnings = compare(baseline["plans"], plans, args.blowup, args.min_rows)
+    for line in warnings:
+        print(f"WARNING    {line}")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(plans)} statements checked: {len(regressions)} regressions, {len(warnings)} warnings")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
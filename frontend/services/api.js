@@ -411,15 +411,18 @@ export const stopStreamingAudio = async () => {
 };
 
 /**
- * Upload a recorded audio file (local URI) to the backend REST upload endpoint.
+ * Upload a recorded audio file (local URI) to the backend REST upload endpoint,
+ * which queues its transcription and answers at once (HTTP 202).
  * fileUri: local file URI returned by expo-av Recording.getURI()
  * encounterId: encounter id integer
  * token: bearer token
+ * Returns { status: 'queued', job_id, status_url }; the note is saved in the
+ * background, so follow the job with waitForTranscriptionJob (or getTranscriptionJob).
  */
 export const uploadDictationFile = async (fileUri, encounterId, token) => {
   if (MOCK) {
-    // In mock mode we don't have a server endpoint; return a fake response
-    return { status: 'ok', transcript: 'Mock transcript (upload)', note_id: null };
+    // In mock mode we don't have a server endpoint; return a fake queued job
+    return { status: 'queued', job_id: 0, status_url: '/api/v1/dictation/jobs/0' };
   }
 
   try {
@@ -440,7 +443,7 @@ export const uploadDictationFile = async (fileUri, encounterId, token) => {
     });
 
     const data = await res.json();
-    if (!res.ok) throw new Error(data.message || JSON.stringify(data));
+    if (!res.ok) throw new Error(data.detail || data.message || JSON.stringify(data));
     return data;
   } catch (err) {
     console.error('uploadDictationFile error', err);
@@ -448,6 +451,34 @@ export const uploadDictationFile = async (fileUri, encounterId, token) => {
   }
 };
 
+/**
+ * Current state of a transcription job queued by uploadDictationFile:
+ * { id, status: 'queued' | 'running' | 'completed' | 'failed', progress (0..1),
+ *   attempts, error, encounter_id, note_id (set once the note is saved), created_at, finished_at }
+ */
+export const getTranscriptionJob = async (jobId, token) => {
+  if (MOCK) {
+    const now = new Date().toISOString();
+    return { id: jobId, status: 'completed', progress: 1, attempts: 1, error: null, encounter_id: null,
+             note_id: null, created_at: now, finished_at: now };
+  }
+  return fetchWithToken(`/api/v1/dictation/jobs/${encodeURIComponent(jobId)}`, token);
+};
+
+/**
+ * Polls a transcription job every `intervalMs` until it is completed or failed
+ * and returns it (null if the session expired). `onProgress(fraction)` is called
+ * while it runs. A failed job's `error` says why (e.g. audio that could not be decoded).
+ */
+export const waitForTranscriptionJob = async (jobId, token, { intervalMs = 2000, onProgress } = {}) => {
+  for (;;) {
+    const job = await getTranscriptionJob(jobId, token);
+    if (!job || job.status === 'completed' || job.status === 'failed') return job;
+    if (onProgress) onProgress(job.progress);
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 
 // --- Placeholder Functions for Future APIs ---
 // These are the APIs we need to ask your friend to build for the Patient Hub tabs.